@@ -12,13 +12,14 @@ from czsc import traders
 from czsc import sensors
 from czsc import aphorism
 from czsc.analyze import CZSC
-from czsc.objects import Freq, Operate, Direction, Signal, Factor, Event, RawBar, NewBar, Position
+from czsc.objects import Freq, Operate, Direction, Signal, Factor, Event, RawBar, NewBar, Position, EventMatcher
 from czsc.utils.cache import home_path, get_dir_size, empty_cache_path
 from czsc.traders import CzscTrader, CzscSignals, generate_czsc_signals, check_signals_acc, get_unique_signals
 from czsc.traders import PairsPerformance, combine_holds_and_pairs, combine_dates_and_pairs, stock_holds_performance
-from czsc.traders import DummyBacktest
+from czsc.traders import DummyBacktest, PositionSimulator, position_grid
+from czsc.traders import dump_snapshot, load_snapshot
 from czsc.strategies import CzscStrategyBase
-from czsc.utils import KlineChart, BarGenerator, resample_bars, dill_dump, dill_load, read_json, save_json
+from czsc.utils import KlineChart, BarGenerator, TradingCalendar, TickAggregator, resample_bars, resample_panel, dill_dump, dill_load, read_json, save_json
 from czsc.utils import get_sub_elements, get_py_namespace, freqs_sorted, x_round, import_by_name, create_grid_params
 from czsc.utils import cal_trade_price
 from czsc.sensors import holds_concepts_effect, StocksDaySensor, ThsConceptsSensor, SignalsPerformance
@@ -6,6 +6,7 @@ create_dt: 2021/3/10 11:21
 describe: 缠论分型、笔的识别
 """
 import os
+import bisect
 import webbrowser
 import numpy as np
 from loguru import logger
@@ -14,20 +15,30 @@ from collections import OrderedDict
 from czsc.enum import Mark, Direction
 from czsc.objects import BI, FX, RawBar, NewBar
 from czsc.utils.echarts_plot import kline_pro
+from czsc.utils.bar_store import BarStore
+from czsc.utils.stream_ta import StreamIndicators
 from czsc import envs
 
 logger.disable('czsc.analyze')
 
 
-def remove_include(k1: NewBar, k2: NewBar, k3: RawBar):
-    """去除包含关系：输入三根k线，其中k1和k2为没有包含关系的K线，k3为原始K线"""
+def remove_include(k1: NewBar, k2: NewBar, k3: RawBar, index: int = None):
+    """去除包含关系：输入三根k线，其中k1和k2为没有包含关系的K线，k3为原始K线
+
+    :param index: k3 在原始K线序列 k2.store 中的全局序号；传入时，新的无包含K线按序号区间引用原始K线，
+        否则用 raw_list 列表存放原始K线
+    """
     if k1.high < k2.high:
         direction = Direction.Up
     elif k1.high > k2.high:
         direction = Direction.Down
     else:
         k4 = NewBar(symbol=k3.symbol, id=k3.id, freq=k3.freq, dt=k3.dt, open=k3.open,
-                    close=k3.close, high=k3.high, low=k3.low, vol=k3.vol, elements=[k3])
+                    close=k3.close, high=k3.high, low=k3.low, vol=k3.vol)
+        if index is None:
+            k4.raw_list = [k3]
+        else:
+            k4.store, k4.start, k4.end, k4.tail = k2.store, index, index + 1, k3
         return False, k4
 
     # 判断 k2 和 k3 之间是否存在包含关系，有则处理
@@ -50,15 +61,24 @@ def remove_include(k1: NewBar, k2: NewBar, k3: RawBar):
             open_ = low
             close = high
         vol = k2.vol + k3.vol
-        # 这里有一个隐藏Bug，len(k2.elements) 在一些及其特殊的场景下会有超大的数量，具体问题还没找到；
-        # 临时解决方案是直接限定len(k2.elements)<=100
-        elements = [x for x in k2.elements[:100] if x.dt != k3.dt] + [k3]
         k4 = NewBar(symbol=k3.symbol, id=k2.id, freq=k2.freq, dt=dt, open=open_,
-                    close=close, high=high, low=low, vol=vol, elements=elements)
+                    close=close, high=high, low=low, vol=vol)
+        if index is None:
+            # 这里有一个隐藏Bug，len(k2.raw_list) 在一些及其特殊的场景下会有超大的数量，具体问题还没找到；
+            # 临时解决方案是直接限定len(k2.raw_list)<=100
+            k4.raw_list = [x for x in k2.raw_list[:100] if x.dt != k3.dt] + [k3]
+        else:
+            # 按序号区间引用原始K线，合并只需要延长区间，不拷贝原始K线列表，也不需要限定数量；
+            # k3 是区间中最后一根原始K线，之前的原始K线不会再被替换
+            k4.store, k4.start, k4.end, k4.tail = k2.store, k2.start, max(k2.end, index + 1), k3
         return True, k4
     else:
         k4 = NewBar(symbol=k3.symbol, id=k3.id, freq=k3.freq, dt=k3.dt, open=k3.open,
-                    close=k3.close, high=k3.high, low=k3.low, vol=k3.vol, elements=[k3])
+                    close=k3.close, high=k3.high, low=k3.low, vol=k3.vol)
+        if index is None:
+            k4.raw_list = [k3]
+        else:
+            k4.store, k4.start, k4.end, k4.tail = k2.store, index, index + 1, k3
         return False, k4
 
 
@@ -76,38 +96,48 @@ def check_fx(k1: NewBar, k2: NewBar, k3: NewBar):
     return fx
 
 
+def append_fx(fxs: List[FX], fx: FX) -> None:
+    """将新识别的分型加入分型序列，要求 fxs 序列顶底交替
+
+    :param fxs: 已经识别出来的分型序列，原地更新
+    :param fx: 新识别的分型
+    """
+    # 这里可能隐含Bug，默认情况下，fxs本身是顶底交替的，但是对于一些特殊情况下不是这样，这是不对的。
+    # 临时处理方案，强制要求fxs序列顶底交替
+    if len(fxs) >= 2 and fx.mark == fxs[-1].mark:
+        if envs.get_verbose():
+            logger.info(f"\n\ncheck_fxs: 输入数据错误{'+' * 100}")
+            logger.info(f"当前：{fx.mark}, 上个：{fxs[-1].mark}")
+            for bar in fx.raw_bars:
+                logger.info(f"{bar}\n")
+
+            logger.info(f'last fx raw bars: \n')
+            for bar in fxs[-1].raw_bars:
+                logger.info(f"{bar}\n")
+    else:
+        fxs.append(fx)
+
+
 def check_fxs(bars: List[NewBar]) -> List[FX]:
     """输入一串无包含关系K线，查找其中所有分型"""
     fxs = []
     for i in range(1, len(bars)-1):
         fx: FX = check_fx(bars[i-1], bars[i], bars[i+1])
         if isinstance(fx, FX):
-            # 这里可能隐含Bug，默认情况下，fxs本身是顶底交替的，但是对于一些特殊情况下不是这样，这是不对的。
-            # 临时处理方案，强制要求fxs序列顶底交替
-            if len(fxs) >= 2 and fx.mark == fxs[-1].mark:
-                if envs.get_verbose():
-                    logger.info(f"\n\ncheck_fxs: 输入数据错误{'+' * 100}")
-                    logger.info(f"当前：{fx.mark}, 上个：{fxs[-1].mark}")
-                    for bar in fx.raw_bars:
-                        logger.info(f"{bar}\n")
-
-                    logger.info(f'last fx raw bars: \n')
-                    for bar in fxs[-1].raw_bars:
-                        logger.info(f"{bar}\n")
-            else:
-                fxs.append(fx)
+            append_fx(fxs, fx)
     return fxs
 
 
-def check_bi(bars: List[NewBar], benchmark: float = None):
+def check_bi(bars: List[NewBar], benchmark: float = None, fxs: List[FX] = None):
     """输入一串无包含关系K线，查找其中的一笔
 
     :param bars: 无包含关系K线列表
     :param benchmark: 当下笔能量的比较基准
+    :param fxs: bars 中的分型序列，即 check_fxs(bars) 的结果；传入增量维护的分型序列可以避免重复扫描 bars
     :return:
     """
     min_bi_len = envs.get_min_bi_len()
-    fxs = check_fxs(bars)
+    fxs = check_fxs(bars) if fxs is None else fxs
     if len(fxs) < 2:
         return None, bars
 
@@ -169,6 +199,72 @@ def check_bi(bars: List[NewBar], benchmark: float = None):
         return None, bars
 
 
+def remove_include_arrays(high: np.ndarray, low: np.ndarray):
+    """在原始K线的 high、low 数组上一次性去除包含关系，与逐根K线调用 remove_include 的结果完全一致
+
+    :param high: 原始K线的最高价序列，要求原始K线的 dt 严格递增
+    :param low: 原始K线的最低价序列
+    :return: 处理完每一根原始K线之后，所属无包含K线的状态，均为与原始K线等长的 list
+        nb_index  所属无包含K线的序号
+        nb_high   所属无包含K线的最高价；nb_low 同理
+        high_src  所属无包含K线的最高价取自哪一根原始K线；low_src、dt_src 同理
+    """
+    high = np.asarray(high, dtype=np.float64).tolist()
+    low = np.asarray(low, dtype=np.float64).tolist()
+    n = len(high)
+    nb_index, nb_high, nb_low = [0] * n, [0.0] * n, [0.0] * n
+    high_src, low_src, dt_src = [0] * n, [0] * n, [0] * n
+
+    m = -1
+    k1_high = k2_high = k2_low = 0.0
+    hs = ls = ds = 0
+    for t in range(n):
+        h, l = high[t], low[t]
+        if m >= 1 and k1_high != k2_high and ((k2_high <= h and k2_low >= l) or (k2_high >= h and k2_low <= l)):
+            if k1_high < k2_high:
+                if k2_high <= h:
+                    ds = t
+                if k2_high < h:
+                    hs, k2_high = t, h
+                if k2_low < l:
+                    ls, k2_low = t, l
+            else:
+                if k2_low >= l:
+                    ds = t
+                if k2_high > h:
+                    hs, k2_high = t, h
+                if k2_low > l:
+                    ls, k2_low = t, l
+        else:
+            m += 1
+            k1_high, k2_high, k2_low = k2_high, h, l
+            hs = ls = ds = t
+
+        nb_index[t], nb_high[t], nb_low[t] = m, k2_high, k2_low
+        high_src[t], low_src[t], dt_src[t] = hs, ls, ds
+    return nb_index, nb_high, nb_low, high_src, low_src, dt_src
+
+
+def mark_fxs_arrays(high: np.ndarray, low: np.ndarray) -> np.ndarray:
+    """在无包含K线的 high、low 数组上一次性标记分型，与 check_fx 的判断规则一致
+
+    :return: 与输入等长的数组，1 表示顶分型，-1 表示底分型，0 表示不是分型；首尾两根K线恒为 0
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    marks = np.zeros(len(high), dtype=np.int8)
+    if len(high) < 3:
+        return marks
+
+    h1, h2, h3 = high[:-2], high[1:-1], high[2:]
+    l1, l2, l3 = low[:-2], low[1:-1], low[2:]
+    is_g = (h1 < h2) & (h2 > h3) & (l1 < l2) & (l2 > l3)
+    is_d = (l1 > l2) & (l2 < l3) & (h1 > h2) & (h2 < h3)
+    marks[1:-1][is_g] = 1
+    marks[1:-1][is_d] = -1
+    return marks
+
+
 class CZSC:
     def __init__(self,
                  bars: List[RawBar],
@@ -183,8 +279,9 @@ class CZSC:
         """
         self.verbose = envs.get_verbose()
         self.max_bi_num = max_bi_num
-        self.bars_raw: List[RawBar] = []  # 原始K线序列
+        self.bars_raw: BarStore = BarStore()  # 原始K线序列，列式存储，兼容 List[RawBar] 的访问方式
         self.bars_ubi: List[NewBar] = []  # 未完成笔的无包含K线序列
+        self._ubi_fxs: List[FX] = []  # bars_ubi 中的分型序列，随 bars_ubi 增量维护
         self.bi_list: List[BI] = []
         self.symbol = bars[0].symbol
         self.freq = bars[0].freq
@@ -192,6 +289,13 @@ class CZSC:
         self.signals = None
         # cache 是信号计算过程的缓存容器，需要信号计算函数自行维护
         self.cache = OrderedDict()
+        # indicators 是流式技术指标引擎，tas、vol 中的 update_*_cache 通过它增量计算指标并写入 bars_raw 的指标列
+        self.indicators = StreamIndicators()
+        # state_version 是分析状态的版本号，每次 update 递增；fx_list 等属性按版本号缓存计算结果
+        self.state_version = 0
+        self._memo = {}
+        self._benchmark = (None, 0, None)  # 笔能量比较基准的缓存：(最后一笔, 笔的数量, 比较基准)
+        self._trimmed = None  # 最近一次按其裁剪 bars_raw 的第一根无包含K线
 
         for bar in bars:
             self.update(bar)
@@ -199,6 +303,256 @@ class CZSC:
     def __repr__(self):
         return "<CZSC~{}~{}>".format(self.symbol, self.freq.value)
 
+    @classmethod
+    def from_bars(cls, bars: List[RawBar], get_signals: Callable = None, max_bi_num=envs.get_max_bi_num()):
+        """使用长历史K线批量初始化 CZSC 对象，结果与 CZSC(bars, get_signals, max_bi_num) 完全一致
+
+        1. 在 NumPy 数组上一次性完成包含关系处理和分型标记；
+        2. 在数组上回放笔的识别过程，只为最终保留的笔和未完成笔创建 NewBar、FX、BI 对象；
+        3. 最后一次笔发生变化之后的K线（最后一笔未完成的部分），交给 update 逐根处理。
+
+        **注意：** get_signals 只在第 3 步逐根处理的K线上执行；K线的 dt 不是严格递增时，退化为逐根K线更新。
+
+        :param bars: K线数据
+        :param get_signals: 自定义的信号计算函数
+        :param max_bi_num: 最大允许保留的笔数量
+        :return: CZSC 对象
+        """
+        bars = list(bars)
+        n = len(bars)
+        dts = [x.dt for x in bars]
+        if n < 3 or any(dts[i] >= dts[i + 1] for i in range(n - 1)):
+            return cls(bars, get_signals=get_signals, max_bi_num=max_bi_num)
+
+        # 包含关系处理和分型标记：NH、NL 是每根无包含K线完成之后的最高价、最低价，marks 是完成之后的分型标记
+        nb_index, nb_high, nb_low, high_src, low_src, dt_src = remove_include_arrays(
+            [x.high for x in bars], [x.low for x in bars])
+        ends = [t for t in range(n - 1) if nb_index[t] != nb_index[t + 1]] + [n - 1]
+        starts = [0] + [e + 1 for e in ends[:-1]]
+        NH = [nb_high[e] for e in ends]
+        NL = [nb_low[e] for e in ends]
+        marks = mark_fxs_arrays(NH, NL).tolist()
+
+        min_bi_len = envs.get_min_bi_len()
+        bi_change_th = envs.get_bi_change_th()
+
+        # 回放笔的识别过程。笔被破坏时 bars_ubi 会拼接上一笔的K线，不一定是连续的无包含K线，
+        # 所以 ubi 记录的是 bars_ubi 中每根K线的序号，分型用 ubi 中的位置表示；
+        # ubi 的最后一根K线是未完成的，它的最高价、最低价是 h、l
+        def get_mark(ubi, p, h, l):
+            """ubi 中第 p 根K线的分型标记"""
+            i1, i2, i3 = ubi[p - 1], ubi[p], ubi[p + 1]
+            if i3 - i1 == 2 and p + 2 < len(ubi):
+                return marks[i2]
+            h3, l3 = (h, l) if p + 2 == len(ubi) else (NH[i3], NL[i3])
+            if NH[i1] < NH[i2] > h3 and NL[i1] < NL[i2] > l3:
+                return 1
+            if NL[i1] > NL[i2] < l3 and NH[i1] > NH[i2] < h3:
+                return -1
+            return 0
+
+        def scan_fxs(ubi, fxs, p0, p1, h, l):
+            """将 ubi 中 [p0, p1) 位置上的分型按顶底交替的要求加入 fxs"""
+            for p in range(p0, p1):
+                mk = get_mark(ubi, p, h, l)
+                if mk and not (len(fxs) >= 2 and mk == fxs[-1][1]):
+                    fxs.append((p, mk))
+
+        def all_fxs(ubi, fin, h, l):
+            """fin 是右侧K线已经完成的分型，加上以最后一根K线作为右侧K线的分型"""
+            mk = get_mark(ubi, len(ubi) - 2, h, l)
+            if mk and not (len(fin) >= 2 and mk == fin[-1][1]):
+                return fin + [(len(ubi) - 2, mk)]
+            return fin
+
+        def find_bi(ubi, fxs, h, l, benchmark=None):
+            """check_bi 的数组版本，返回笔的记录 (bars, fxs, fx_a 位置, fx_b 位置, fx_a 标记, high, low, power_price)"""
+            if len(fxs) < 2:
+                return None
+            pa, ma = fxs[0]
+            ia, pb = ubi[pa], None
+            if ma == -1:
+                for p, mk in fxs:
+                    if mk == 1 and p > pa and NH[ubi[p]] > NL[ia] and (pb is None or NH[ubi[p]] >= NH[ubi[pb]]):
+                        pb = p
+            else:
+                for p, mk in fxs:
+                    if mk == -1 and p > pa and NL[ubi[p]] < NH[ia] and (pb is None or NL[ubi[p]] <= NL[ubi[pb]]):
+                        pb = p
+            if pb is None:
+                return None
+
+            ib = ubi[pb]
+            ab_include = (NH[ia] > NH[ib] and NL[ia] < NL[ib]) or (NH[ia] < NH[ib] and NL[ia] > NL[ib])
+            fx_a, fx_b = (NL[ia], NH[ib]) if ma == -1 else (NH[ia], NL[ib])
+            power_enough = bool(benchmark and abs(fx_a - fx_b) > benchmark * bi_change_th)
+            if ab_include or (pb - pa + 3 < min_bi_len and not power_enough):
+                return None
+
+            high, low = max(NH[ia], NH[ib]), min(NL[ia], NL[ib])
+            rest = ubi[pb - 1: -1]
+            if (ma == -1 and max(max(NH[i] for i in rest), h) > high) \
+                    or (ma == 1 and min(min(NL[i] for i in rest), l) < low):
+                return None
+
+            fxs_ = [(ubi[p - 1], ubi[p], ubi[p + 1], mk) for p, mk in fxs if pa - 1 <= p <= pb + 1]
+            a = [x[1] for x in fxs_].index(ia)
+            b = [x[1] for x in fxs_].index(ib)
+            return ubi[pa - 1: pb + 2], fxs_, a, b, ma, high, low, round(abs(fx_b - fx_a), 2)
+
+        ubi, fin, scanned = [], [], 1
+        bis, n_drop, head = [], 0, 0
+        handover, benchmark = None, None
+        for t in range(n):
+            m, h, l = nb_index[t], nb_high[t], nb_low[t]
+            if not ubi or ubi[-1] != m:
+                ubi.append(m)
+            changed = False
+            if len(ubi) >= 3:
+                if scanned < len(ubi) - 2:
+                    scan_fxs(ubi, fin, scanned, len(ubi) - 2, h, l)
+                    scanned = len(ubi) - 2
+                fxs = all_fxs(ubi, fin, h, l)
+
+                if len(bis) == n_drop:
+                    # 第一笔的查找
+                    if fxs:
+                        pa, ma = fxs[0]
+                        for p, mk in fxs:
+                            if mk == ma and ((ma == -1 and NL[ubi[p]] <= NL[ubi[pa]])
+                                             or (ma == 1 and NH[ubi[p]] >= NH[ubi[pa]])):
+                                pa = p
+                        if pa > 1:
+                            ubi, fin = ubi[pa - 1:], []
+                            scanned = len(ubi) - 2
+                            scan_fxs(ubi, fin, 1, scanned, h, l)
+                            fxs = all_fxs(ubi, fin, h, l)
+
+                        bi = find_bi(ubi, fxs, h, l)
+                        if bi:
+                            bis.append(bi + (t,))
+                            # bars_ubi 从 fx_b 的左侧K线开始
+                            ubi, fin = ubi[ubi.index(bi[0][-2]) - 1:], []
+                            scanned = len(ubi) - 2
+                            scan_fxs(ubi, fin, 1, scanned, h, l)
+                            changed = True
+                else:
+                    bi = find_bi(ubi, fxs, h, l, benchmark)
+                    if bi:
+                        bis.append(bi + (t,))
+                        # bars_ubi 从 fx_b 的左侧K线开始
+                        ubi, fin = ubi[ubi.index(bi[0][-2]) - 1:], []
+                        scanned = len(ubi) - 2
+                        scan_fxs(ubi, fin, 1, scanned, h, l)
+                        changed = True
+
+                    # 后处理：如果当前笔被破坏，将当前笔的bars与bars_ubi进行合并，并丢弃
+                    bi_bars, ma, high, low = bis[-1][0], bis[-1][4], bis[-1][5], bis[-1][6]
+                    if (ma == -1 and h > high) or (ma == 1 and l < low):
+                        ubi, fin = bi_bars[:-1] + [i for i in ubi if i >= bi_bars[-1]], []
+                        scanned = len(ubi) - 2
+                        scan_fxs(ubi, fin, 1, scanned, h, l)
+                        bis.pop(-1)
+                        changed = True
+
+            # 根据最大笔数量限制完成 bi_list, bars_raw 序列的数量控制
+            n_drop = max(n_drop, len(bis) - max_bi_num)
+            if len(bis) > n_drop:
+                sdt = dts[dt_src[ends[bis[n_drop][0][0]]]]
+                head = max(head, bisect.bisect_left(dts, sdt))
+            if changed:
+                handover = (t, list(ubi), bis[n_drop:], head)
+                # 笔的能量比较基准只随笔的变化而变化
+                benchmark = None
+                if bi_change_th > 0.5 and len(bis) - n_drop >= 5:
+                    benchmark = min(bis[-1][7], np.mean([x[7] for x in bis[-5:]]))
+
+        if handover is None:
+            return cls(bars, get_signals=get_signals, max_bi_num=max_bi_num)
+
+        # 在最后一次笔发生变化的位置 t 创建分析对象；bars_raw 中K线的全局序号就是在 bars 中的位置，
+        # NewBar 按 (序号, 最后一根原始K线的位置) 复用
+        t, ubi, bis, head = handover
+        bars_raw = BarStore(bars[: t + 1])
+        bars_raw.remove_head(head, keep=starts[bis[0][0][0]] if bis else None)
+        nb_cache = {}
+
+        def make_nb(j, tj):
+            s, e = starts[j], min(ends[j], tj)
+            if (j, e) not in nb_cache:
+                k3 = bars[e]
+                if s == e:
+                    nb = NewBar(symbol=k3.symbol, id=k3.id, freq=k3.freq, dt=k3.dt, open=k3.open,
+                                close=k3.close, high=k3.high, low=k3.low, vol=k3.vol)
+                else:
+                    high, low = bars[high_src[e]].high, bars[low_src[e]].low
+                    open_, close = (high, low) if k3.open > k3.close else (low, high)
+                    vol = bars[s].vol
+                    for x in bars[s + 1: e + 1]:
+                        vol = vol + x.vol
+                    nb = NewBar(symbol=k3.symbol, id=bars[s].id, freq=bars[s].freq, dt=dts[dt_src[e]],
+                                open=open_, close=close, high=high, low=low, vol=vol)
+                nb.store, nb.start, nb.end, nb.tail = bars_raw, s, e + 1, k3
+                nb_cache[(j, e)] = nb
+            return nb_cache[(j, e)]
+
+        bi_list = []
+        for bi_bars, bi_fxs, a, b, ma, _, _, _, tf in bis:
+            fxs_ = []
+            for i1, i2, i3, mk in bi_fxs:
+                k1, k2, k3 = make_nb(i1, tf), make_nb(i2, tf), make_nb(i3, tf)
+                fxs_.append(FX(symbol=k1.symbol, dt=k2.dt, mark=Mark.G if mk == 1 else Mark.D, high=k2.high,
+                               low=k2.low, fx=k2.high if mk == 1 else k2.low, elements=[k1, k2, k3]))
+            bi = BI(symbol=fxs_[a].symbol, fx_a=fxs_[a], fx_b=fxs_[b], fxs=fxs_,
+                    direction=Direction.Up if ma == -1 else Direction.Down,
+                    bars=[make_nb(j, tf) for j in bi_bars])
+            if bi.direction == Direction.Up:
+                # 逐K线更新时，成笔检查会读取向上笔的 high 并写入 cache
+                _ = bi.high
+            bi_list.append(bi)
+
+        # 用第一根K线完成对象属性的初始化，随后替换为批量计算的分析状态
+        c = cls(bars[:1], max_bi_num=max_bi_num)
+        c.bars_raw = bars_raw
+        c.bi_list = bi_list
+        c.__reset_ubi([make_nb(j, t) for j in ubi])
+        c.get_signals = get_signals
+        c.state_version += 1
+        for bar in bars[t + 1:]:
+            c.update(bar)
+        if t == n - 1 and get_signals:
+            c.signals = get_signals(c=c)
+        return c
+
+    def __memo(self, key, func: Callable):
+        """按状态版本号缓存 func 的计算结果，同一版本内重复读取不再计算，返回的是缓存对象本身，不要修改"""
+        value = self._memo.get(key)
+        if value is None or value[0] != self.state_version:
+            value = (self.state_version, func())
+            self._memo[key] = value
+        return value[1]
+
+    def __push_ubi(self, bar: NewBar):
+        """在 bars_ubi 末尾加入一根无包含K线，只需要检查最新的三根K线是否构成分型"""
+        bars_ubi = self.bars_ubi
+        bars_ubi.append(bar)
+        if len(bars_ubi) >= 3:
+            fx = check_fx(bars_ubi[-3], bars_ubi[-2], bars_ubi[-1])
+            if isinstance(fx, FX):
+                append_fx(self._ubi_fxs, fx)
+
+    def __pop_ubi(self):
+        """移除 bars_ubi 的最后一根K线，同时移除以这根K线作为右侧K线的分型"""
+        bars_ubi = self.bars_ubi
+        if self._ubi_fxs and self._ubi_fxs[-1].elements[2] is bars_ubi[-1]:
+            self._ubi_fxs.pop(-1)
+        bars_ubi.pop(-1)
+
+    def __reset_ubi(self, bars_ubi: List[NewBar]):
+        """bars_ubi 被整体替换（笔的生成、破坏）时，重新识别其中的分型"""
+        self.bars_ubi = bars_ubi
+        self._ubi_fxs = check_fxs(bars_ubi)
+
     def __update_bi(self):
         bars_ubi = self.bars_ubi
         if len(bars_ubi) < 3:
@@ -207,7 +561,7 @@ class CZSC:
         # 查找笔
         if not self.bi_list:
             # 第一笔的查找
-            fxs = check_fxs(bars_ubi)
+            fxs = self._ubi_fxs
             if not fxs:
                 return
 
@@ -222,28 +576,34 @@ class CZSC:
             bi, bars_ubi_ = check_bi(bars_ubi)
             if isinstance(bi, BI):
                 self.bi_list.append(bi)
-            self.bars_ubi = bars_ubi_
+            if len(bars_ubi_) != len(self.bars_ubi):
+                self.__reset_ubi(bars_ubi_)
             return
 
         if self.verbose and len(bars_ubi) > 100:
             logger.info(f"{self.symbol} - {self.freq} - {bars_ubi[-1].dt} 未完成笔延伸数量: {len(bars_ubi)}")
 
         if envs.get_bi_change_th() > 0.5 and len(self.bi_list) >= 5:
-            benchmark = min(self.bi_list[-1].power_price, np.mean([x.power_price for x in self.bi_list[-5:]]))
+            # 比较基准只取决于最后 5 笔，按最后一笔和笔的数量缓存，笔没有变化时不重复计算
+            last_bi, n = self.bi_list[-1], len(self.bi_list)
+            if self._benchmark[0] is not last_bi or self._benchmark[1] != n:
+                value = min(last_bi.power_price, np.mean([x.power_price for x in self.bi_list[-5:]]))
+                self._benchmark = (last_bi, n, value)
+            benchmark = self._benchmark[2]
         else:
             benchmark = None
 
-        bi, bars_ubi_ = check_bi(bars_ubi, benchmark)
-        self.bars_ubi = bars_ubi_
+        bi, bars_ubi_ = check_bi(bars_ubi, benchmark, fxs=self._ubi_fxs)
         if isinstance(bi, BI):
             self.bi_list.append(bi)
+            self.__reset_ubi(bars_ubi_)
 
         # 后处理：如果当前笔被破坏，将当前笔的bars与bars_ubi进行合并，并丢弃
         last_bi = self.bi_list[-1]
         bars_ubi = self.bars_ubi
         if (last_bi.direction == Direction.Up and bars_ubi[-1].high > last_bi.high) \
                 or (last_bi.direction == Direction.Down and bars_ubi[-1].low < last_bi.low):
-            self.bars_ubi = last_bi.bars[:-1] + [x for x in bars_ubi if x.dt >= last_bi.bars[-1].dt]
+            self.__reset_ubi(last_bi.bars[:-1] + [x for x in bars_ubi if x.dt >= last_bi.bars[-1].dt])
             self.bi_list.pop(-1)
 
     def update(self, bar: RawBar):
@@ -251,51 +611,60 @@ class CZSC:
 
         :param bar: 单根K线对象
         """
-        # 更新K线序列
-        if not self.bars_raw or bar.dt != self.bars_raw[-1].dt:
-            self.bars_raw.append(bar)
-            last_bars = [bar]
+        self.state_version += 1
+
+        # 更新K线序列，last_bars 是需要去除包含关系的原始K线及其在 bars_raw 中的全局序号
+        bars_raw = self.bars_raw
+        if not bars_raw or bar.dt != bars_raw[-1].dt:
+            bars_raw.append(bar)
+            last_bars = [(bars_raw.offset + len(bars_raw) - 1, bar)]
         else:
             # 当前 bar 是上一根 bar 的时间延伸
-            self.bars_raw[-1] = bar
+            bars_raw[-1] = bar
             if len(self.bars_ubi) >= 3:
+                # bars_ubi 按时间严格升序，移除最后一根即保留 dt <= edt 的部分
                 edt = self.bars_ubi[-2].dt
-                self.bars_ubi = [x for x in self.bars_ubi if x.dt <= edt]
-                last_bars = [x for x in self.bars_raw[-50:] if x.dt > edt]
+                self.__pop_ubi()
+                rows = bars_raw[-50:]
+                g0 = bars_raw.offset + len(bars_raw) - len(rows)
+                last_bars = [(g0 + i, x) for i, x in enumerate(rows) if x.dt > edt]
             else:
-                last_bars = self.bars_ubi[-1].elements
-                last_bars[-1] = bar
-                self.bars_ubi.pop(-1)
+                # 与合并时的原始K线列表一样，被替换的最后一根原始K线换成当前 bar
+                k = self.bars_ubi[-1]
+                k.tail = bar
+                last_bars = list(zip(range(k.start, k.end), k.raw_bars))
+                self.__pop_ubi()
 
-        # 去除包含关系
+        # 去除包含关系，同时增量更新 bars_ubi 中的分型
         bars_ubi = self.bars_ubi
-        for bar in last_bars:
+        for i, bar in last_bars:
             if len(bars_ubi) < 2:
-                bars_ubi.append(NewBar(symbol=bar.symbol, id=bar.id, freq=bar.freq, dt=bar.dt,
-                                       open=bar.open, close=bar.close,
-                                       high=bar.high, low=bar.low, vol=bar.vol, elements=[bar]))
+                self.__push_ubi(NewBar(symbol=bar.symbol, id=bar.id, freq=bar.freq, dt=bar.dt,
+                                       open=bar.open, close=bar.close, high=bar.high, low=bar.low, vol=bar.vol,
+                                       store=bars_raw, start=i, end=i + 1, tail=bar))
             else:
                 k1, k2 = bars_ubi[-2:]
-                has_include, k3 = remove_include(k1, k2, bar)
+                has_include, k3 = remove_include(k1, k2, bar, i)
                 if has_include:
-                    bars_ubi[-1] = k3
-                else:
-                    bars_ubi.append(k3)
-        self.bars_ubi = bars_ubi
+                    self.__pop_ubi()
+                self.__push_ubi(k3)
 
         # 更新笔
         self.__update_bi()
 
         # 根据最大笔数量限制完成 bi_list, bars_raw 序列的数量控制
-        self.bi_list = self.bi_list[-self.max_bi_num:]
+        if len(self.bi_list) > self.max_bi_num:
+            self.bi_list = self.bi_list[-self.max_bi_num:]
         if self.bi_list:
-            sdt = self.bi_list[0].fx_a.elements[0].dt
-            s_index = 0
-            for i, bar in enumerate(self.bars_raw):
-                if bar.dt >= sdt:
-                    s_index = i
-                    break
-            self.bars_raw = self.bars_raw[s_index:]
+            # bars_raw 按时间严格升序，二分查找第一笔开始的位置；没有需要丢弃的K线时不做任何操作。
+            # 第一根无包含K线中位于开始位置之前的原始K线，从 bars_raw 中丢弃之后仍然保留给 raw_bars 访问
+            # 第一笔没有变化时，之后只在末尾加入了K线，不会再有需要丢弃的K线
+            first = self.bi_list[0].fx_a.elements[0]
+            if first is not self._trimmed:
+                s_index = int(np.searchsorted(bars_raw.dt, np.datetime64(first.dt, 'ns')))
+                if 0 < s_index < len(bars_raw):
+                    bars_raw.remove_head(s_index, keep=first.start)
+                self._trimmed = first
 
         # 如果有信号计算函数，则进行信号计算
         if self.get_signals:
@@ -311,7 +680,7 @@ class CZSC:
         :param bs: 交易标记，默认为空
         :return:
         """
-        kline = [x.__dict__ for x in self.bars_raw]
+        kline = [x.to_dict() for x in self.bars_raw]
         if len(self.bi_list) > 0:
             bi = [{'dt': x.fx_a.dt, "bi": x.fx_a.fx} for x in self.bi_list] + \
                  [{'dt': self.bi_list[-1].fx_b.dt, "bi": self.bi_list[-1].fx_b.fx}]
@@ -329,7 +698,7 @@ class CZSC:
         from czsc.utils.plotly_plot import KlineChart
 
         bi_list = self.bi_list
-        df = pd.DataFrame(self.bars_raw)
+        df = pd.DataFrame(self.bars_raw.to_list())
         kline = KlineChart(n_rows=3, title="{}-{}".format(self.symbol, self.freq.value))
         kline.add_kline(df, name="")
         kline.add_sma(df, ma_seq=(5, 10, 21), row=1, visible=True, line_width=1.2)
@@ -362,41 +731,47 @@ class CZSC:
     @property
     def last_bi_extend(self):
         """判断最后一笔是否在延伸中，True 表示延伸中"""
-        if self.bi_list[-1].direction == Direction.Up \
-                and max([x.high for x in self.bars_ubi]) > self.bi_list[-1].high:
-            return True
+        def __default():
+            if self.bi_list[-1].direction == Direction.Up \
+                    and max([x.high for x in self.bars_ubi]) > self.bi_list[-1].high:
+                return True
+
+            if self.bi_list[-1].direction == Direction.Down \
+                    and min([x.low for x in self.bars_ubi]) < self.bi_list[-1].low:
+                return True
 
-        if self.bi_list[-1].direction == Direction.Down \
-                and min([x.low for x in self.bars_ubi]) < self.bi_list[-1].low:
-            return True
+            return False
 
-        return False
+        return self.__memo('last_bi_extend', __default)
 
     @property
     def finished_bis(self) -> List[BI]:
         """已完成的笔"""
-        if not self.bi_list:
-            return []
-        if len(self.bars_ubi) < 5:
-            return self.bi_list[:-1]
-        return self.bi_list
+        def __default():
+            if not self.bi_list:
+                return []
+            if len(self.bars_ubi) < 5:
+                return self.bi_list[:-1]
+            return self.bi_list
+
+        return self.__memo('finished_bis', __default)
 
     @property
     def ubi_fxs(self) -> List[FX]:
         """bars_ubi 中的分型"""
-        if not self.bars_ubi:
-            return []
-        else:
-            return check_fxs(self.bars_ubi)
+        return self.__memo('ubi_fxs', lambda: list(self._ubi_fxs))
 
     @property
     def fx_list(self) -> List[FX]:
         """分型列表，包括 bars_ubi 中的分型"""
-        fxs = []
-        for bi_ in self.bi_list:
-            fxs.extend(bi_.fxs[1:])
-        ubi = self.ubi_fxs
-        for x in ubi:
-            if not fxs or x.dt > fxs[-1].dt:
-                fxs.append(x)
-        return fxs
+        def __default():
+            fxs = []
+            for bi_ in self.bi_list:
+                fxs.extend(bi_.fxs[1:])
+            ubi = self.ubi_fxs
+            for x in ubi:
+                if not fxs or x.dt > fxs[-1].dt:
+                    fxs.append(x)
+            return fxs
+
+        return self.__memo('fx_list', __default)
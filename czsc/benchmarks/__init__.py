@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/4/9 10:12
+describe: 基准测试：使用随机游走K线测量分析、K线合成、信号计算、持仓回测的吞吐量和内存峰值
+
+命令行执行：python -m czsc.benchmarks --output benchmark.json --compare last_benchmark.json
+"""
+from czsc.benchmarks.mock import random_walk_bars
+from czsc.benchmarks.suite import (
+    CASES, run_case, run_benchmarks, save_report, load_report, compare_reports
+)
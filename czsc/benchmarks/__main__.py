@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/4/9 11:20
+describe: 基准测试命令行入口
+
+运行方式：python -m czsc.benchmarks --cases czsc_update bar_generator_update --output benchmark.json
+"""
+import sys
+import argparse
+import pandas as pd
+from czsc.benchmarks.suite import CASES, run_benchmarks, save_report, load_report, compare_reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CZSC 基准测试")
+    parser.add_argument('--cases', nargs='*', choices=list(CASES.keys()), help="测试用例，默认执行全部用例")
+    parser.add_argument('--bars', type=int, default=None, help="K线数量，默认使用各用例的默认值")
+    parser.add_argument('--repeat', type=int, default=3, help="计时的重复次数")
+    parser.add_argument('--no-memory', action='store_true', help="不统计内存峰值")
+    parser.add_argument('--output', default=None, help="测试报告的保存路径")
+    parser.add_argument('--compare', default=None, help="用于对比的历史测试报告")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="允许的波动比例")
+    args = parser.parse_args()
+
+    cases = args.cases or list(CASES.keys())
+    bars = {name: args.bars for name in cases} if args.bars else None
+    report = run_benchmarks(cases, bars=bars, repeat=args.repeat, memory=not args.no_memory)
+    if args.output:
+        save_report(report, args.output)
+
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(pd.DataFrame(report['results']).drop(columns=['desc', 'seconds_all']))
+        if args.compare:
+            dfc = compare_reports(load_report(args.compare), report, tolerance=args.tolerance)
+            print(dfc)
+            if dfc['regression'].any():
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
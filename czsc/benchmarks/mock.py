@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/4/9 10:16
+describe: 随机游走K线、Tick 生成器，为基准测试提供可复现、不依赖网络的行情数据
+"""
+import numpy as np
+import pandas as pd
+from typing import List, Union, AnyStr
+from czsc.objects import RawBar, Tick, Freq
+
+
+def session_offsets(freq: Freq) -> List[pd.Timedelta]:
+    """A股交易时段内，分钟级别K线的结束时间相对于当日零点的偏移
+
+    :param freq: K线周期，仅支持 1/5/15/30/60 分钟
+    :return: 偏移量列表
+    """
+    if freq == Freq.F60:
+        return [pd.Timedelta(x) for x in ['10:30:00', '11:30:00', '14:00:00', '15:00:00']]
+
+    m = int(str(freq.value).strip("分钟"))
+    am = pd.timedelta_range('09:30:00', '11:30:00', freq=f'{m}min')[1:]
+    pm = pd.timedelta_range('13:00:00', '15:00:00', freq=f'{m}min')[1:]
+    return list(am) + list(pm)
+
+
+def random_walk_bars(n: int, freq: Union[Freq, AnyStr] = Freq.F1, symbol: str = "RW000001",
+                     sdt: str = "20100104", seed: int = 42, price: float = 10.0) -> List[RawBar]:
+    """生成 n 根随机游走K线
+
+    分钟级别K线的时间落在A股交易时段内，日线取工作日，与 BarGenerator 合成高级别K线的规则一致；
+    相同的参数总是生成相同的K线序列。
+
+    :param n: K线数量
+    :param freq: K线周期，支持 1/5/15/30/60 分钟和日线
+    :param symbol: 标的代码
+    :param sdt: 开始日期
+    :param seed: 随机数种子
+    :param price: 初始价格
+    :return: K线序列
+    """
+    if not isinstance(freq, Freq):
+        freq = Freq(freq)
+
+    if freq == Freq.D:
+        offsets = [pd.Timedelta(0)]
+    elif freq in [Freq.F1, Freq.F5, Freq.F15, Freq.F30, Freq.F60]:
+        offsets = session_offsets(freq)
+    else:
+        raise ValueError(f"random_walk_bars 不支持的K线周期：{freq}")
+
+    per_day = len(offsets)
+    days = pd.bdate_range(sdt, periods=n // per_day + 1)
+    dts = (days.values[:, None] + np.array(offsets, dtype='timedelta64[ns]')[None, :]).ravel()[:n]
+
+    # 日线波动率约 2%，按每日K线数量折算到单根K线
+    rng = np.random.default_rng(seed)
+    sigma = 0.02 / np.sqrt(per_day)
+    close = price * np.exp(np.cumsum(rng.normal(0, sigma, n)))
+    open_ = np.r_[price, close[:-1]]
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, sigma / 2, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, sigma / 2, n)))
+    vol = rng.integers(1000, 100000, n).astype(float) * 100
+
+    open_, close, high, low = [np.round(x, 2).tolist() for x in (open_, close, high, low)]
+    amount = (vol * np.array(close)).tolist()
+    vol = vol.tolist()
+    dts = pd.DatetimeIndex(dts).to_pydatetime()
+    return [RawBar(symbol=symbol, id=i, dt=dts[i], freq=freq, open=open_[i], close=close[i],
+                   high=high[i], low=low[i], vol=vol[i], amount=amount[i]) for i in range(n)]
+
+
+def random_walk_ticks(symbols: int = 100, minutes: int = 240, ticks_per_minute: int = 20, sdt: str = "20100104",
+                      seed: int = 42, price: float = 10.0) -> List[Tick]:
+    """生成多个标的的随机游走 Tick 流，按时间升序，时间落在A股交易时段内
+
+    每个标的每分钟 ticks_per_minute 个 Tick，相当于 60 / ticks_per_minute 秒一个快照；vol、amount 是单笔成交量、成交额。
+
+    :param symbols: 标的数量
+    :param minutes: 分钟数量
+    :param ticks_per_minute: 每个标的每分钟的 Tick 数量
+    :param sdt: 开始日期
+    :param seed: 随机数种子
+    :param price: 初始价格
+    :return: Tick 序列
+    """
+    rng = np.random.default_rng(seed)
+    offsets = np.array(session_offsets(Freq.F1), dtype='timedelta64[ns]')
+    days = pd.bdate_range(sdt, periods=minutes // len(offsets) + 1).values
+    ends = (days[:, None] + offsets[None, :]).ravel()[:minutes]
+    step = np.timedelta64(60 * 10 ** 9 // ticks_per_minute, 'ns')
+    dts = (ends[:, None] - np.timedelta64(60, 's') + step * np.arange(1, ticks_per_minute + 1)[None, :]).ravel()
+
+    n = len(dts)
+    codes = [f"RW{i:06d}" for i in range(symbols)]
+    sigma = 0.02 / np.sqrt(240 * ticks_per_minute)
+    prices = np.round(price * np.exp(np.cumsum(rng.normal(0, sigma, (n, symbols)), axis=0)), 2)
+    vols = rng.integers(1, 100, (n, symbols)).astype(float) * 100
+
+    dts = pd.DatetimeIndex(dts).to_pydatetime()
+    prices, vols = prices.tolist(), vols.tolist()
+    return [Tick(symbol=code, price=p, vol=v, dt=dt, amount=p * v)
+            for dt, ps, vs in zip(dts, prices, vols) for code, p, v in zip(codes, ps, vs)]
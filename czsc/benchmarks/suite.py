@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/4/9 10:48
+describe: 分析、K线合成、信号计算、持仓回测全流程的基准测试
+
+每个测试用例由一个 setup 函数定义：setup 完成数据准备，返回 (run, n)，run 是被计时的无参函数，n 是 run 处理的K线数量。
+每个用例先重复执行 repeat 次取最短耗时，再单独执行一次用 tracemalloc 统计内存峰值，结果写入 JSON 格式的报告。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from copy import deepcopy
+from datetime import datetime
+from collections import OrderedDict
+from typing import List, Callable, Tuple
+from czsc.analyze import CZSC
+from czsc.objects import Freq
+from czsc.utils.bar_generator import BarGenerator
+from czsc.traders.base import generate_czsc_signals
+from czsc.traders.dummy import DummyBacktest
+from czsc.strategies import CzscStrategyExample1
+from czsc.utils.tick_aggregator import TickAggregator
+from czsc.benchmarks.mock import random_walk_bars, random_walk_ticks
+
+REPORT_FORMAT = "czsc-benchmark"
+REPORT_VERSION = 1
+
+# 信号计算相关的用例使用 CzscStrategyExample1，基础周期为 30 分钟
+_strategy_freqs = ['30分钟', '60分钟', '日线']
+
+
+def bench_czsc_update(n: int) -> Tuple[Callable, int]:
+    """CZSC.update：逐根输入1分钟K线"""
+    bars = random_walk_bars(n + 3)
+
+    def run():
+        c = CZSC(bars[:3])
+        for bar in bars[3:]:
+            c.update(bar)
+    return run, n
+
+
+def bench_bar_generator_update(n: int) -> Tuple[Callable, int]:
+    """BarGenerator.update：1分钟K线合成 5/15/30/60 分钟和日线"""
+    bars = random_walk_bars(n)
+
+    def run():
+        bg = BarGenerator('1分钟', freqs=['5分钟', '15分钟', '30分钟', '60分钟', '日线'])
+        for bar in bars:
+            bg.update(bar)
+    return run, n
+
+
+def bench_generate_czsc_signals(n: int, init_n: int = 500) -> Tuple[Callable, int]:
+    """generate_czsc_signals：CzscStrategyExample1.get_signals，30分钟K线，前 init_n 根用于初始化"""
+    bars = random_walk_bars(n + init_n, freq=_strategy_freqs[0])
+
+    def run():
+        generate_czsc_signals(bars, CzscStrategyExample1.get_signals, freqs=_strategy_freqs[1:],
+                              sdt=bars[0].dt, init_n=init_n)
+    return run, n
+
+
+def bench_position_update(n: int, init_n: int = 500) -> Tuple[Callable, int]:
+    """Position.update：CzscStrategyExample1 的全部持仓策略逐根输入信号，信号在 setup 中预先计算"""
+    bars = random_walk_bars(n + init_n, freq=_strategy_freqs[0])
+    sigs = generate_czsc_signals(bars, CzscStrategyExample1.get_signals, freqs=_strategy_freqs[1:],
+                                 sdt=bars[0].dt, init_n=init_n)
+    positions = CzscStrategyExample1(symbol=bars[0].symbol).positions
+
+    def run():
+        for pos in deepcopy(positions):
+            for s in sigs:
+                pos.update(s)
+    return run, len(sigs)
+
+
+def bench_one_symbol_dummy(n: int, init_n: int = 500) -> Tuple[Callable, int]:
+    """DummyBacktest.one_symbol_dummy：单个标的的信号计算、持仓回测、结果保存，文件写在临时目录"""
+    bars = random_walk_bars(n + init_n, freq=_strategy_freqs[0])
+    symbol, sdt = bars[0].symbol, bars[0].dt.strftime("%Y%m%d")
+    pos_names = [x.name for x in CzscStrategyExample1(symbol=symbol).positions]
+
+    def run():
+        path = tempfile.mkdtemp(prefix="czsc_benchmark_")
+        try:
+            dbt = DummyBacktest(CzscStrategyExample1, signals_path=os.path.join(path, 'signals'),
+                                results_path=os.path.join(path, 'results'), read_bars=lambda *args, **kw: bars,
+                                sdt=sdt, edt=bars[-1].dt.strftime("%Y%m%d"))
+            dbt.one_symbol_dummy(symbol)
+
+            # one_symbol_dummy 捕获所有异常只记录日志，结果文件不完整说明流程失败，不能作为测试结果
+            missing = [f"{x}.{ext}" for x in pos_names for ext in ('pairs', 'holds')
+                       if not os.path.exists(os.path.join(dbt.poss_path, symbol, f"{x}.{ext}"))]
+            if missing:
+                raise ValueError(f"one_symbol_dummy 没有生成结果文件 {missing}，检查日志中的异常（比如缺少 pyarrow）")
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+    return run, n
+
+
+def bench_tick_aggregator(n: int, symbols: int = 500) -> Tuple[Callable, int]:
+    """TickAggregator.update：symbols 个标的的 Tick 流合成1分钟K线，n 是 Tick 数量"""
+    ticks = random_walk_ticks(symbols, minutes=max(n // (symbols * 20), 1), ticks_per_minute=20)
+
+    def run():
+        agg = TickAggregator(Freq.F1)
+        for tick in ticks:
+            agg.update(tick)
+        agg.flush()
+    return run, len(ticks)
+
+
+CASES = OrderedDict({
+    "czsc_update": bench_czsc_update,
+    "bar_generator_update": bench_bar_generator_update,
+    "generate_czsc_signals": bench_generate_czsc_signals,
+    "position_update": bench_position_update,
+    "one_symbol_dummy": bench_one_symbol_dummy,
+    "tick_aggregator": bench_tick_aggregator,
+})
+
+
+# 默认的K线数量：信号计算相关用例的单根K线耗时较长，使用较少的K线
+default_bars = {
+    "czsc_update": 50000,
+    "bar_generator_update": 50000,
+    "generate_czsc_signals": 3000,
+    "position_update": 3000,
+    "one_symbol_dummy": 3000,
+    "tick_aggregator": 500000,
+}
+
+
+def run_case(name: str, n: int, repeat: int = 3, memory: bool = True) -> dict:
+    """执行单个测试用例
+
+    :param name: 用例名称，见 CASES
+    :param n: K线数量
+    :param repeat: 计时的重复次数，取最短耗时
+    :param memory: 是否统计内存峰值；tracemalloc 会显著拖慢执行，所以单独执行一次
+    :return: 测试结果
+    """
+    run, n = CASES[name](n)
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+
+    best = min(seconds)
+    return {
+        "name": name,
+        "desc": CASES[name].__doc__,
+        "bars": n,
+        "repeat": repeat,
+        "seconds": round(best, 6),
+        "seconds_all": [round(x, 6) for x in seconds],
+        "bars_per_sec": round(n / best, 2),
+        "peak_memory_mb": round(peak, 3) if peak is not None else None,
+    }
+
+
+def run_benchmarks(cases: List[str] = None, bars: dict = None, repeat: int = 3, memory: bool = True) -> dict:
+    """执行基准测试
+
+    :param cases: 用例名称列表，默认执行全部用例
+    :param bars: 各用例的K线数量，默认值见 default_bars
+    :param repeat: 计时的重复次数
+    :param memory: 是否统计内存峰值
+    :return: 测试报告
+    """
+    import czsc
+    cases = cases or list(CASES.keys())
+    bars = {**default_bars, **(bars or {})}
+
+    results = []
+    for name in cases:
+        results.append(run_case(name, bars[name], repeat=repeat, memory=memory))
+
+    return {
+        "format": REPORT_FORMAT,
+        "version": REPORT_VERSION,
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "czsc_version": czsc.__version__,
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "results": results,
+    }
+
+
+def save_report(report: dict, file: str):
+    """保存测试报告"""
+    with open(file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_report(file: str) -> dict:
+    """读取测试报告"""
+    with open(file, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    assert report.get('format') == REPORT_FORMAT, f"{file} 不是基准测试报告"
+    return report
+
+
+def compare_reports(base: dict, new: dict, tolerance: float = 0.1) -> pd.DataFrame:
+    """对比两份测试报告，用于发现性能退化
+
+    :param base: 基准报告
+    :param new: 新报告
+    :param tolerance: 允许的波动比例，吞吐量下降或内存峰值上升超过该比例视为退化
+    :return: 对比结果，每个用例一行
+    """
+    base_map = {x['name']: x for x in base['results']}
+    rows = []
+    for x in new['results']:
+        b = base_map.get(x['name'])
+        if not b:
+            continue
+
+        speed = x['bars_per_sec'] / b['bars_per_sec']
+        memory = None
+        if x['peak_memory_mb'] and b['peak_memory_mb']:
+            memory = x['peak_memory_mb'] / b['peak_memory_mb']
+
+        rows.append({
+            "name": x['name'],
+            "base_bars_per_sec": b['bars_per_sec'],
+            "bars_per_sec": x['bars_per_sec'],
+            "speed_ratio": round(speed, 4),
+            "base_peak_memory_mb": b['peak_memory_mb'],
+            "peak_memory_mb": x['peak_memory_mb'],
+            "memory_ratio": round(memory, 4) if memory is not None else None,
+            "regression": speed < 1 - tolerance or (memory is not None and memory > 1 + tolerance),
+        })
+    return pd.DataFrame(rows)
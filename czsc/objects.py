@@ -5,28 +5,37 @@ email: zeng_bin8888@163.com
 create_dt: 2021/3/10 12:21
 describe: 常用对象结构
 """
+import sys
 import math
 import pandas as pd
 import numpy as np
-from copy import deepcopy
-from dataclasses import dataclass
-from datetime import datetime
+from functools import lru_cache
+from dataclasses import dataclass, field
+from datetime import datetime, date
 from loguru import logger
 from deprecated import deprecated
 from typing import List, Callable
 from czsc.enum import Mark, Direction, Freq, Operate
 from czsc.utils.corr import single_linear
+from czsc.utils.hold_store import HoldStore
 
+# K线、分型、笔等高频创建的对象使用 __slots__ 存储属性，没有 __dict__，可以显著降低内存占用；
+# dataclass 从 Python 3.10 开始支持 slots 参数，低版本退化为普通 dataclass
+slots_dataclass = dataclass(slots=True) if sys.version_info >= (3, 10) else dataclass
 
-@dataclass
+
+@slots_dataclass
 class Tick:
+    """逐笔成交或快照行情"""
     symbol: str
     name: str = ""
     price: float = 0
-    vol: float = 0
+    vol: float = 0  # 成交量，可以是单笔成交量，也可以是当日累计成交量，见 TickAggregator 的 cumulative 参数
+    dt: datetime = None
+    amount: float = 0  # 成交额，与 vol 的口径一致
 
 
-@dataclass
+@slots_dataclass
 class RawBar:
     """原始K线元素"""
     symbol: str
@@ -56,8 +65,12 @@ class RawBar:
         """实体"""
         return abs(self.open - self.close)
 
+    def to_dict(self) -> dict:
+        """转换为字典，替代 __dict__ 的使用"""
+        return {k: getattr(self, k) for k in self.__dataclass_fields__}
 
-@dataclass
+
+@slots_dataclass
 class NewBar:
     """去除包含关系后的K线元素"""
     symbol: str
@@ -70,15 +83,57 @@ class NewBar:
     low: [float, int]
     vol: [float, int]
     amount: [float, int] = None
-    elements: List = None  # 存入具有包含关系的原始K线
+    raw_list: List = None  # 存入具有包含关系的原始K线；设置了 store 时为 None，原始K线按区间从 store 中获取
     cache: dict = None  # cache 用户缓存
+    store: object = None  # 原始K线序列，BarStore 对象
+    start: int = None  # 第一根原始K线在 store 中的全局序号
+    end: int = None  # 最后一根原始K线在 store 中的全局序号 + 1
+    tail: object = None  # 合并时的最后一根原始K线；它在 store 中可能还会被替换，保留合并时的对象
+
+    def __init__(self, symbol: str, id: int, dt: datetime, freq: Freq, open, close, high, low, vol, amount=None,
+                 raw_list: List = None, cache: dict = None, store: object = None, start: int = None,
+                 end: int = None, tail: object = None, *, elements: List = None):
+        """参数与字段一致；elements 是 raw_list 的旧名称，兼容 NewBar(..., elements=[...]) 的写法"""
+        self.symbol = symbol
+        self.id = id
+        self.dt = dt
+        self.freq = freq
+        self.open = open
+        self.close = close
+        self.high = high
+        self.low = low
+        self.vol = vol
+        self.amount = amount
+        self.raw_list = elements if elements is not None else raw_list
+        self.cache = cache
+        self.store = store
+        self.start = start
+        self.end = end
+        self.tail = tail
 
     @property
     def raw_bars(self):
-        return self.elements
+        """构成无包含K线的原始K线；从 store 中获取时，已经从 store 中丢弃的原始K线不再返回"""
+        if self.store is None:
+            return self.raw_list
+        bars = self.store.grange(self.start, self.end)
+        if bars and self.tail is not None:
+            bars[-1] = self.tail
+        return bars
 
+    @property
+    def elements(self):
+        """构成无包含K线的原始K线，raw_bars 的别名"""
+        return self.raw_bars
 
-@dataclass
+    @elements.setter
+    def elements(self, value: List):
+        """直接指定原始K线列表，不再从 store 中获取"""
+        self.raw_list = value
+        self.store = self.start = self.end = self.tail = None
+
+
+@slots_dataclass
 class FX:
     symbol: str
     dt: datetime
@@ -139,7 +194,7 @@ class FX:
         return zg >= zd
 
 
-@dataclass
+@slots_dataclass
 class FakeBI:
     """虚拟笔：主要为笔的内部分析提供便利"""
     symbol: str
@@ -178,7 +233,7 @@ def create_fake_bis(fxs: List[FX]) -> List[FakeBI]:
     return fake_bis
 
 
-@dataclass
+@slots_dataclass
 class BI:
     symbol: str
     fx_a: FX = None  # 笔开始的分型
@@ -187,6 +242,8 @@ class BI:
     direction: Direction = None
     bars: List[NewBar] = None
     cache: dict = None  # cache 用户缓存
+    sdt: datetime = field(init=False, repr=False, compare=False)  # 笔开始时间，由 fx_a 确定
+    edt: datetime = field(init=False, repr=False, compare=False)  # 笔结束时间，由 fx_b 确定
 
     def __post_init__(self):
         self.sdt = self.fx_a.dt
@@ -227,7 +284,7 @@ class BI:
         value = cache.get(key, None)
 
         if not value:
-            value = single_linear([x.__dict__[price_key] for x in self.raw_bars])
+            value = single_linear([getattr(x, price_key) for x in self.raw_bars])
             cache[key] = value
             self.cache = cache
         return value
@@ -578,6 +635,183 @@ class Event:
         return e
 
 
+@lru_cache(maxsize=65536)
+def _parse_signal_value(v: str) -> tuple:
+    """解析信号值，如 '向上_其他_其他_0' -> ('向上', '其他', '其他', 0)；同一个信号值只解析一次"""
+    v1, v2, v3, score = v.split("_")
+    return v1, v2, v3, int(score)
+
+
+def _is_value_match(v: tuple, v1, v2, v3, score) -> bool:
+    """判断解析后的信号值是否满足编译后的信号，v1/v2/v3 为 None 表示任意"""
+    return v[3] >= score and (v1 is None or v[0] == v1) \
+        and (v2 is None or v[1] == v2) and (v3 is None or v[2] == v3)
+
+
+class EventMatcher:
+    """事件匹配器：将一组 Event 编译为信号索引表，每根K线上每个不同的 Signal 只计算一次
+
+    1. 每个不同的 Signal 编译为 (key, v1, v2, v3, score)，"任意" 编译为 None，只登记一次；
+    2. Event / Factor 编译为信号编号元组，结构相同的 Event 共用一个编号；
+    3. 信号、事件的匹配结果在当前K线上按需计算并缓存，多个 Position 共用一个匹配器时，
+       同一根K线上相同的 Signal、Event 只计算一次。
+
+    匹配顺序与 Event.is_match 一致：signals_not -> signals_all -> signals_any -> factors，逐级短路。
+    """
+
+    def __init__(self, events: List[Event] = None):
+        self.signals = []   # 编译后的信号，(key, v1, v2, v3, score)
+        self.events = []    # 编译后的事件，(operate, name, nots, alls, anys, factors)
+        self._signal_ids = {}
+        self._event_ids = {}
+
+        # 当前K线的信号字典及其匹配结果缓存
+        self._s = None
+        self._dt = None
+        self._values = {}
+        self._hits = []
+        self._results = []
+
+        # 信号取值字典，设置后信号字典中对应的值为整数编码，参见 set_categories
+        self.categories = None
+        self._tables = {}
+
+        if events:
+            self.add_events(events)
+
+    def __repr__(self):
+        return f"EventMatcher(signals={len(self.signals)}, events={len(self.events)})"
+
+    def _signal_id(self, signal: Signal) -> int:
+        vs = [None if v == '任意' else v for v in (signal.v1, signal.v2, signal.v3)]
+        sig = (signal.key, vs[0], vs[1], vs[2], signal.score)
+        sid = self._signal_ids.get(sig)
+        if sid is None:
+            sid = self._signal_ids[sig] = len(self.signals)
+            self.signals.append(sig)
+        return sid
+
+    def _signal_ids_of(self, signals: List[Signal]) -> tuple:
+        return tuple(self._signal_id(x) for x in signals) if signals else ()
+
+    def add_events(self, events: List[Event]) -> List[int]:
+        """登记事件，返回事件编号列表；结构相同的事件返回同一个编号
+
+        :param events: 事件列表
+        :return: 事件编号列表
+        """
+        eids = []
+        for event in events:
+            factors = tuple((f.name, self._signal_ids_of(f.signals_not), self._signal_ids_of(f.signals_all),
+                             self._signal_ids_of(f.signals_any)) for f in event.factors)
+            compiled = (event.operate, event.name, self._signal_ids_of(event.signals_not),
+                        self._signal_ids_of(event.signals_all), self._signal_ids_of(event.signals_any), factors)
+            eid = self._event_ids.get(compiled)
+            if eid is None:
+                eid = self._event_ids[compiled] = len(self.events)
+                self.events.append(compiled)
+            eids.append(eid)
+
+        self._s = None
+        return eids
+
+    def set_categories(self, categories: dict) -> None:
+        """设置信号取值字典，之后传入的信号字典中这些信号的值为整数编码
+
+        每个信号按取值字典预先计算出 编码 -> 是否匹配 的查找表，匹配时不再解析信号值字符串。
+
+        :param categories: 信号取值字典，编码 i 对应 categories[key][i]，参见 czsc.utils.sig.signal_codes
+        """
+        self.categories = categories
+        self._tables = {}
+        self._s = None
+
+    def _table(self, sid: int) -> list:
+        table = self._tables.get(sid)
+        if table is None:
+            key, v1, v2, v3, score = self.signals[sid]
+            table = [_is_value_match(_parse_signal_value(x), v1, v2, v3, score) for x in self.categories[key]]
+            self._tables[sid] = table
+        return table
+
+    def reset(self, s: dict) -> None:
+        """切换到新的信号字典，清空上一根K线的匹配结果"""
+        self._s, self._dt = s, s.get('dt')
+        self._values = {}
+        self._hits = [None] * len(self.signals)
+        self._results = [None] * len(self.events)
+
+    def bind(self, s: dict) -> None:
+        """信号字典与当前K线不同时才重置，同一根K线上重复调用不会丢弃已有的匹配结果"""
+        if s is not self._s or s.get('dt') != self._dt:
+            self.reset(s)
+
+    def _hit(self, sid: int) -> bool:
+        hit = self._hits[sid]
+        if hit is None:
+            key, v1, v2, v3, score = self.signals[sid]
+            raw = self._s.get(key, None)
+            # 设置了取值字典的信号也可能直接传入信号值字符串，这时按字符串匹配
+            if self.categories is not None and key in self.categories and not isinstance(raw, str):
+                if raw is None or raw < 0:
+                    raise ValueError(f"{key} 不在信号列表中")
+                hit = self._table(sid)[raw]
+            else:
+                v = self._values.get(key)
+                if v is None:
+                    if not raw:
+                        raise ValueError(f"{key} 不在信号列表中")
+                    v = self._values[key] = _parse_signal_value(raw)
+                hit = _is_value_match(v, v1, v2, v3, score)
+            self._hits[sid] = hit
+        return hit
+
+    def _match(self, event: tuple) -> tuple:
+        hit = self._hit
+        _, _, nots, alls, anys, factors = event
+        for i in nots:
+            if hit(i):
+                return False, None
+        for i in alls:
+            if not hit(i):
+                return False, None
+        if anys:
+            for i in anys:
+                if hit(i):
+                    break
+            else:
+                return False, None
+
+        for name, f_nots, f_alls, f_anys in factors:
+            if any(hit(i) for i in f_nots) or not all(hit(i) for i in f_alls):
+                continue
+            if not f_anys or any(hit(i) for i in f_anys):
+                return True, name
+        return False, None
+
+    def match(self, eid: int) -> tuple:
+        """判断当前K线上编号为 eid 的事件是否满足，返回值与 Event.is_match 相同"""
+        res = self._results[eid]
+        if res is None:
+            res = self._results[eid] = self._match(self.events[eid])
+        return res
+
+    def first_match(self, s: dict, eids: List[int]) -> tuple:
+        """按顺序查找第一个满足的事件
+
+        :param s: 信号字典
+        :param eids: 事件编号列表
+        :return: (operate, op_desc)，没有事件满足时返回 (Operate.HO, "")
+        """
+        self.bind(s)
+        for eid in eids:
+            m, f = self.match(eid)
+            if m:
+                event = self.events[eid]
+                return event[0], f"{event[1]}@{f}"
+        return Operate.HO, ""
+
+
 def cal_break_even_point(seq: List[float]) -> float:
     """计算单笔收益序列的盈亏平衡点
 
@@ -599,9 +833,218 @@ def cal_break_even_point(seq: List[float]) -> float:
     return sub_i / len(seq)
 
 
+def _holds_edges(dts: list, price) -> tuple:
+    """持仓序列的下一根K线收益 n1b 及交易日编号，交易日编号按日期排序
+
+    :param dts: 持仓时间列表
+    :param price: 持仓价格序列
+    :return: (n1b, date_codes)
+    """
+    price = pd.Series(np.asarray(price, dtype=np.float64))
+    trade_date = pd.Series([x.strftime('%Y-%m-%d') for x in dts])
+    # groupby 整数编号比 groupby 日期字符串快得多，按日期排序编号后聚合结果的顺序一致
+    return (price.shift(-1) - price) / price, pd.factorize(trade_date, sort=True)[0]
+
+
+def _holds_metrics(n1b: pd.Series, pos: np.ndarray, date_codes: np.ndarray) -> dict:
+    """按持仓计算 覆盖率、夏普、卡玛、最大回撤、年化收益、日胜率；Position.evaluate_holds、PositionSimulator 共用
+
+    :param n1b: 每个持仓的下一根K线收益，参见 _holds_edges
+    :param pos: 每个持仓的仓位，要求至少有一个非零仓位
+    :param date_codes: 每个持仓的交易日编号，参见 _holds_edges
+    :return: 交易表现
+    """
+    # 持有下一根K线的边际收益，按日期聚合
+    dfv = (n1b * pos).groupby(date_codes).sum()
+    dfv = dfv.cumsum()
+
+    yearly_n = 252
+    yearly_ret = dfv.iloc[-1] * (yearly_n / len(dfv))
+    sharp = dfv.diff().mean() / dfv.diff().std() * pow(yearly_n, 0.5) if dfv.diff().std() != 0 else 0
+    df0 = dfv.shift(1).ffill().fillna(0)
+    mdd = (1 - (df0 + 1) / (df0 + 1).cummax()).max()
+    calmar = yearly_ret / mdd if mdd != 0 else 1
+
+    return {
+        '覆盖率': round(int((pos != 0).sum()) / len(pos), 4),
+        '夏普': round(sharp, 4),
+        '卡玛': round(calmar, 4),
+        '最大回撤': round(mdd, 4),
+        '年化收益': round(yearly_ret, 4),
+        '日胜率': round(sum(dfv > 0) / len(dfv), 4)}
+
+
+class _HoldsAccumulator:
+    """单个交易方向的持仓表现在线统计
+
+    与 Position.evaluate_holds 的计算口径一致：
+    1. 每个持仓的边际收益 edge = (下一根K线价格 / 当前价格 - 1) * pos，在下一个持仓到来时计入所属交易日；
+    2. 交易日内求和（补偿求和），逐日累加得到累计收益 dfv；
+    3. dfv 的逐日差分用于夏普，前一日的累计收益用于最大回撤，dfv > 0 的天数用于日胜率。
+    """
+    __slots__ = ['od', 'n', 'covered', 'last_price', 'last_pos', 'day', 'n_days', 'day_sum', 'day_comp',
+                 'cum_prev', 'd_n', 'd_mean', 'd_m2', 'wins', 'peak', 'mdd']
+
+    def __init__(self, od: int = 0):
+        self.od = od                # 交易方向，1 多头，-1 空头，0 多空
+        self.n = 0                  # 持仓数量
+        self.covered = 0            # 有仓位的持仓数量
+        self.last_price = None
+        self.last_pos = 0
+        self.day = None             # 当前交易日
+        self.n_days = 0             # 交易日数量
+        self.day_sum = 0.0          # 当前交易日的 edge 之和
+        self.day_comp = 0.0         # 当前交易日求和的补偿项
+        self.cum_prev = 0.0         # 截止上一个交易日的累计收益
+        self.d_n = 0                # 已完成交易日的累计收益差分数量、均值、二阶矩
+        self.d_mean = 0.0
+        self.d_m2 = 0.0
+        self.wins = 0               # 已完成交易日中累计收益大于 0 的天数
+        self.peak = 1.0             # 前一日累计收益净值的历史最高值
+        self.mdd = 0.0              # 最大回撤
+
+    def _add_diff(self, x: float) -> None:
+        self.d_n += 1
+        delta = x - self.d_mean
+        self.d_mean += delta / self.d_n
+        self.d_m2 += delta * (x - self.d_mean)
+
+    def _close_day(self) -> None:
+        cum = self.cum_prev + self.day_sum
+        if self.n_days > 1:
+            self._add_diff(cum - self.cum_prev)
+        if cum > 0:
+            self.wins += 1
+
+        # 最大回撤按前一日的累计收益计算，因此在交易日结束时才计入
+        self.peak = max(self.peak, cum + 1)
+        self.mdd = max(self.mdd, 1 - (cum + 1) / self.peak)
+        self.cum_prev = cum
+
+    def update(self, day, pos: int, price: float) -> None:
+        pos = pos if not self.od or pos == self.od else 0
+        if self.last_price:
+            # 前一个持仓的 edge 计入前一个持仓所属的交易日
+            y = (price - self.last_price) / self.last_price * self.last_pos - self.day_comp
+            t = self.day_sum + y
+            self.day_comp = t - self.day_sum - y
+            self.day_sum = t
+
+        if day != self.day:
+            if self.day is not None:
+                self._close_day()
+            self.day = day
+            self.n_days += 1
+            self.day_sum, self.day_comp = 0.0, 0.0
+
+        self.n += 1
+        self.covered += pos != 0
+        self.last_price, self.last_pos = price, pos
+
+    def dump(self) -> dict:
+        """导出累加器的状态，可以 JSON 序列化"""
+        raw = {k: getattr(self, k) for k in self.__slots__}
+        raw['day'] = self.day.isoformat() if self.day is not None else None
+        return raw
+
+    @classmethod
+    def load(cls, raw: dict) -> '_HoldsAccumulator':
+        """dump 的逆过程"""
+        acc = cls()
+        for k in cls.__slots__:
+            setattr(acc, k, raw[k])
+        if acc.day is not None:
+            acc.day = date.fromisoformat(acc.day)
+        return acc
+
+    def result(self) -> dict:
+        cum = self.cum_prev + self.day_sum
+        d_n, d_mean, d_m2 = self.d_n, self.d_mean, self.d_m2
+        if self.n_days > 1:
+            x = cum - self.cum_prev
+            d_n += 1
+            delta = x - d_mean
+            d_mean += delta / d_n
+            d_m2 += delta * (x - d_mean)
+
+        yearly_n = 252
+        yearly_ret = cum * (yearly_n / self.n_days)
+        mean = d_mean if d_n > 0 else np.nan
+        std = math.sqrt(max(d_m2, 0) / (d_n - 1)) if d_n > 1 else np.nan
+        sharp = mean / std * pow(yearly_n, 0.5) if std != 0 else 0
+        calmar = yearly_ret / self.mdd if self.mdd != 0 else 1
+        return {
+            '覆盖率': round(self.covered / self.n, 4),
+            '夏普': round(sharp, 4),
+            '卡玛': round(calmar, 4),
+            '最大回撤': round(self.mdd, 4),
+            '年化收益': round(yearly_ret, 4),
+            '日胜率': round((self.wins + (cum > 0)) / self.n_days, 4),
+        }
+
+
+class HoldsMeter:
+    """Position 持仓表现的在线统计，每个交易方向一份累加器，evaluate_holds 不再需要遍历 holds"""
+
+    def __init__(self):
+        self.n = 0
+        self.sdt = None
+        self.edt = None
+        self.accumulators = {"多空": _HoldsAccumulator(0), "多头": _HoldsAccumulator(1), "空头": _HoldsAccumulator(-1)}
+
+    def update(self, dt: datetime, pos: int, price: float) -> None:
+        """追加一个持仓状态"""
+        day = dt.date()
+        for acc in self.accumulators.values():
+            acc.update(day, pos, price)
+        if self.sdt is None:
+            self.sdt = dt
+        self.edt = dt
+        self.n += 1
+
+    def evaluate(self, trade_dir: str = "多空") -> dict:
+        """按持仓评估交易表现，返回 开始时间、结束时间 及 Position.evaluate_holds 中的各项指标；没有任何仓位时返回空字典"""
+        acc = self.accumulators[trade_dir]
+        if acc.n == 0 or acc.covered == 0:
+            return {}
+
+        p = {"开始时间": self.sdt.strftime('%Y-%m-%d'), "结束时间": self.edt.strftime('%Y-%m-%d')}
+        p.update(acc.result())
+        return p
+
+    def dump(self) -> dict:
+        """导出在线统计的状态，可以 JSON 序列化，用于快照"""
+        return {"n": self.n, "sdt": pd.Timestamp(self.sdt).isoformat() if self.sdt is not None else None,
+                "edt": pd.Timestamp(self.edt).isoformat() if self.edt is not None else None,
+                "accumulators": {k: v.dump() for k, v in self.accumulators.items()}}
+
+    @classmethod
+    def load(cls, raw: dict) -> 'HoldsMeter':
+        """dump 的逆过程，不需要重新遍历持仓状态"""
+        meter = cls()
+        meter.n = raw['n']
+        meter.sdt = pd.Timestamp(raw['sdt']).to_pydatetime() if raw['sdt'] else None
+        meter.edt = pd.Timestamp(raw['edt']).to_pydatetime() if raw['edt'] else None
+        meter.accumulators = {k: _HoldsAccumulator.load(v) for k, v in raw['accumulators'].items()}
+        return meter
+
+    @classmethod
+    def from_holds(cls, holds) -> 'HoldsMeter':
+        """按已有的持仓状态序列重建在线统计
+
+        :param holds: 持仓状态序列，HoldStore 对象
+        :return: HoldsMeter 对象
+        """
+        meter = cls()
+        for dt, pos, price in zip(pd.DatetimeIndex(holds.dt).to_pydatetime(), holds.pos.tolist(),
+                                  holds.price.tolist()):
+            meter.update(dt, pos, price)
+        return meter
+
+
 class Position:
     def __init__(self, symbol: str, opens: List[Event], exits: List[Event] = None, interval: int = 0,
-                 timeout: int = 1000, stop_loss=1000, T0: bool = False, name=None):
+                 timeout: int = 1000, stop_loss=1000, T0: bool = False, name=None, holds_path: str = None):
         """简单持仓对象，仓位表达：1 持有多头，-1 持有空头，0 空仓
 
         :param symbol: 标的代码
@@ -613,6 +1056,8 @@ class Position:
         :param stop_loss: 最大允许亏损比例，单位：BP， 1BP = 0.01%；成本的计算以最近一个开仓事件触发价格为准
         :param T0: 是否允许T0交易，默认为 False 表示不允许T0交易
         :param name: 仓位名称，默认值为第一个开仓事件的名称
+        :param holds_path: 持仓状态的 memmap 文件目录，默认 None 表示保存在内存中；
+                设置后持仓状态超过一百万条时转存到该目录，参见 HoldStore
         """
         self.symbol = symbol
         self.opens = opens
@@ -622,6 +1067,10 @@ class Position:
         for event in self.events:
             assert event.operate in [Operate.LO, Operate.LE, Operate.SO, Operate.SE]
 
+        # 编译后的事件匹配器，CzscTrader 中会替换为所有仓位共用的匹配器
+        self.matcher = EventMatcher()
+        self.event_ids = self.matcher.add_events(self.events)
+
         self.interval = interval
         self.timeout = timeout
         self.stop_loss = stop_loss
@@ -629,7 +1078,7 @@ class Position:
 
         self.pos_changed = False  # 仓位是否发生变化
         self.operates = []  # 事件触发的操作列表
-        self.holds = []  # 持仓状态列表
+        self._holds = HoldStore(spill_path=holds_path)  # 持仓状态序列，列式存储
         self.pos = 0
 
         # 辅助判断的缓存数据
@@ -637,11 +1086,50 @@ class Position:
         self.last_lo_dt = None  # 最近一次开多交易的时间
         self.last_so_dt = None  # 最近一次开空交易的时间
         self.end_dt = None  # 最近一次信号传入的时间
+        self.holds_meter = HoldsMeter()  # 持仓表现的在线统计
 
     def __repr__(self):
         return f"Position(name={self.name}, symbol={self.symbol}, opens={[x.name for x in self.opens]}, " \
                f"timeout={self.timeout}, stop_loss={self.stop_loss}BP, T0={self.T0}, interval={self.interval}s)"
 
+    def __setstate__(self, state):
+        state = dict(state)
+        holds = state.pop('holds', None)
+        self.__dict__.update(state)
+        # 旧版本序列化的对象没有事件匹配器，按开平仓事件重新编译
+        if 'matcher' not in state:
+            self.set_matcher(EventMatcher())
+
+        # 旧版本序列化的对象中 holds 是普通属性（List[dict] 或 HoldStore），转换后按持仓状态重建在线统计
+        if holds is not None:
+            self.holds = holds
+            self.holds_meter = HoldsMeter.from_holds(self.holds)
+
+    @property
+    def holds(self) -> HoldStore:
+        """持仓状态序列，列式存储
+
+        整体赋值时 List[dict] 转换为 HoldStore，同时丢弃持仓表现的在线统计：evaluate_holds 按 holds 重新计算，
+        下一次 update 时按 holds 重建在线统计。不要绕过 update 原地修改 holds，否则在线统计不会更新。
+        """
+        return self._holds
+
+    @holds.setter
+    def holds(self, value):
+        if not isinstance(value, HoldStore):
+            old = self.__dict__.get('_holds')
+            store = HoldStore(spill_path=old.spill_path if old is not None else None)
+            for hold in value:
+                store.append(hold)
+            value = store
+        self._holds = value
+        self.holds_meter = None
+
+    def set_matcher(self, matcher: EventMatcher) -> None:
+        """将开平仓事件登记到共用的事件匹配器中，多个仓位共用时相同的信号在一根K线上只计算一次"""
+        self.event_ids = matcher.add_events(self.events)
+        self.matcher = matcher
+
     def dump(self, with_data=False):
         """将对象转换为 dict"""
         raw = {
@@ -655,9 +1143,24 @@ class Position:
             "T0": self.T0,
         }
         if with_data:
-            raw.update({"pairs": self.pairs, "holds": self.holds})
+            raw.update({"pairs": self.pairs, "holds": list(self.holds)})
         return raw
 
+    @property
+    def holds_df(self) -> pd.DataFrame:
+        """持仓状态 DataFrame，列为 dt, pos, price, bid"""
+        return self.holds.to_frame()
+
+    @property
+    def operates_df(self) -> pd.DataFrame:
+        """操作列表 DataFrame，列为 symbol, dt, bid, price, op, op_desc, pos"""
+        return pd.DataFrame(self.operates, columns=['symbol', 'dt', 'bid', 'price', 'op', 'op_desc', 'pos'])
+
+    @property
+    def pairs_df(self) -> pd.DataFrame:
+        """开平交易 DataFrame，字段参见 pairs"""
+        return pd.DataFrame(self.pairs)
+
     @property
     def pairs(self):
         """开平交易列表
@@ -764,45 +1267,31 @@ class Position:
         :param trade_dir: 交易方向，可选值 ['多头', '空头', '多空']
         :return: 交易表现
         """
-        holds = deepcopy(self.holds)
-        if trade_dir != '多空':
+        meter = self.holds_meter
+        if meter is not None:
+            p = {"交易标的": self.symbol, "策略标记": self.name, "交易方向": trade_dir,
+                 "开始时间": "", "结束时间": "",
+                 '覆盖率': 0, '夏普': 0, '卡玛': 0, '最大回撤': 0, '年化收益': 0, '日胜率': 0}
+            p.update(meter.evaluate(trade_dir))
+            return p
+
+        # holds 被整体赋值后在线统计失效，按 holds 重新计算
+        dfh = self.holds_df
+        if trade_dir != '多空' and len(dfh):
             _OD = 1 if trade_dir == "多头" else -1
-            for hold in holds:
-                if hold['pos'] != 0 and hold['pos'] != _OD:
-                    hold['pos'] = 0
+            dfh.loc[(dfh['pos'] != 0) & (dfh['pos'] != _OD), 'pos'] = 0
 
         p = {"交易标的": self.symbol, "策略标记": self.name, "交易方向": trade_dir,
              "开始时间": "", "结束时间": "",
              '覆盖率': 0, '夏普': 0, '卡玛': 0, '最大回撤': 0, '年化收益': 0, '日胜率': 0}
 
-        if len(holds) == 0 or all(x['pos'] == 0 for x in holds):
+        if len(dfh) == 0 or (dfh['pos'] == 0).all():
             return p
 
-        dfh = pd.DataFrame(holds)
-        dfh['n1b'] = (dfh['price'].shift(-1) - dfh['price']) / dfh['price']
-        dfh['trade_date'] = dfh['dt'].apply(lambda x: x.strftime('%Y-%m-%d'))
-        dfh['edge'] = dfh['n1b'] * dfh['pos']  # 持有下一根K线的边际收益
-
-        # 按日期聚合
-        dfv = dfh.groupby('trade_date')['edge'].sum()
-        dfv = dfv.cumsum()
-
-        yearly_n = 252
-        yearly_ret = dfv.iloc[-1] * (yearly_n / len(dfv))
-        sharp = dfv.diff().mean() / dfv.diff().std() * pow(yearly_n, 0.5) if dfv.diff().std() != 0 else 0
-        df0 = dfv.shift(1).ffill().fillna(0)
-        mdd = (1 - (df0 + 1) / (df0 + 1).cummax()).max()
-        calmar = yearly_ret / mdd if mdd != 0 else 1
-
-        p.update({
-            "开始时间": dfh['dt'].iloc[0].strftime('%Y-%m-%d'),
-            "结束时间": dfh['dt'].iloc[-1].strftime('%Y-%m-%d'),
-            '覆盖率': round(len(dfh[dfh['pos'] != 0]) / len(dfh), 4),
-            '夏普': round(sharp, 4),
-            '卡玛': round(calmar, 4),
-            '最大回撤': round(mdd, 4),
-            '年化收益': round(yearly_ret, 4),
-            '日胜率': round(sum(dfv > 0) / len(dfv), 4)})
+        n1b, date_codes = _holds_edges(dfh['dt'].tolist(), dfh['price'].values)
+        p.update({"开始时间": dfh['dt'].iloc[0].strftime('%Y-%m-%d'),
+                  "结束时间": dfh['dt'].iloc[-1].strftime('%Y-%m-%d')})
+        p.update(_holds_metrics(n1b, dfh['pos'].values, date_codes))
         return p
 
     def evaluate(self, trade_dir: str = "多空") -> dict:
@@ -826,14 +1315,7 @@ class Position:
             return
 
         self.pos_changed = False
-        op = Operate.HO
-        op_desc = ""
-        for event in self.events:
-            m, f = event.is_match(s)
-            if m:
-                op = event.operate
-                op_desc = f"{event.name}@{f}"
-                break
+        op, op_desc = self.matcher.first_match(s, self.event_ids)
 
         symbol, dt, price, bid = s['symbol'], s['dt'], s['close'], s['id']
         self.end_dt = dt
@@ -910,4 +1392,7 @@ class Position:
                 self.pos = 0
                 self.operates.append(__create_operate(Operate.SE, f"平空@{self.timeout}K超时"))
 
-        self.holds.append({"dt": self.end_dt, 'pos': self.pos, 'price': price, 'bid': bid})
+        if self.holds_meter is None:
+            self.holds_meter = HoldsMeter.from_holds(self.holds)
+        self.holds.push(self.end_dt, self.pos, price, bid)
+        self.holds_meter.update(self.end_dt, self.pos, price)
@@ -147,3 +147,11 @@ from czsc.signals.tas import (
 )
 
 
+from czsc.signals.registry import (
+    SignalSpec,
+    SignalRegistry,
+    SignalPlan,
+    default_registry,
+)
+
+from czsc.signals.vector import VecBars
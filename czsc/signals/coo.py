@@ -65,9 +65,9 @@ def coo_td_V221110(c: CZSC, di: int = 1) -> OrderedDict:
     k1, k2, k3 = f"{c.freq.value}_D{di}K_TD".split("_")
 
     if di == 1:
-        close = np.array([x.close for x in c.bars_raw[-50:]])
+        close = c.bars_raw.close[-50:]
     else:
-        close = np.array([x.close for x in c.bars_raw[-50 - di + 1:-di + 1]])
+        close = c.bars_raw.close[-50 - di + 1:-di + 1]
 
     td = __cal_td_seq(close)
     if td[-1] > 0:
@@ -608,11 +608,8 @@ def cxt_second_bs_V230320(c: CZSC, di=1, **kwargs) -> OrderedDict:
 
     b1, b2, b3, b4, b5 = get_sub_elements(c.bi_list, di=di, n=5)
 
-    b1_ma_b = b1.fx_b.raw_bars[-2].cache[cache_key]
-    b3_ma_b = b3.fx_b.raw_bars[-2].cache[cache_key]
-
-    b5_ma_a = b5.fx_a.raw_bars[-2].cache[cache_key]
-    b5_ma_b = b5.fx_b.raw_bars[-2].cache[cache_key]
+    b1_ma_b, b3_ma_b, b5_ma_a, b5_ma_b = c.bars_raw.lookup(cache_key, [
+        b1.fx_b.raw_bars[-2], b3.fx_b.raw_bars[-2], b5.fx_a.raw_bars[-2], b5.fx_b.raw_bars[-2]]).tolist()
 
     lc1 = b1.low < b1_ma_b and b3.low < b3_ma_b
     if b5.direction == Direction.Down and lc1 and b5_ma_a < b5_ma_b:
@@ -654,9 +651,7 @@ def cxt_third_bs_V230318(c: CZSC, di=1, **kwargs) -> OrderedDict:
     if zs_zd > zs_zg:
         return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
 
-    ma_1 = b1.fx_b.raw_bars[-1].cache[cache_key]
-    ma_3 = b3.fx_b.raw_bars[-1].cache[cache_key]
-    ma_5 = b5.fx_b.raw_bars[-1].cache[cache_key]
+    ma_1, ma_3, ma_5 = c.bars_raw.lookup(cache_key, [x.fx_b.raw_bars[-1] for x in (b1, b3, b5)]).tolist()
 
     # 三买：1）123构成中枢，4离开，5回落不回中枢；2）均线新高
     if b5.direction == Direction.Down and b5.low > zs_zg and ma_5 > ma_3 > ma_1:
@@ -704,9 +699,7 @@ def cxt_third_bs_V230319(c: CZSC, di=1, **kwargs) -> OrderedDict:
     if zs_zd > zs_zg:
         return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
 
-    ma_1 = b1.fx_b.raw_bars[-1].cache[cache_key]
-    ma_3 = b3.fx_b.raw_bars[-1].cache[cache_key]
-    ma_5 = b5.fx_b.raw_bars[-1].cache[cache_key]
+    ma_1, ma_3, ma_5 = c.bars_raw.lookup(cache_key, [x.fx_b.raw_bars[-1] for x in (b1, b3, b5)]).tolist()
 
     # 三买：1）123构成中枢，4离开，5回落不回中枢；2）均线新高
     if b5.direction == Direction.Down and b5.low > zs_zg:
@@ -763,16 +756,17 @@ def cxt_bi_end_V230104(c: CZSC, th=50, **kwargs) -> OrderedDict:
     last_bi = c.bi_list[-1]
     bars = get_sub_elements(c.bars_raw, di=1, n=3)
     bar1, bar2, bar3 = bars
+    ma3 = c.bars_raw.column(cache_key)[-1]
 
     lc1 = last_bi.direction == Direction.Down and min([x.low for x in bars]) == last_bi.low
     lc2 = all(x.close > x.open for x in bars)
-    lc3 = bar3.cache[cache_key] * (1 + th / 10000) < bar3.close
+    lc3 = ma3 * (1 + th / 10000) < bar3.close
     if len(c.bars_ubi) < 7 and lc1 and lc2 and lc3:
         v1 = "看多"
 
     sc1 = last_bi.direction == Direction.Up and max([x.high for x in bars]) == last_bi.high
     sc2 = all(x.close < x.open for x in bars)
-    sc3 = bar3.cache[cache_key] * (1 - th / 10000) > bar3.close
+    sc3 = ma3 * (1 - th / 10000) > bar3.close
     if len(c.bars_ubi) < 7 and sc1 and sc2 and sc3:
         v1 = "看空"
 
@@ -809,14 +803,15 @@ def cxt_bi_end_V230105(c: CZSC, th=50, **kwargs) -> OrderedDict:
 
     last_bi = c.bi_list[-1]
     bar1, bar2 = last_bi.fx_b.raw_bars[-2:]
+    ma2 = c.bars_raw.lookup(cache_key, [bar2])[0]
 
     lc1 = last_bi.direction == Direction.Down and bar1.low == last_bi.low
-    lc2 = bar1.close < bar1.open and bar2.close > bar2.cache[cache_key] * (1 + th / 10000) > bar2.open
+    lc2 = bar1.close < bar1.open and bar2.close > ma2 * (1 + th / 10000) > bar2.open
     if len(c.bars_ubi) < 7 and lc1 and lc2:
         v1 = "看多"
 
     sc1 = last_bi.direction == Direction.Up and bar1.high == last_bi.high
-    sc2 = bar1.close > bar1.open and bar2.close < bar2.cache[cache_key] * (1 - th / 10000) < bar2.open
+    sc2 = bar1.close > bar1.open and bar2.close < ma2 * (1 - th / 10000) < bar2.open
     if len(c.bars_ubi) < 7 and sc1 and sc2:
         v1 = "看空"
 
@@ -852,8 +847,7 @@ def cxt_bi_end_V230312(c: CZSC, **kwargs):
 
     last_bi: BI = c.bi_list[-1]
     last_fx: FX = last_bi.fx_b
-    macd1 = last_fx.raw_bars[-1].cache[cache_key]['macd']
-    macd2 = last_fx.raw_bars[0].cache[cache_key]['macd']
+    macd2, macd1 = c.bars_raw.lookup(cache_key, [last_fx.raw_bars[0], last_fx.raw_bars[-1]], 'macd').tolist()
 
     if last_bi.direction == Direction.Down and macd1 > macd2:
         v1 = "看多"
@@ -960,9 +954,8 @@ def cxt_bi_end_V230322(c: CZSC, **kwargs) -> OrderedDict:
 
     last_bi = c.bi_list[-1]
     last_fx = ubi_fxs[-1]
-    max_ma = max([x.cache[cache_key] for x in last_fx.raw_bars])
-    min_ma = min([x.cache[cache_key] for x in last_fx.raw_bars])
-    right_ma = last_fx.raw_bars[-1].cache[cache_key]
+    ma = c.bars_raw.lookup(cache_key, last_fx.raw_bars).tolist()
+    max_ma, min_ma, right_ma = max(ma), min(ma), ma[-1]
 
     if last_bi.direction == Direction.Up:
         if last_fx.mark == Mark.G and right_ma == min_ma:
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/3/26 16:20
+describe: 信号函数注册表与执行计划
+
+1. 信号函数在注册表中声明自己的输入：依赖的指标缓存（update_*_cache 及其参数）、需要的笔数量；
+2. SignalPlan 根据信号配置生成每根K线上的执行计划：相同周期、相同参数的指标只更新一次，
+   参数完全相同的信号配置只执行一次，然后按配置顺序调用信号函数；
+3. SignalPlan 对象可以直接作为 get_signals 传给 CzscSignals、CzscTrader，输出与逐个调用信号函数完全一致。
+
+信号配置示例：
+
+    config = [
+        {"name": "tas_ma_base_V221101", "freq": "日线", "di": 1, "ma_type": "SMA", "timeperiod": 5},
+        {"name": "czsc.signals.tas_macd_base_V221028", "freq": "60分钟", "di": 1, "key": "macd"},
+        {"name": "bxt.get_s_three_bi", "freq": "日线", "di": 1},
+        {"name": "bar_zdt_V221111", "freq": "15分钟", "di": 1},
+    ]
+    plan = SignalPlan(config)
+    print(plan.report())
+"""
+import inspect
+from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Callable, List, Dict, Tuple, Any
+from czsc import envs
+from czsc.utils import import_by_name
+from czsc.signals import bxt, cxt, byi, bar, coo, jcc, tas, vol
+from czsc.signals.tas import update_ma_cache, update_macd_cache, update_kdj_cache, \
+    update_boll_cache, update_boll_cache_V230228, update_rsi_cache
+from czsc.signals.vol import update_vol_ma_cache
+
+
+@dataclass
+class SignalSpec:
+    """信号函数的声明
+
+    :param func: 信号函数
+    :param level: 信号函数的输入，'czsc' 表示输入 CZSC 对象，'trader' 表示输入 CzscSignals 对象
+    :param deps: 依赖的指标缓存，输入为信号函数的参数（已合并函数签名中的默认值），
+        输出为 [(update_*_cache 函数, 参数字典), ...]，参数字典必须写全，用于识别相同的指标
+    :param bi_window: 需要的笔数量，输入同 deps，输出为整数
+    :param freq_arg: level 为 'trader' 时，bi_window 对应的K线周期参数名，如 cxt_sub_b3_V221212 的 freq1
+    :param declared: 是否在注册表中声明过，False 表示使用时自动注册、依赖未知
+    :param vector: 向量化实现，输入为 VecBars 和信号函数的参数，输出为 {信号 key: 信号值数组}，见 czsc.signals.vector
+    """
+    func: Callable
+    level: str = 'czsc'
+    deps: Callable = None
+    bi_window: Callable = None
+    freq_arg: str = None
+    declared: bool = True
+    vector: Callable = None
+
+    @property
+    def name(self):
+        return self.func.__name__
+
+    def params(self, kwargs: dict) -> dict:
+        """合并函数签名中的默认值与配置中的参数"""
+        p = {k: v.default for k, v in inspect.signature(self.func).parameters.items()
+             if v.default is not inspect.Parameter.empty}
+        p.update(kwargs)
+        return p
+
+
+class SignalRegistry:
+    """信号函数注册表，未注册的信号函数在第一次使用时按无依赖自动注册"""
+
+    def __init__(self):
+        self.specs: Dict[Callable, SignalSpec] = {}
+
+    def __repr__(self):
+        return f"<SignalRegistry {len(self.specs)} specs>"
+
+    def __contains__(self, func):
+        return func in self.specs
+
+    def register(self, func: Callable, deps: Callable = None, bi_window=None, freq_arg: str = None,
+                 declared: bool = True) -> SignalSpec:
+        """注册信号函数
+
+        :param func: 信号函数
+        :param deps: 依赖的指标缓存，见 SignalSpec
+        :param bi_window: 需要的笔数量，整数或者输入为信号函数参数的函数
+        :param freq_arg: 见 SignalSpec
+        :param declared: 见 SignalSpec
+        :return: SignalSpec
+        """
+        if isinstance(bi_window, int):
+            bi_window = (lambda n: lambda p: n)(bi_window)
+        first = list(inspect.signature(func).parameters.keys())[0]
+        level = 'trader' if first == 'cat' else 'czsc'
+        spec = SignalSpec(func=func, level=level, deps=deps, bi_window=bi_window, freq_arg=freq_arg,
+                          declared=declared)
+        self.specs[func] = spec
+        return spec
+
+    def vectorize(self, func: Callable):
+        """装饰器，为信号函数 func 注册向量化实现"""
+        def decorator(vector: Callable):
+            spec = self.specs.get(func) or self.register(func)
+            spec.vector = vector
+            return vector
+        return decorator
+
+    def get(self, name) -> SignalSpec:
+        """按名称获取信号函数的声明
+
+        :param name: 信号函数、函数名（如 tas_ma_base_V221101、bxt.get_s_three_bi）或完整路径（如 czsc.signals.cxt.cxt_bi_end_V230222）
+        :return: SignalSpec
+        """
+        func = name if callable(name) else self.resolve(name)
+        spec = self.specs.get(func)
+        if spec is None:
+            spec = self.register(func, declared=False)
+        return spec
+
+    @staticmethod
+    def resolve(name: str) -> Callable:
+        """将信号函数名称解析为函数对象，不带模块名的从 czsc.signals 中查找"""
+        from czsc import signals
+
+        obj = signals
+        try:
+            for x in name.split('.'):
+                obj = getattr(obj, x)
+            return obj
+        except AttributeError:
+            return import_by_name(name)
+
+
+def _ma(ma_type, timeperiod) -> Tuple[Callable, dict]:
+    return update_ma_cache, {"ma_type": ma_type.upper(), "timeperiod": timeperiod}
+
+
+def _vol_ma(ma_type, timeperiod) -> Tuple[Callable, dict]:
+    return update_vol_ma_cache, {"ma_type": ma_type.upper(), "timeperiod": timeperiod}
+
+
+def _macd(p: dict) -> List[Tuple[Callable, dict]]:
+    kw = {"fastperiod": p.get('fastperiod', 12), "slowperiod": p.get('slowperiod', 26),
+          "signalperiod": p.get('signalperiod', 9)}
+    return [(update_macd_cache, kw)]
+
+
+def _kdj(p: dict) -> List[Tuple[Callable, dict]]:
+    kw = {"fastk_period": p.get('fastk_period', 9), "slowk_period": p.get('slowk_period', 3),
+          "slowd_period": p.get('slowd_period', 3)}
+    return [(update_kdj_cache, kw)]
+
+
+def _boll(p: dict) -> List[Tuple[Callable, dict]]:
+    return [(update_boll_cache, {"timeperiod": p.get('timeperiod', 20)})]
+
+
+def _ma_kwargs(timeperiod: int):
+    """均线参数通过 kwargs 传入的信号函数"""
+    return lambda p: [_ma(p.get('ma_type', 'SMA'), p.get('timeperiod', timeperiod))]
+
+
+def _sub_bis(n: int):
+    """通过 get_sub_elements(c.bi_list, di=di, n=n) 读取笔的信号函数"""
+    return lambda p: n + p.get('di', 1) - 1
+
+
+default_registry = SignalRegistry()
+
+# 指标类信号
+# ======================================================================================================================
+for _func in [tas.tas_macd_base_V221028, tas.tas_macd_direct_V221106, tas.tas_macd_power_V221108,
+              tas.tas_macd_first_bs_V221201, tas.tas_macd_first_bs_V221216, tas.tas_macd_second_bs_V221201,
+              tas.tas_macd_xt_V221208, tas.tas_macd_bc_V221201, tas.tas_macd_change_V221105]:
+    default_registry.register(_func, deps=_macd)
+
+for _func in [tas.tas_ma_base_V221101, tas.tas_ma_base_V221203, tas.tas_ma_base_V230313, tas.tas_ma_round_V221206,
+              bar.bar_fang_liang_break_V221216, bar.bar_accelerate_V221118]:
+    default_registry.register(_func, deps=lambda p: [_ma(p['ma_type'], p['timeperiod'])])
+
+default_registry.register(tas.tas_double_ma_V221203, deps=lambda p: [_ma(p['ma_type'], t) for t in p['ma_seq']])
+default_registry.register(tas.tas_boll_power_V221112, deps=_boll)
+default_registry.register(tas.tas_boll_bc_V221118, deps=_boll)
+default_registry.register(tas.tas_boll_vt_V230312, deps=lambda p: [
+    (update_boll_cache_V230228, {"timeperiod": p.get('timeperiod', 20), "nbdev": p.get('nbdev', 20)})])
+default_registry.register(tas.tas_kdj_base_V221101, deps=_kdj)
+default_registry.register(tas.tas_kdj_evc_V221201, deps=_kdj)
+default_registry.register(tas.tas_rsi_base_V230227, deps=lambda p: [(update_rsi_cache, {"timeperiod": p['n']})])
+default_registry.register(tas.tas_double_rsi_V221203, deps=lambda p: [(update_rsi_cache, {"timeperiod": t})
+                                                               for t in p['rsi_seq']])
+default_registry.register(tas.tas_first_bs_V230217, deps=_ma_kwargs(5))
+default_registry.register(tas.tas_second_bs_V230228, deps=_ma_kwargs(20))
+default_registry.register(tas.tas_second_bs_V230303, deps=_ma_kwargs(30))
+default_registry.register(tas.tas_hlma_V230301, deps=lambda p: [_ma(p.get('ma_type', 'SMA'), p['timeperiod'])])
+
+default_registry.register(vol.vol_single_ma_V230214, deps=lambda p: [_vol_ma(p.get('ma_type', 'SMA'), p.get('timeperiod', 5))])
+default_registry.register(vol.vol_double_ma_V230214, deps=lambda p: [_vol_ma(p.get('ma_type', 'SMA'), t)
+                                                              for t in (p['t1'], p['t2'])])
+
+# 笔类信号
+# ======================================================================================================================
+default_registry.register(bxt.get_s_three_bi, bi_window=_sub_bis(3))
+default_registry.register(bxt.get_s_base_xt, bi_window=_sub_bis(7))
+default_registry.register(bxt.get_s_like_bs, bi_window=_sub_bis(13))
+default_registry.register(bxt.get_s_di_bi, bi_window=lambda p: p['di'])
+default_registry.register(bxt.get_s_d0_bi, bi_window=1)
+default_registry.register(bxt.get_s_bi_status, bi_window=1)
+
+default_registry.register(cxt.cxt_first_buy_V221126, bi_window=_sub_bis(21))
+default_registry.register(cxt.cxt_first_sell_V221126, bi_window=_sub_bis(21))
+default_registry.register(cxt.cxt_bi_break_V221126, bi_window=_sub_bis(9))
+default_registry.register(cxt.cxt_third_buy_V230228, bi_window=_sub_bis(14))
+default_registry.register(cxt.cxt_double_zs_V230311, bi_window=_sub_bis(20))
+default_registry.register(cxt.cxt_second_bs_V230320, deps=_ma_kwargs(21), bi_window=_sub_bis(5))
+default_registry.register(cxt.cxt_third_bs_V230318, deps=_ma_kwargs(34), bi_window=_sub_bis(5))
+default_registry.register(cxt.cxt_third_bs_V230319, deps=_ma_kwargs(34), bi_window=_sub_bis(5))
+default_registry.register(cxt.cxt_bi_end_V230104, deps=_ma_kwargs(5), bi_window=1)
+default_registry.register(cxt.cxt_bi_end_V230105, deps=_ma_kwargs(5), bi_window=1)
+default_registry.register(cxt.cxt_bi_end_V230322, deps=_ma_kwargs(5), bi_window=1)
+default_registry.register(cxt.cxt_bi_end_V230312, deps=_macd, bi_window=1)
+for _func in [cxt.cxt_bi_base_V230228, cxt.cxt_bi_end_V230222, cxt.cxt_bi_end_V230224, cxt.cxt_bi_end_V230320,
+              cxt.cxt_bi_status_V230101, cxt.cxt_bi_status_V230102, byi.byi_bi_end_V230106, byi.byi_bi_end_V230107]:
+    default_registry.register(_func, bi_window=1)
+default_registry.register(byi.byi_symmetry_zs_V221107, bi_window=_sub_bis(10))
+default_registry.register(cxt.cxt_sub_b3_V221212, bi_window=13, freq_arg='freq1')
+default_registry.register(cxt.cxt_zhong_shu_gong_zhen_V221221, bi_window=3, freq_arg='freq1')
+default_registry.register(cxt.cxt_fx_power_V221107)
+
+# 只读取K线的信号
+# ======================================================================================================================
+for _module in [bar, jcc, coo, vol, tas]:
+    for _name, _func in vars(_module).items():
+        if _name.startswith(_module.__name__.rsplit('.', 1)[-1] + '_') and inspect.isfunction(_func) \
+                and _func.__module__ == _module.__name__ and _func not in default_registry:
+            default_registry.register(_func)
+
+
+class SignalPlan:
+    """按信号配置生成的执行计划，可以直接作为 get_signals 使用"""
+
+    def __init__(self, config: List[Dict[str, Any]], registry: SignalRegistry = default_registry):
+        """
+
+        :param config: 信号配置列表，每个配置包含 name（信号函数名称）、freq（K线周期）以及信号函数的其他参数；
+            输入为 CzscSignals 对象的信号函数（如 bar_zdt_V221111），freq 作为参数原样传入
+        :param registry: 信号函数注册表，默认使用 default_registry
+        """
+        self.config = config
+        self.tasks = []         # [(SignalSpec, freq, kwargs), ...]，去掉了重复的信号配置
+        self.nodes = []         # [(freq, update_*_cache, kwargs), ...]，去掉了重复的指标
+        self.bi_window = {}     # freq -> 需要的最大笔数量
+        self.naive_deps = 0     # 逐个调用信号函数时，每根K线上的指标更新次数
+        self.undeclared = []    # 没有在注册表中声明的信号函数
+        self.n_calls = 0
+        self._seen_tasks, self._seen_nodes = set(), set()
+
+        # 只保留解析后的 SignalSpec，不持有注册表：注册表中的 deprecated 函数无法被 dill 序列化
+        for conf in config:
+            conf = dict(conf)
+            spec = registry.get(conf.pop('name'))
+            freq = conf.get('freq') if spec.level == 'trader' else conf.pop('freq')
+            self._add(spec, freq, conf)
+
+    @classmethod
+    def from_tasks(cls, tasks: List[tuple]) -> 'SignalPlan':
+        """按已经解析好的信号任务创建执行计划
+
+        :param tasks: [(SignalSpec, freq, kwargs), ...]，格式同 SignalPlan.tasks
+        :return: SignalPlan 对象
+        """
+        plan = cls([])
+        for spec, freq, kw in tasks:
+            conf = {'name': spec.name, **kw}
+            if spec.level != 'trader':
+                conf['freq'] = freq
+            plan.config.append(conf)
+            plan._add(spec, freq, dict(kw))
+        return plan
+
+    def _add(self, spec: SignalSpec, freq: str, conf: dict) -> None:
+        p = spec.params(conf)
+        deps = spec.deps(p) if spec.deps and spec.level == 'czsc' else []
+        self.naive_deps += len(deps)
+
+        task_key = (spec.func, freq, self._hashable(conf))
+        if task_key in self._seen_tasks:
+            return
+        self._seen_tasks.add(task_key)
+        self.tasks.append((spec, freq, conf))
+
+        for updater, kw in deps:
+            node_key = (freq, updater, self._hashable(kw))
+            if node_key not in self._seen_nodes:
+                self._seen_nodes.add(node_key)
+                self.nodes.append((freq, updater, kw))
+        if spec.bi_window:
+            bi_freq = p[spec.freq_arg] if spec.freq_arg else freq
+            self.bi_window[bi_freq] = max(self.bi_window.get(bi_freq, 0), spec.bi_window(p))
+        if not spec.declared and spec.name not in self.undeclared:
+            self.undeclared.append(spec.name)
+
+    def __repr__(self):
+        return f"<SignalPlan {len(self.tasks)} signals, {len(self.nodes)} indicators>"
+
+    @staticmethod
+    def _hashable(kwargs: dict) -> tuple:
+        return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in kwargs.items()))
+
+    @property
+    def freqs(self) -> List[str]:
+        """执行计划中用到的K线周期"""
+        freqs = [freq for _, freq, _ in self.tasks] + list(self.bi_window.keys())
+        return [x for x in dict.fromkeys(freqs) if x]
+
+    def __call__(self, cat) -> OrderedDict:
+        """计算 CzscSignals 对象最新K线上的全部信号
+
+        :param cat: CzscSignals 对象
+        :return: 信号字典
+        """
+        s = OrderedDict({"symbol": cat.symbol, "dt": cat.end_dt, "close": cat.latest_price})
+        kas = cat.kas
+        for freq, updater, kw in self.nodes:
+            updater(kas[freq], **kw)
+        for spec, freq, kw in self.tasks:
+            if spec.level == 'trader':
+                s.update(spec.func(cat, **kw))
+            else:
+                s.update(spec.func(kas[freq], **kw))
+        self.n_calls += 1
+        return s
+
+    def report(self, max_bi_num: int = None) -> dict:
+        """执行计划的去重情况
+
+        :param max_bi_num: CZSC 对象最大保留的笔数量，默认读取环境变量
+        :return: 字典，包括信号配置数量、去重后的信号数量、每根K线上的指标更新次数（逐个调用 / 执行计划）、
+            每根K线上节省的调用次数（重复的信号配置 + 重复的指标更新）、已执行的K线数量与累计节省的调用次数、
+            各周期需要的笔数量，以及没有在注册表中声明的信号函数
+        """
+        max_bi_num = max_bi_num or envs.get_max_bi_num()
+        saved = len(self.config) - len(self.tasks) + self.naive_deps - len(self.nodes)
+        return {
+            "signals": len(self.config),
+            "signals_planned": len(self.tasks),
+            "indicator_updates_naive": self.naive_deps,
+            "indicator_updates_planned": len(self.nodes),
+            "saved_per_bar": saved,
+            "bars": self.n_calls,
+            "saved_total": saved * self.n_calls,
+            "bi_window": dict(self.bi_window),
+            "max_bi_num": max_bi_num,
+            "bi_window_ok": all(n <= max_bi_num for n in self.bi_window.values()),
+            "undeclared": self.undeclared,
+        }
@@ -17,9 +17,14 @@ import numpy as np
 from czsc.analyze import CZSC
 from czsc.objects import Signal, Direction, BI, RawBar
 from czsc.utils import get_sub_elements, fast_slow_cross, count_last_same, create_single_signal
+from czsc.utils.stream_ta import stream_ma, StreamMACD, StreamBOLL, StreamSTOCH, StreamRSI, boll_bands
 from collections import OrderedDict
 
 
+# 使用流式指标引擎增量计算的均线类型，其他类型仍然用 ta-lib 计算
+stream_ma_types = ('SMA', 'EMA', 'WMA')
+
+
 def update_ma_cache(c: CZSC, ma_type: str, timeperiod: int, **kwargs):
     """更新均线缓存
 
@@ -42,29 +47,28 @@ def update_ma_cache(c: CZSC, ma_type: str, timeperiod: int, **kwargs):
     ma_type = ma_type.upper()
     assert ma_type in ma_type_map.keys(), f"{ma_type} 不是支持的均线类型，可选值：{list(ma_type_map.keys())}"
     cache_key = f"{ma_type.upper()}{timeperiod}"
-    if c.bars_raw[-1].cache and c.bars_raw[-1].cache.get(cache_key, None):
+    if ma_type in stream_ma_types:
+        return c.indicators.update(c.bars_raw, cache_key, lambda: stream_ma(ma_type, timeperiod),
+                                   fmt=lambda v, x: v if v else x[0])
+
+    bars = c.bars_raw
+    if bars.has_value(cache_key, -1):
         # 如果最后一根K线已经有对应的缓存，不执行更新
         return cache_key
 
-    last_cache = dict(c.bars_raw[-2].cache) if c.bars_raw[-2].cache else dict()
-    if cache_key not in last_cache.keys() or len(c.bars_raw) < timeperiod + 15:
+    if not bars.has_value(cache_key, -2) or len(bars) < timeperiod + 15:
         # 初始化缓存
-        close = np.array([x.close for x in c.bars_raw])
+        close = bars.close
         ma = ta.MA(close, timeperiod=timeperiod, matype=ma_type_map[ma_type.upper()])
         assert len(ma) == len(close)
-        for i in range(len(close)):
-            _c = dict(c.bars_raw[i].cache) if c.bars_raw[i].cache else dict()
-            _c.update({cache_key: ma[i] if ma[i] else close[i]})
-            c.bars_raw[i].cache = _c
+        bars.add_column(cache_key)
+        bars.set_column(cache_key, np.where(ma != 0, ma, close))
 
     else:
         # 增量更新最近5个K线缓存
-        close = np.array([x.close for x in c.bars_raw[-timeperiod - 10:]])
+        close = bars.close[-timeperiod - 10:]
         ma = ta.MA(close, timeperiod=timeperiod, matype=ma_type_map[ma_type.upper()])
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: ma[-i]})
-            c.bars_raw[-i].cache = _c
+        bars.set_column(cache_key, ma[-5:], start=-5)
     return cache_key
 
 
@@ -77,36 +81,16 @@ def update_macd_cache(c: CZSC, **kwargs):
     fastperiod = kwargs.get('fastperiod', 12)
     slowperiod = kwargs.get('slowperiod', 26)
     signalperiod = kwargs.get('signalperiod', 9)
-
     cache_key = f"MACD{fastperiod}#{slowperiod}#{signalperiod}"
-    if c.bars_raw[-1].cache and c.bars_raw[-1].cache.get(cache_key, None):
-        # 如果最后一根K线已经有对应的缓存，不执行更新
-        return cache_key
-
-    min_count = signalperiod + slowperiod
-    last_cache = dict(c.bars_raw[-2].cache) if c.bars_raw[-2].cache else dict()
-    if cache_key not in last_cache.keys() or len(c.bars_raw) < min_count + 15:
-        # 初始化缓存
-        close = np.array([x.close for x in c.bars_raw])
-        dif, dea, macd = ta.MACD(close, fastperiod=fastperiod, slowperiod=slowperiod, signalperiod=signalperiod)
-        for i in range(len(close)):
-            _c = dict(c.bars_raw[i].cache) if c.bars_raw[i].cache else dict()
-            dif_i = dif[i] if dif[i] else close[i]
-            dea_i = dea[i] if dea[i] else close[i]
-            macd_i = dif_i - dea_i
-            _c.update({cache_key: {'dif': dif_i, 'dea': dea_i, 'macd': macd_i}})
-            c.bars_raw[i].cache = _c
 
-    else:
-        # 增量更新最近5个K线缓存
-        close = np.array([x.close for x in c.bars_raw[-min_count - 10:]])
-        dif, dea, macd = ta.MACD(close, fastperiod=fastperiod, slowperiod=slowperiod, signalperiod=signalperiod)
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: {'dif': dif[-i], 'dea': dea[-i], 'macd': macd[-i]}})
-            c.bars_raw[-i].cache = _c
+    def __fmt(v, x):
+        dif, dea, _ = v
+        dif = dif if dif else x[0]
+        dea = dea if dea else x[0]
+        return dif, dea, dif - dea
 
-    return cache_key
+    return c.indicators.update(c.bars_raw, cache_key, lambda: StreamMACD(fastperiod, slowperiod, signalperiod),
+                               fmt=__fmt, names=('dif', 'dea', 'macd'))
 
 
 def update_boll_cache_V230228(c: CZSC, **kwargs):
@@ -119,36 +103,15 @@ def update_boll_cache_V230228(c: CZSC, **kwargs):
     nbdev = int(kwargs.get('nbdev', 20)) / 10   # 标准差倍数，计算时除以10，如20表示2.0，即2倍标准差
     cache_key = f"BOLL{timeperiod}S{nbdev}"
 
-    if c.bars_raw[-1].cache and c.bars_raw[-1].cache.get(cache_key, None):
-        # 如果最后一根K线已经有对应的缓存，不执行更新
-        return cache_key
+    def __fmt(v, x):
+        m, std = v
+        if not m:
+            return x[0], x[0], x[0]
+        u1, l1 = boll_bands(m, std, nbdev)
+        return u1, m, l1
 
-    last_cache = dict(c.bars_raw[-2].cache) if c.bars_raw[-2].cache else dict()
-    if cache_key not in last_cache.keys() or len(c.bars_raw) < timeperiod + 15:
-        # 初始化缓存
-        close = np.array([x.close for x in c.bars_raw])
-        u1, m, l1 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=nbdev, nbdevdn=nbdev, matype=0)
-
-        for i in range(len(close)):
-            _c = dict(c.bars_raw[i].cache) if c.bars_raw[i].cache else dict()
-            if not m[i]:
-                _data = {"上轨": close[i], "中线": close[i], "下轨": close[i]}
-            else:
-                _data = {"上轨": u1[i], "中线": m[i], "下轨": l1[i]}
-            _c.update({cache_key: _data})
-            c.bars_raw[i].cache = _c
-
-    else:
-        # 增量更新最近5个K线缓存
-        close = np.array([x.close for x in c.bars_raw[-timeperiod - 10:]])
-        u1, m, l1 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=nbdev, nbdevdn=nbdev, matype=0)
-
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: {"上轨": u1[-i], "中线": m[-i], "下轨": l1[-i]}})
-            c.bars_raw[-i].cache = _c
-
-    return cache_key
+    return c.indicators.update(c.bars_raw, cache_key, lambda: StreamBOLL(timeperiod), fmt=__fmt,
+                               names=("上轨", "中线", "下轨"))
 
 
 def update_boll_cache(c: CZSC, **kwargs):
@@ -159,48 +122,17 @@ def update_boll_cache(c: CZSC, **kwargs):
     """
     timeperiod = kwargs.get('timeperiod', 20)
     cache_key = f"BOLL{timeperiod}"
-
-    if c.bars_raw[-1].cache and c.bars_raw[-1].cache.get(cache_key, None):
-        # 如果最后一根K线已经有对应的缓存，不执行更新
-        return cache_key
-
     dev_seq = (1.382, 2, 2.764)
-    last_cache = dict(c.bars_raw[-2].cache) if c.bars_raw[-2].cache else dict()
-    if cache_key not in last_cache.keys() or len(c.bars_raw) < timeperiod + 15:
-        # 初始化缓存
-        close = np.array([x.close for x in c.bars_raw])
-        u1, m, l1 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=dev_seq[0], nbdevdn=dev_seq[0], matype=0)
-        u2, m, l2 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=dev_seq[1], nbdevdn=dev_seq[1], matype=0)
-        u3, m, l3 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=dev_seq[2], nbdevdn=dev_seq[2], matype=0)
-
-        for i in range(len(close)):
-            _c = dict(c.bars_raw[i].cache) if c.bars_raw[i].cache else dict()
-            if not m[i]:
-                _data = {"上轨3": close[i], "上轨2": close[i], "上轨1": close[i],
-                         "中线": close[i],
-                         "下轨1": close[i], "下轨2": close[i], "下轨3": close[i]}
-            else:
-                _data = {"上轨3": u3[i], "上轨2": u2[i], "上轨1": u1[i],
-                         "中线": m[i],
-                         "下轨1": l1[i], "下轨2": l2[i], "下轨3": l3[i]}
-            _c.update({cache_key: _data})
-            c.bars_raw[i].cache = _c
 
-    else:
-        # 增量更新最近5个K线缓存
-        close = np.array([x.close for x in c.bars_raw[-timeperiod - 10:]])
-        u1, m, l1 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=dev_seq[0], nbdevdn=dev_seq[0], matype=0)
-        u2, m, l2 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=dev_seq[1], nbdevdn=dev_seq[1], matype=0)
-        u3, m, l3 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=dev_seq[2], nbdevdn=dev_seq[2], matype=0)
-
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: {"上轨3": u3[-i], "上轨2": u2[-i], "上轨1": u1[-i],
-                                   "中线": m[-i],
-                                   "下轨1": l1[-i], "下轨2": l2[-i], "下轨3": l3[-i]}})
-            c.bars_raw[-i].cache = _c
+    def __fmt(v, x):
+        m, std = v
+        if not m:
+            return (x[0],) * 7
+        (u1, l1), (u2, l2), (u3, l3) = [boll_bands(m, std, dev) for dev in dev_seq]
+        return u3, u2, u1, m, l1, l2, l3
 
-    return cache_key
+    return c.indicators.update(c.bars_raw, cache_key, lambda: StreamBOLL(timeperiod), fmt=__fmt,
+                               names=("上轨3", "上轨2", "上轨1", "中线", "下轨1", "下轨2", "下轨3"))
 
 
 def tas_boll_vt_V230312(c: CZSC, di: int = 1, **kwargs) -> OrderedDict:
@@ -228,10 +160,12 @@ def tas_boll_vt_V230312(c: CZSC, di: int = 1, **kwargs) -> OrderedDict:
     if len(_bars) < max_overlap + 1:
         return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
 
-    if _bars[-1].close > _bars[-1].cache[key]['上轨'] and any([x.close < x.cache[key]['上轨'] for x in _bars]):
+    upper = get_sub_elements(c.bars_raw.column(key, '上轨'), di=di, n=max_overlap + 1).tolist()
+    lower = get_sub_elements(c.bars_raw.column(key, '下轨'), di=di, n=max_overlap + 1).tolist()
+    if _bars[-1].close > upper[-1] and any([x.close < v for x, v in zip(_bars, upper)]):
         v1 = "看多"
 
-    elif _bars[-1].close < _bars[-1].cache[key]['下轨'] and any([x.close > x.cache[key]['下轨'] for x in _bars]):
+    elif _bars[-1].close < lower[-1] and any([x.close > v for x, v in zip(_bars, lower)]):
         v1 = "看空"
 
     return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
@@ -263,7 +197,7 @@ def tas_macd_base_V221028(c: CZSC, di: int = 1, key="macd", **kwargs) -> Ordered
     assert key.lower() in ['macd', 'dif', 'dea']
     k1, k2, k3 = f"{c.freq.value}_D{di}K_{key.upper()}".split('_')
 
-    macd = [x.cache[cache_key][key.lower()] for x in c.bars_raw[-5 - di:]]
+    macd = c.bars_raw.column(cache_key, key.lower())[-5 - di:].tolist()
     v1 = "多头" if macd[-di] >= 0 else "空头"
     v2 = "向上" if macd[-di] >= macd[-di - 1] else "向下"
 
@@ -287,8 +221,7 @@ def tas_macd_direct_V221106(c: CZSC, di: int = 1, **kwargs) -> OrderedDict:
     """
     cache_key = update_macd_cache(c, **kwargs)
     k1, k2, k3 = f"{c.freq.value}_D{di}K_MACD方向".split("_")
-    bars = get_sub_elements(c.bars_raw, di=di, n=3)
-    macd = [x.cache[cache_key]['macd'] for x in bars]
+    macd = get_sub_elements(c.bars_raw.column(cache_key, 'macd'), di=di, n=3).tolist()
 
     if len(macd) != 3:
         v1 = "模糊"
@@ -330,8 +263,7 @@ def tas_macd_power_V221108(c: CZSC, di: int = 1, **kwargs) -> OrderedDict:
 
     v1 = "其他"
     if len(c.bars_raw) > di + 10:
-        bar = c.bars_raw[-di]
-        dif, dea = bar.cache[cache_key]['dif'], bar.cache[cache_key]['dea']
+        dif, dea = c.bars_raw.column(cache_key)[:2, -di].tolist()
 
         if dif >= dea >= 0:
             v1 = "超强"
@@ -367,9 +299,7 @@ def tas_macd_first_bs_V221201(c: CZSC, di: int = 1, **kwargs):
 
     v1 = "其他"
     if len(bars) >= 100:
-        dif = [x.cache[cache_key]['dif'] for x in bars]
-        dea = [x.cache[cache_key]['dea'] for x in bars]
-        macd = [x.cache[cache_key]['macd'] for x in bars]
+        dif, dea, macd = get_sub_elements(c.bars_raw.column(cache_key).T, di=di, n=300).T.tolist()
 
         cross = fast_slow_cross(dif, dea)
         up = [x for x in cross if x['类型'] == "金叉" and x['距离'] > 5]
@@ -416,9 +346,7 @@ def tas_macd_first_bs_V221216(c: CZSC, di: int = 1, **kwargs):
     v1 = "其他"
     v2 = "任意"
     if len(bars) >= 100:
-        dif = [x.cache[cache_key]['dif'] for x in bars]
-        dea = [x.cache[cache_key]['dea'] for x in bars]
-        macd = [x.cache[cache_key]['macd'] for x in bars]
+        dif, dea, macd = get_sub_elements(c.bars_raw.column(cache_key).T, di=di, n=300).T.tolist()
         n_bars = bars[-10:]
         m_bars = bars[-100: -10]
         high_n = max([x.high for x in n_bars])
@@ -475,9 +403,7 @@ def tas_macd_second_bs_V221201(c: CZSC, di: int = 1, **kwargs):
     v1 = "其他"
     v2 = "任意"
     if len(bars) >= 100:
-        dif = [x.cache[cache_key]['dif'] for x in bars]
-        dea = [x.cache[cache_key]['dea'] for x in bars]
-        macd = [x.cache[cache_key]['macd'] for x in bars]
+        dif, dea, macd = get_sub_elements(c.bars_raw.column(cache_key).T, di=di, n=350)[50:].T.tolist()
 
         cross = fast_slow_cross(dif, dea)
         up = [x for x in cross if x['类型'] == "金叉" and x['距离'] > 5]
@@ -524,8 +450,7 @@ def tas_macd_xt_V221208(c: CZSC, di: int = 1, **kwargs):
     """
     cache_key = update_macd_cache(c, **kwargs)
     k1, k2, k3 = f"{c.freq.value}_D{di}K_MACD形态".split('_')
-    bars = get_sub_elements(c.bars_raw, di=di, n=5)
-    macd = [x.cache[cache_key]['macd'] for x in bars]
+    macd = get_sub_elements(c.bars_raw.column(cache_key, 'macd'), di=di, n=5).tolist()
 
     v1 = "其他"
     if len(macd) == 5:
@@ -578,10 +503,11 @@ def tas_macd_bc_V221201(c: CZSC, di: int = 1, n: int = 3, m: int = 50, **kwargs)
         n_bars = bars[-n:]
         m_bars = bars[:m]
         assert len(n_bars) == n and len(m_bars) == m
+        macd = get_sub_elements(c.bars_raw.column(cache_key, 'macd'), di=di, n=n + m).tolist()
         n_close = [x.close for x in n_bars]
-        n_macd = [x.cache[cache_key]['macd'] for x in n_bars]
+        n_macd = macd[-n:]
         m_close = [x.close for x in m_bars]
-        m_macd = [x.cache[cache_key]['macd'] for x in m_bars]
+        m_macd = macd[:m]
 
         if n_macd[-1] > n_macd[-2] and min(n_close) < min(m_close) and min(n_macd) > min(m_macd):
             v1 = '底部'
@@ -620,9 +546,7 @@ def tas_macd_change_V221105(c: CZSC, di: int = 1, n: int = 55, **kwargs) -> Orde
     cache_key = update_macd_cache(c, **kwargs)
     k1, k2, k3 = f"{c.freq.value}_D{di}K{n}_MACD变色次数".split('_')
 
-    bars = get_sub_elements(c.bars_raw, di=di, n=n)
-    dif = [x.cache[cache_key]['dif'] for x in bars]
-    dea = [x.cache[cache_key]['dea'] for x in bars]
+    dif, dea = get_sub_elements(c.bars_raw.column(cache_key)[:2].T, di=di, n=n).T.tolist()
 
     cross = fast_slow_cross(dif, dea)
     # 过滤低级别信号抖动造成的金叉死叉(这个参数根据自身需要进行修改）
@@ -681,8 +605,9 @@ def tas_ma_base_V221101(c: CZSC, di: int = 1, ma_type='SMA', timeperiod=5) -> Or
     key = update_ma_cache(c, ma_type, timeperiod)
     k1, k2, k3 = f"{c.freq.value}_D{di}K_{key}".split('_')
     bars = get_sub_elements(c.bars_raw, di=di, n=3)
-    v1 = "多头" if bars[-1].close >= bars[-1].cache[key] else "空头"
-    v2 = "向上" if bars[-1].cache[key] >= bars[-2].cache[key] else "向下"
+    ma = get_sub_elements(c.bars_raw.column(key), di=di, n=3).tolist()
+    v1 = "多头" if bars[-1].close >= ma[-1] else "空头"
+    v2 = "向上" if ma[-1] >= ma[-2] else "向下"
     return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1, v2=v2)
 
 
@@ -716,10 +641,11 @@ def tas_ma_base_V221203(c: CZSC, di: int = 1, ma_type='SMA', timeperiod=5, th=10
     key = update_ma_cache(c, ma_type, timeperiod)
     k1, k2, k3 = f"{c.freq.value}_D{di}T{th}_{key}".split('_')
     bars = get_sub_elements(c.bars_raw, di=di, n=3)
+    ma = get_sub_elements(c.bars_raw.column(key), di=di, n=3).tolist()
     c = bars[-1].close
-    m = bars[-1].cache[key]
+    m = ma[-1]
     v1 = "多头" if c >= m else "空头"
-    v2 = "向上" if bars[-1].cache[key] >= bars[-2].cache[key] else "向下"
+    v2 = "向上" if ma[-1] >= ma[-2] else "向下"
     v3 = "远离" if (abs(c - m) / m) * 10000 > th else "靠近"
     return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1, v2=v2, v3=v3)
 
@@ -755,14 +681,15 @@ def tas_ma_base_V230313(c: CZSC, di: int = 1, ma_type='SMA', timeperiod=5, **kwa
     if len(bars) < max_overlap + 1:
         return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
 
-    if bars[-1].close >= bars[-1].cache[key] and not all(x.close > x.cache[key] for x in bars):
+    ma = get_sub_elements(c.bars_raw.column(key), di=di, n=max_overlap + 1).tolist()
+    if bars[-1].close >= ma[-1] and not all(x.close > m for x, m in zip(bars, ma)):
         v1 = "看多"
-    elif bars[-1].close < bars[-1].cache[key] and not all(x.close < x.cache[key] for x in bars):
+    elif bars[-1].close < ma[-1] and not all(x.close < m for x, m in zip(bars, ma)):
         v1 = "看空"
     else:
         return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
 
-    v2 = "向上" if bars[-1].cache[key] >= bars[-2].cache[key] else "向下"
+    v2 = "向上" if ma[-1] >= ma[-2] else "向下"
     return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1, v2=v2)
 
 
@@ -791,7 +718,7 @@ def tas_ma_round_V221206(c: CZSC, di: int = 1, ma_type='SMA', timeperiod=60, th:
     v1 = "其他"
     if len(c.bi_list) > di + 3:
         last_bi = c.bi_list[-di]
-        last_ma = np.mean([x.cache[key] for x in last_bi.fx_b.new_bars[1].raw_bars])
+        last_ma = np.mean(c.bars_raw.lookup(key, last_bi.fx_b.new_bars[1].raw_bars))
         bi_change = last_bi.power_price
 
         if last_bi.direction == Direction.Up and abs(last_bi.high - last_ma) / bi_change < th / 100:
@@ -829,9 +756,8 @@ def tas_double_ma_V221203(c: CZSC, di: int = 1, ma_type='SMA', ma_seq=(5, 10), t
     ma2 = update_ma_cache(c, ma_type, ma_seq[1])
 
     k1, k2, k3 = f"{c.freq.value}_D{di}T{th}_{ma1}{ma2}".split('_')
-    bars = get_sub_elements(c.bars_raw, di=di, n=3)
-    ma1v = bars[-1].cache[ma1]
-    ma2v = bars[-1].cache[ma2]
+    ma1v = get_sub_elements(c.bars_raw.column(ma1), di=di, n=3)[-1]
+    ma2v = get_sub_elements(c.bars_raw.column(ma2), di=di, n=3)[-1]
     v1 = "多头" if ma1v >= ma2v else "空头"
     v2 = "强势" if (abs(ma1v - ma2v) / ma2v) * 10000 >= th else "弱势"
     return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1, v2=v2)
@@ -872,7 +798,7 @@ def tas_boll_power_V221112(c: CZSC, di: int = 1, **kwargs):
 
     else:
         last = c.bars_raw[-di]
-        cache = last.cache[cache_key]
+        cache = c.bars_raw.get_value(cache_key, c.bars_raw.offset + len(c.bars_raw) - di)
 
         latest_c = last.close
         m = cache['中线']
@@ -919,12 +845,16 @@ def tas_boll_bc_V221118(c: CZSC, di=1, n=3, m=10, line=3, **kwargs):
     bm = get_sub_elements(c.bars_raw, di=di, n=m)
 
     d_c1 = min([x.low for x in bn]) <= min([x.low for x in bm])
-    d_c2 = sum([x.close < x.cache[cache_key][f'下轨{line}'] for x in bm]) > 1
-    d_c3 = sum([x.close < x.cache[cache_key][f'下轨{line}'] for x in bn]) == 0
+    lower = c.bars_raw.column(cache_key, f'下轨{line}')
+    upper = c.bars_raw.column(cache_key, f'上轨{line}')
+    lower_n, lower_m = get_sub_elements(lower, di=di, n=n), get_sub_elements(lower, di=di, n=m)
+    upper_n, upper_m = get_sub_elements(upper, di=di, n=n), get_sub_elements(upper, di=di, n=m)
+    d_c2 = sum([x.close < v for x, v in zip(bm, lower_m)]) > 1
+    d_c3 = sum([x.close < v for x, v in zip(bn, lower_n)]) == 0
 
     g_c1 = max([x.high for x in bn]) == max([x.high for x in bm])
-    g_c2 = sum([x.close > x.cache[cache_key][f'上轨{line}'] for x in bm]) > 1
-    g_c3 = sum([x.close > x.cache[cache_key][f'上轨{line}'] for x in bn]) == 0
+    g_c2 = sum([x.close > v for x, v in zip(bm, upper_m)]) > 1
+    g_c3 = sum([x.close > v for x, v in zip(bn, upper_n)]) == 0
 
     if d_c1 and d_c2 and d_c3:
         v1 = "一买"
@@ -949,40 +879,13 @@ def update_kdj_cache(c: CZSC, **kwargs):
     slowd_period = kwargs.get('slowd_period', 3)
     cache_key = f"KDJ{fastk_period}#{slowk_period}#{slowd_period}"
 
-    if c.bars_raw[-1].cache and c.bars_raw[-1].cache.get(cache_key, None):
-        # 如果最后一根K线已经有对应的缓存，不执行更新
-        return cache_key
-
-    min_count = fastk_period + slowk_period
-    last_cache = dict(c.bars_raw[-2].cache) if c.bars_raw[-2].cache else dict()
-    if cache_key not in last_cache.keys() or len(c.bars_raw) < min_count + 15:
-        bars = c.bars_raw
-        high = np.array([x.high for x in bars])
-        low = np.array([x.low for x in bars])
-        close = np.array([x.close for x in bars])
-
-        k, d = ta.STOCH(high, low, close, fastk_period=fastk_period, slowk_period=slowk_period, slowd_period=slowd_period)
-        j = list(map(lambda x, y: 3 * x - 2 * y, k, d))
-
-        for i in range(len(close)):
-            _c = dict(c.bars_raw[i].cache) if c.bars_raw[i].cache else dict()
-            _c.update({cache_key: {'k': k[i] if k[i] else 0, 'd': d[i] if d[i] else 0, 'j': j[i] if j[i] else 0}})
-            c.bars_raw[i].cache = _c
+    def __fmt(v, x):
+        k, d = v
+        j = 3 * k - 2 * d
+        return k if k else 0, d if d else 0, j if j else 0
 
-    else:
-        bars = c.bars_raw[-min_count - 10:]
-        high = np.array([x.high for x in bars])
-        low = np.array([x.low for x in bars])
-        close = np.array([x.close for x in bars])
-        k, d = ta.STOCH(high, low, close, fastk_period=fastk_period, slowk_period=slowk_period, slowd_period=slowd_period)
-        j = list(map(lambda x, y: 3 * x - 2 * y, k, d))
-
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: {'k': k[-i], 'd': d[-i], 'j': j[-i]}})
-            c.bars_raw[-i].cache = _c
-
-    return cache_key
+    return c.indicators.update(c.bars_raw, cache_key, lambda: StreamSTOCH(fastk_period, slowk_period, slowd_period),
+                               fields=('high', 'low', 'close'), fmt=__fmt, names=('k', 'd', 'j'))
 
 
 def tas_kdj_base_V221101(c: CZSC, di: int = 1, **kwargs) -> OrderedDict:
@@ -1006,8 +909,8 @@ def tas_kdj_base_V221101(c: CZSC, di: int = 1, **kwargs) -> OrderedDict:
     """
     cache_key = update_kdj_cache(c, **kwargs)
     k1, k2, k3 = f"{c.freq.value}_D{di}K_{cache_key}".split('_')
-    bars = get_sub_elements(c.bars_raw, di=di, n=3)
-    kdj = bars[-1].cache[cache_key]
+    k, d, j = get_sub_elements(c.bars_raw.column(cache_key).T, di=di, n=3).T.tolist()
+    kdj = {'k': k[-1], 'd': d[-1], 'j': j[-1]}
 
     if kdj['j'] > kdj['k'] > kdj['d']:
         v1 = "多头"
@@ -1016,7 +919,7 @@ def tas_kdj_base_V221101(c: CZSC, di: int = 1, **kwargs) -> OrderedDict:
     else:
         v1 = "其他"
 
-    v2 = "向上" if kdj['j'] >= bars[-2].cache[cache_key]['j'] else "向下"
+    v2 = "向上" if kdj['j'] >= j[-2] else "向下"
     return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1, v2=v2)
 
 
@@ -1054,8 +957,9 @@ def tas_kdj_evc_V221201(c: CZSC, di: int = 1, key='K', th=10, count_range=(5, 8)
     v2 = "任意"
     if len(bars) == 3 + c2:
         key = key.lower()
-        long = [x.cache[cache_key][key] < th for x in bars]
-        short = [x.cache[cache_key][key] > 100 - th for x in bars]
+        values = get_sub_elements(c.bars_raw.column(cache_key, key), di=di, n=3 + c2).tolist()
+        long = [x < th for x in values]
+        short = [x > 100 - th for x in values]
         lc = count_last_same(long) if long[-1] else 0
         sc = count_last_same(short) if short[-1] else 0
 
@@ -1087,32 +991,7 @@ def update_rsi_cache(c: CZSC, **kwargs):
     """
     timeperiod = kwargs.get('timeperiod', 9)
     cache_key = f"RSI{timeperiod}"
-    if c.bars_raw[-1].cache and c.bars_raw[-1].cache.get(cache_key, None):
-        # 如果最后一根K线已经有对应的缓存，不执行更新
-        return cache_key
-
-    last_cache = dict(c.bars_raw[-2].cache) if c.bars_raw[-2].cache else dict()
-    if cache_key not in last_cache.keys() or len(c.bars_raw) < timeperiod + 15:
-        # 初始化缓存
-        close = np.array([x.close for x in c.bars_raw])
-        rsi = ta.RSI(close, timeperiod=timeperiod)
-
-        for i in range(len(close)):
-            _c = dict(c.bars_raw[i].cache) if c.bars_raw[i].cache else dict()
-            _c.update({cache_key: rsi[i] if rsi[i] else 0})
-            c.bars_raw[i].cache = _c
-
-    else:
-        # 增量更新最近5个K线缓存
-        close = np.array([x.close for x in c.bars_raw[-timeperiod - 10:]])
-        rsi = ta.RSI(close, timeperiod=timeperiod)
-
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: rsi[-i]})
-            c.bars_raw[-i].cache = _c
-
-    return cache_key
+    return c.indicators.update(c.bars_raw, cache_key, lambda: StreamRSI(timeperiod), fmt=lambda v, x: v if v else 0)
 
 
 def tas_rsi_base_V230227(c: CZSC, di=1, n: int = 6, th: int = 20, **kwargs) -> OrderedDict:
@@ -1139,12 +1018,11 @@ def tas_rsi_base_V230227(c: CZSC, di=1, n: int = 6, th: int = 20, **kwargs) -> O
     """
     cache_key = update_rsi_cache(c, timeperiod=n)
     k1, k2, k3, v1 = str(c.freq.value), f"D{di}T{th}", f"{cache_key}V230227", "其他"
-    _bars = get_sub_elements(c.bars_raw, di=di, n=2)
-    if len(_bars) != 2:
+    rsi = get_sub_elements(c.bars_raw.column(cache_key), di=di, n=2).tolist()
+    if len(rsi) != 2:
         return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
 
-    rsi1 = _bars[-1].cache[cache_key]
-    rsi2 = _bars[-2].cache[cache_key]
+    rsi1, rsi2 = rsi[-1], rsi[-2]
 
     if rsi1 <= th:
         v1 = "超卖"
@@ -1181,9 +1059,8 @@ def tas_double_rsi_V221203(c: CZSC, di: int = 1, rsi_seq=(5, 10), **kwargs) -> O
     rsi2 = update_rsi_cache(c, timeperiod=rsi_seq[1])
 
     k1, k2, k3 = f"{c.freq.value}_D{di}K_RSI{rsi_seq[0]}#{rsi_seq[1]}".split('_')
-    bars = get_sub_elements(c.bars_raw, di=di, n=3)
-    rsi1v = bars[-1].cache[rsi1]
-    rsi2v = bars[-1].cache[rsi2]
+    rsi1v = get_sub_elements(c.bars_raw.column(rsi1), di=di, n=3)[-1]
+    rsi2v = get_sub_elements(c.bars_raw.column(rsi2), di=di, n=3)[-1]
     v1 = "多头" if rsi1v >= rsi2v else "空头"
     return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
 
@@ -1216,7 +1093,7 @@ def tas_first_bs_V230217(c: CZSC, di: int = 1, n: int = 10, **kwargs) -> Ordered
         return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
 
     _bars = get_sub_elements(c.bars_raw, di=di, n=n)
-    sma = [x.cache[key] for x in _bars]
+    sma = get_sub_elements(c.bars_raw.column(key), di=di, n=n).tolist()
     low = [x.low for x in _bars]
     _open = [x.open for x in _bars]
     close = [x.close for x in _bars]
@@ -1283,9 +1160,9 @@ def tas_second_bs_V230228(c: CZSC, di: int = 1, n: int = 21, **kwargs) -> Ordere
         return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
 
     _bars = get_sub_elements(c.bars_raw, di=di, n=n)
-    sma = [x.cache[key] for x in _bars]
-    min_three = any([x.cache[key] > x.low for x in _bars[-3:]])
-    max_three = any([x.high > x.cache[key] for x in _bars[-3:]])
+    sma = get_sub_elements(c.bars_raw.column(key), di=di, n=n).tolist()
+    min_three = any([m > x.low for x, m in zip(_bars[-3:], sma[-3:])])
+    max_three = any([x.high > m for x, m in zip(_bars[-3:], sma[-3:])])
 
     if max(sma) == sma[-1] > sma[-2] and _bars[-1].close > sma[-1] and min_three:
         v1 = '二买'
@@ -1329,15 +1206,16 @@ def tas_second_bs_V230303(c: CZSC, di: int = 1, **kwargs):
     last_bi: BI = _bi_list[-1]
     first_bar: RawBar = last_bi.raw_bars[0]
     last_bar: RawBar = last_bi.raw_bars[-1]
+    first_ma, last_ma = c.bars_raw.lookup(key, [first_bar, last_bar]).tolist()
 
-    if last_bi.direction == Direction.Down and last_bar.low < last_bar.cache[key] \
+    if last_bi.direction == Direction.Down and last_bar.low < last_ma \
             and min([x.low for x in _bi_list[-5:]]) == min([x.low for x in _bi_list]) \
-            and first_bar.cache[key] < last_bar.cache[key]:
+            and first_ma < last_ma:
         v1 = "二买"
 
-    if last_bi.direction == Direction.Up and last_bar.high > last_bar.cache[key] \
+    if last_bi.direction == Direction.Up and last_bar.high > last_ma \
             and max([x.high for x in _bi_list[-5:]]) == max([x.high for x in _bi_list]) \
-            and first_bar.cache[key] > last_bar.cache[key]:
+            and first_ma > last_ma:
         v1 = "二卖"
 
     return create_single_signal(k1=k1, k2=k2, k3=k3, v1=v1)
@@ -1370,9 +1248,10 @@ def tas_hlma_V230301(c: CZSC, di: int = 1, timeperiod=3, **kwargs) -> OrderedDic
     hma = np.mean([x.high for x in _bars])
     lma = np.mean([x.low for x in _bars])
 
-    if _bars[-1].close > hma and _bars[-2].close <= _bars[-2].cache[key]:
+    ma = get_sub_elements(c.bars_raw.column(key), di=di, n=timeperiod)[-2]
+    if _bars[-1].close > hma and _bars[-2].close <= ma:
         v1 = "看多"
-    elif _bars[-1].close < lma and _bars[-2].close >= _bars[-2].cache[key]:
+    elif _bars[-1].close < lma and _bars[-2].close >= ma:
         v1 = "看空"
     else:
         v1 = "其他"
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/3/28 21:36
+describe: 信号函数的向量化实现，用于回测时一次性计算整段历史的信号
+
+1. 只依赖K线和指标的信号函数（bar_*、tas_*、vol_* 等）可以在注册表中提供向量化实现，
+   输入为 VecBars（一个K线周期在每根基础周期K线上的截面），输出为整段历史的信号列；
+2. 高级别K线在周期结束之前是未完成的，VecBars 按 BarGenerator 的合成规则逐根基础周期K线还原未完成K线，
+   指标按 push / replace 在这个序列上重放，与逐K线计算时 bars_raw 上的指标值一致；
+3. 依赖笔、分型等缠论结构的信号仍然逐K线计算，两部分在 generate_czsc_signals(df=True, vectorize=True) 中合并。
+"""
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Optional, Tuple
+from czsc.enum import Freq
+from czsc.objects import RawBar
+from czsc.utils.bar_store import BarStore
+from czsc.utils.bar_generator import TradingCalendar
+from czsc.signals import tas, vol, bar, jcc
+from czsc.signals.tas import update_ma_cache, update_macd_cache, update_kdj_cache, \
+    update_rsi_cache, stream_ma_types
+from czsc.signals.vol import update_vol_ma_cache
+from czsc.signals.registry import SignalPlan, default_registry
+
+
+class VecIndicators:
+    """VecBars 上的指标引擎，接口与 StreamIndicators.update 一致，update_*_cache 可以直接作用于 VecBars"""
+
+    def __init__(self, vb: 'VecBars'):
+        self.vb = vb
+
+    def update(self, bars: 'VecBars', key: str, factory, fields=('close',), fmt=None, names=None) -> str:
+        """在每根基础周期K线上计算指标 key，新的K线调用 push，未完成K线的更新调用 replace"""
+        vb = self.vb
+        if key in vb.columns:
+            return key
+
+        n = len(vb.k)
+        out = np.full((len(names), n) if names else n, np.nan)
+        t0 = int(np.searchsorted(vb.k, vb.start_k))
+        ind, last, values = factory(), -1, []
+        push, replace = ind.push, ind.replace
+        for k, *xin in zip(vb.k[t0:].tolist(), *[vb.partial[f][t0:].tolist() for f in fields]):
+            value = push(*xin) if k != last else replace(*xin)
+            last = k
+            values.append(fmt(value, tuple(xin)) if fmt else value)
+        if values:
+            out[..., t0:] = np.array(values, dtype=np.float64).T
+        vb.columns[key] = (tuple(names) if names else None, out)
+        return key
+
+
+class VecBars:
+    """一个K线周期在每根基础周期K线上的截面
+
+    第 t 行是第 t 根基础周期K线结束时，该周期的最新一根K线（可能未完成）；第 t 行的倒数第 di 根K线，
+    di == 1 时是未完成K线，di > 1 时是已完成的K线。属性 freq、bars_raw、indicators 与 CZSC 对象同名，
+    update_*_cache 可以直接作用于 VecBars，指标值保存在 columns 中。
+    """
+
+    def __init__(self, store: BarStore, freq: str, rows: int, base_freq: str = None,
+                 calendar: TradingCalendar = None, start_dt=None):
+        """
+
+        :param store: 基础周期K线
+        :param freq: K线周期
+        :param rows: 从第 rows 根基础周期K线开始输出信号，之前的K线只用于计算指标
+        :param base_freq: 基础周期，默认与 freq 相同
+        :param calendar: 交易日历，与 BarGenerator 使用的一致
+        :param start_dt: 指标开始计算的K线时间，与逐K线计算时 bars_raw 的第一根K线一致，默认从第一根K线开始
+        """
+        self.freq = Freq(freq)
+        self.bars_raw = self
+        self.indicators = VecIndicators(self)
+        self.columns = {}
+        self.rows = rows
+        calendar = calendar or TradingCalendar()
+        base = {k: getattr(store, k).copy() for k in BarStore.float_columns}
+        edt = np.asarray(calendar.end_times(store.dt, self.freq), dtype='datetime64[ns]')
+        n = len(edt)
+
+        if base_freq is None or base_freq == freq:
+            self.k = np.arange(n)
+            self.partial = base
+        else:
+            new = np.r_[True, edt[1:] != edt[:-1]] if n else np.zeros(0, dtype=bool)
+            self.k = np.cumsum(new) - 1
+            starts = np.flatnonzero(new)
+            group = pd.Series(self.k)
+            self.partial = {
+                'open': base['open'][starts][self.k],
+                'close': base['close'],
+                'high': pd.Series(base['high']).groupby(group).cummax().values,
+                'low': pd.Series(base['low']).groupby(group).cummin().values,
+                'vol': pd.Series(base['vol']).groupby(group).cumsum().values,
+                'amount': pd.Series(base['amount']).groupby(group).cumsum().values,
+            }
+        # 每根K线的最后一行就是已完成的K线
+        self.ends = np.r_[np.flatnonzero(self.k[1:] != self.k[:-1]), n - 1] if n else np.zeros(0, dtype=int)
+        self.dt = edt[self.ends]
+        self.start_k = int(np.searchsorted(self.dt, np.datetime64(start_dt, 'ns'))) if start_dt is not None else 0
+
+    def __repr__(self):
+        return f"<VecBars {self.freq.value} rows={len(self.k) - self.rows}>"
+
+    def __len__(self):
+        return len(self.k) - self.rows
+
+    def _at(self, full: np.ndarray, di: int) -> np.ndarray:
+        """输出的每一行上，倒数第 di 根K线的值；full 为每一行上最新K线的值"""
+        if di == 1:
+            return full[self.rows:]
+        j = self.k[self.rows:] - di + 1
+        return np.where(j >= 0, full[self.ends][np.maximum(j, 0)], np.nan)
+
+    def bar(self, field: str, di: int = 1) -> np.ndarray:
+        """倒数第 di 根K线的 open、close、high、low、vol、amount"""
+        return self._at(self.partial[field], di)
+
+    def window(self, field: str, di: int = 1, n: int = 1) -> np.ndarray:
+        """倒数第 di 根K线及之前共 n 根K线的字段值，形状为 (行数, n)，与 get_sub_elements(bars, di, n) 的顺序一致"""
+        return np.stack([self.bar(field, i) for i in range(di + n - 1, di - 1, -1)], axis=1)
+
+    def value(self, key: str, di: int = 1, name: str = None) -> np.ndarray:
+        """倒数第 di 根K线的指标值，多值指标需要指定 name"""
+        names, full = self.columns[key]
+        if name is not None:
+            full = full[names.index(name)]
+        return self._at(full, di)
+
+    def count(self) -> np.ndarray:
+        """每一行上已经计算指标的K线数量
+
+        与 len(c.bars_raw) 不同，这里不考虑笔的数量控制对 bars_raw 头部的裁剪，只能替代很小的长度判断（如 len(c.bars_raw) < di + 2）；
+        判断条件接近一笔长度的信号函数（如 tas_boll_power_V221112 的 len(c.bars_raw) < di + 20）不提供向量化实现
+        """
+        return self.k[self.rows:] - self.start_k + 1
+
+    def signal(self, k1: str, k2: str, k3: str, v1='任意', v2='任意', v3='任意', score=0) -> Dict[str, np.ndarray]:
+        """create_single_signal 的向量化版本，v1、v2、v3 可以是字符串或者字符串数组"""
+        n = len(self)
+        v = [np.full(n, x, dtype=object) if isinstance(x, str) else np.asarray(x, dtype=object) for x in (v1, v2, v3)]
+        return {f"{k1}_{k2}_{k3}": v[0] + '_' + v[1] + '_' + v[2] + f'_{score}'}
+
+
+def _select(conditions: list, choices: list, default: str) -> np.ndarray:
+    return np.select(conditions, choices, default=default).astype(object)
+
+
+# 向量化实现；返回 None 表示这组参数不支持向量化，退回逐K线计算
+# ======================================================================================================================
+@default_registry.vectorize(tas.tas_ma_base_V221101)
+def _tas_ma_base_V221101(vb: VecBars, di: int = 1, ma_type='SMA', timeperiod=5) -> Optional[dict]:
+    if ma_type.upper() not in stream_ma_types:
+        return None
+    key = update_ma_cache(vb, ma_type, timeperiod)
+    k1, k2, k3 = f"{vb.freq.value}_D{di}K_{key}".split('_')
+    m1, m2 = vb.value(key, di), vb.value(key, di + 1)
+    v1 = np.where(vb.bar('close', di) >= m1, "多头", "空头")
+    v2 = np.where(m1 >= m2, "向上", "向下")
+    return vb.signal(k1, k2, k3, v1, v2)
+
+
+@default_registry.vectorize(tas.tas_ma_base_V221203)
+def _tas_ma_base_V221203(vb: VecBars, di: int = 1, ma_type='SMA', timeperiod=5, th=100) -> Optional[dict]:
+    if ma_type.upper() not in stream_ma_types:
+        return None
+    key = update_ma_cache(vb, ma_type, timeperiod)
+    k1, k2, k3 = f"{vb.freq.value}_D{di}T{th}_{key}".split('_')
+    c, m1, m2 = vb.bar('close', di), vb.value(key, di), vb.value(key, di + 1)
+    v1 = np.where(c >= m1, "多头", "空头")
+    v2 = np.where(m1 >= m2, "向上", "向下")
+    v3 = np.where((np.abs(c - m1) / m1) * 10000 > th, "远离", "靠近")
+    return vb.signal(k1, k2, k3, v1, v2, v3)
+
+
+@default_registry.vectorize(tas.tas_double_ma_V221203)
+def _tas_double_ma_V221203(vb: VecBars, di: int = 1, ma_type='SMA', ma_seq=(5, 10), th: int = 100) -> Optional[dict]:
+    if ma_type.upper() not in stream_ma_types:
+        return None
+    assert len(ma_seq) == 2 and ma_seq[1] > ma_seq[0]
+    ma1 = update_ma_cache(vb, ma_type, ma_seq[0])
+    ma2 = update_ma_cache(vb, ma_type, ma_seq[1])
+    k1, k2, k3 = f"{vb.freq.value}_D{di}T{th}_{ma1}{ma2}".split('_')
+    ma1v, ma2v = vb.value(ma1, di), vb.value(ma2, di)
+    v1 = np.where(ma1v >= ma2v, "多头", "空头")
+    v2 = np.where((np.abs(ma1v - ma2v) / ma2v) * 10000 >= th, "强势", "弱势")
+    return vb.signal(k1, k2, k3, v1, v2)
+
+
+@default_registry.vectorize(tas.tas_macd_base_V221028)
+def _tas_macd_base_V221028(vb: VecBars, di: int = 1, key="macd", **kwargs) -> dict:
+    cache_key = update_macd_cache(vb, **kwargs)
+    assert key.lower() in ['macd', 'dif', 'dea']
+    k1, k2, k3 = f"{vb.freq.value}_D{di}K_{key.upper()}".split('_')
+    m1, m2 = vb.value(cache_key, di, key.lower()), vb.value(cache_key, di + 1, key.lower())
+    v1 = np.where(m1 >= 0, "多头", "空头")
+    v2 = np.where(m1 >= m2, "向上", "向下")
+    return vb.signal(k1, k2, k3, v1, v2)
+
+
+@default_registry.vectorize(tas.tas_macd_direct_V221106)
+def _tas_macd_direct_V221106(vb: VecBars, di: int = 1, **kwargs) -> dict:
+    cache_key = update_macd_cache(vb, **kwargs)
+    k1, k2, k3 = f"{vb.freq.value}_D{di}K_MACD方向".split("_")
+    m1, m2, m3 = [vb.value(cache_key, i, 'macd') for i in (di, di + 1, di + 2)]
+    v1 = _select([(m1 > m2) & (m2 > m3), (m1 < m2) & (m2 < m3)], ["向上", "向下"], "模糊")
+    return vb.signal(k1, k2, k3, v1)
+
+
+@default_registry.vectorize(tas.tas_kdj_base_V221101)
+def _tas_kdj_base_V221101(vb: VecBars, di: int = 1, **kwargs) -> dict:
+    cache_key = update_kdj_cache(vb, **kwargs)
+    k1, k2, k3 = f"{vb.freq.value}_D{di}K_{cache_key}".split('_')
+    k, d, j = [vb.value(cache_key, di, x) for x in ('k', 'd', 'j')]
+    v1 = _select([(j > k) & (k > d), (j < k) & (k < d)], ["多头", "空头"], "其他")
+    v2 = np.where(j >= vb.value(cache_key, di + 1, 'j'), "向上", "向下")
+    return vb.signal(k1, k2, k3, v1, v2)
+
+
+@default_registry.vectorize(tas.tas_double_rsi_V221203)
+def _tas_double_rsi_V221203(vb: VecBars, di: int = 1, rsi_seq=(5, 10), **kwargs) -> dict:
+    assert len(rsi_seq) == 2 and rsi_seq[1] > rsi_seq[0]
+    rsi1 = update_rsi_cache(vb, timeperiod=rsi_seq[0])
+    rsi2 = update_rsi_cache(vb, timeperiod=rsi_seq[1])
+    k1, k2, k3 = f"{vb.freq.value}_D{di}K_RSI{rsi_seq[0]}#{rsi_seq[1]}".split('_')
+    v1 = np.where(vb.value(rsi1, di) >= vb.value(rsi2, di), "多头", "空头")
+    return vb.signal(k1, k2, k3, v1)
+
+
+@default_registry.vectorize(vol.vol_single_ma_V230214)
+def _vol_single_ma_V230214(vb: VecBars, di: int = 1, **kwargs) -> Optional[dict]:
+    ma_type = kwargs.get("ma_type", "SMA")
+    timeperiod = kwargs.get("timeperiod", 5)
+    if ma_type.upper() not in stream_ma_types:
+        return None
+    cache_key = update_vol_ma_cache(vb, ma_type, timeperiod)
+    k1, k2, k3 = f"{vb.freq.value}_D{di}_{cache_key}".split('_')
+    m1, m2 = vb.value(cache_key, di), vb.value(cache_key, di + 1)
+    v1 = np.where(vb.bar('vol', di) >= m1, "多头", "空头")
+    v2 = np.where(m1 >= m2, "向上", "向下")
+    return vb.signal(k1, k2, k3, v1, v2)
+
+
+@default_registry.vectorize(vol.vol_double_ma_V230214)
+def _vol_double_ma_V230214(vb: VecBars, di: int = 1, t1: int = 5, t2: int = 20, **kwargs) -> Optional[dict]:
+    assert t2 > t1, "t2必须是长线均线，t1为短线均线"
+    ma_type = kwargs.get("ma_type", "SMA")
+    if ma_type.upper() not in stream_ma_types:
+        return None
+    cache_key1 = update_vol_ma_cache(vb, ma_type, t1)
+    cache_key2 = update_vol_ma_cache(vb, ma_type, t2)
+    k1, k2, k3 = f"{vb.freq.value}_D{di}{cache_key1}_{cache_key2}".split('_')
+    v1 = np.where(vb.value(cache_key1, di) >= vb.value(cache_key2, di), "看多", "看空")
+    return vb.signal(k1, k2, k3, v1)
+
+
+@default_registry.vectorize(bar.bar_zdt_V221110)
+def _bar_zdt_V221110(vb: VecBars, di=1) -> dict:
+    k1, k2, k3 = f"{vb.freq.value}_D{di}K_ZDT".split("_")
+    c, h, l = vb.bar('close', di), vb.bar('high', di), vb.bar('low', di)
+    v1 = _select([vb.count() < di + 2, c == h, c == l], ["其他", "涨停", "跌停"], "其他")
+    return vb.signal(k1, k2, k3, v1)
+
+
+@default_registry.vectorize(bar.bar_single_V230214)
+def _bar_single_V230214(vb: VecBars, di: int = 1, **kwargs) -> dict:
+    t = kwargs.get("t", 1.0)
+    t = int(round(t, 1) * 10)
+    k1, k2, k3 = f"{vb.freq.value}", f"D{di}T{t}", "状态"
+    o, c, h, l = [vb.bar(x, di) for x in ('open', 'close', 'high', 'low')]
+    solid, upper, lower = np.abs(o - c), h - np.maximum(o, c), np.minimum(o, c) - l
+    short = vb.count() < di
+    v1 = np.where(short, "其他", np.where(c > o, "阳线", "阴线"))
+    v2 = _select([short, solid > (upper + lower) * t / 10, upper > (solid + lower) * t / 10,
+                  lower > (solid + upper) * t / 10], ["任意", "长实体", "长上影", "长下影"], "其他")
+    return vb.signal(k1, k2, k3, v1, v2)
+
+
+@default_registry.vectorize(jcc.jcc_yun_xian_V221118)
+def _jcc_yun_xian_V221118(vb: VecBars, di=1, **kwargs) -> dict:
+    k1, k2, k3 = f"{vb.freq.value}_D{di}_孕线".split('_')
+    (o2, o1), (c2, c1), (h2, h1), (l2, l1) = [vb.window(x, di, 2).T for x in ('open', 'close', 'high', 'low')]
+    solid2, solid1 = np.abs(o2 - c2), np.abs(o1 - c1)
+    shadow2 = np.maximum(h2 - np.maximum(o2, c2), np.minimum(o2, c2) - l2)
+    shadow1 = np.maximum(h1 - np.maximum(o1, c1), np.minimum(o1, c1) - l1)
+    base = (solid2 > shadow2) & (solid1 < shadow1)
+    short = base & (c2 > c1) & (c1 > o2) & (c2 > o1) & (o1 > o2)
+    long = base & (c2 < c1) & (c1 < o2) & (c2 < o1) & (o1 < o2)
+    return vb.signal(k1, k2, k3, _select([long, short], ["看多", "看空"], "其他"))
+
+
+def split_plan(plan: SignalPlan, bars: List[RawBar], rows: int, cat) -> Tuple[Dict[str, np.ndarray], SignalPlan]:
+    """拆分执行计划：有向量化实现的信号一次性计算整段历史，其余信号组成新的执行计划逐K线计算
+
+    :param plan: 信号执行计划
+    :param bars: 基础周期K线，包括初始化 CzscSignals 使用的K线
+    :param rows: 从第 rows 根K线开始输出信号
+    :param cat: 使用 bars[:rows] 和 plan 初始化的 CzscSignals 对象，用于确定各周期指标开始计算的位置
+    :return: (向量化计算的信号 {信号 key: 信号值数组}, 逐K线计算的执行计划)
+    """
+    store = BarStore(bars)
+    vbs, signals, stream = {}, {}, []
+    for spec, freq, kwargs in plan.tasks:
+        res = None
+        if spec.vector is not None and spec.level == 'czsc':
+            if freq not in vbs:
+                vbs[freq] = VecBars(store, freq, rows, base_freq=cat.base_freq, calendar=cat.bg.calendar,
+                                    start_dt=cat.kas[freq].bars_raw[0].dt)
+            res = spec.vector(vbs[freq], **kwargs)
+        if res is None:
+            stream.append((spec, freq, kwargs))
+        else:
+            signals.update(res)
+    return signals, SignalPlan.from_tasks(stream)
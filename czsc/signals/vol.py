@@ -16,6 +16,8 @@ from typing import List
 from collections import OrderedDict
 from czsc.analyze import CZSC, RawBar
 from czsc.utils.sig import get_sub_elements, create_single_signal
+from czsc.utils.stream_ta import stream_ma
+from czsc.signals.tas import stream_ma_types
 
 
 def update_vol_ma_cache(c: CZSC, ma_type: str, timeperiod: int, **kwargs):
@@ -40,30 +42,28 @@ def update_vol_ma_cache(c: CZSC, ma_type: str, timeperiod: int, **kwargs):
     ma_type = ma_type.upper()
     assert ma_type in ma_type_map.keys(), f"{ma_type} 不是支持的均线类型，可选值：{list(ma_type_map.keys())}"
     cache_key = f"VOL#{ma_type.upper()}{timeperiod}"
+    if ma_type in stream_ma_types:
+        return c.indicators.update(c.bars_raw, cache_key, lambda: stream_ma(ma_type, timeperiod), fields=('vol',),
+                                   fmt=lambda v, x: v if v else x[0])
 
-    if c.bars_raw[-1].cache and c.bars_raw[-1].cache.get(cache_key, None):
+    bars = c.bars_raw
+    if bars.has_value(cache_key, -1):
         # 如果最后一根K线已经有对应的缓存，不执行更新
         return cache_key
 
-    last_cache = dict(c.bars_raw[-2].cache) if c.bars_raw[-2].cache else dict()
-    if cache_key not in last_cache.keys() or len(c.bars_raw) < timeperiod + 15:
+    if not bars.has_value(cache_key, -2) or len(bars) < timeperiod + 15:
         # 初始化缓存
-        data = np.array([x.vol for x in c.bars_raw], dtype=np.float64)
+        data = bars.vol
         ma = ta.MA(data, timeperiod=timeperiod, matype=ma_type_map[ma_type.upper()])
         assert len(ma) == len(data)
-        for i in range(len(data)):
-            _c = dict(c.bars_raw[i].cache) if c.bars_raw[i].cache else dict()
-            _c.update({cache_key: ma[i] if ma[i] else data[i]})
-            c.bars_raw[i].cache = _c
+        bars.add_column(cache_key)
+        bars.set_column(cache_key, np.where(ma != 0, ma, data))
 
     else:
         # 增量更新最近3个K线缓存
-        data = np.array([x.vol for x in c.bars_raw[-timeperiod - 10:]], dtype=np.float64)
+        data = bars.vol[-timeperiod - 10:]
         ma = ta.MA(data, timeperiod=timeperiod, matype=ma_type_map[ma_type.upper()])
-        for i in range(1, 4):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: ma[-i]})
-            c.bars_raw[-i].cache = _c
+        bars.set_column(cache_key, ma[-3:], start=-3)
     return cache_key
 
 
@@ -14,11 +14,13 @@ import pandas as pd
 from tqdm import tqdm
 from copy import deepcopy
 from abc import ABC, abstractmethod
+from typing import Union
 from loguru import logger
 from czsc import signals
 from czsc.objects import RawBar, List, Operate, Signal, Factor, Event, Position
 from collections import OrderedDict
 from czsc.traders.base import CzscTrader
+from czsc.traders.sim import PositionSimulator
 from czsc.utils import x_round, freqs_sorted, BarGenerator, dill_dump
 
 
@@ -120,16 +122,31 @@ class CzscStrategyBase(ABC):
         trader = self.init_trader(bars, **kwargs)
         return trader
 
-    def dummy(self, sigs: List[dict], **kwargs) -> CzscTrader:
+    def dummy(self, sigs: Union[List[dict], pd.DataFrame], **kwargs) -> CzscTrader:
         """使用信号缓存进行策略回测
 
         :param sigs: 信号缓存，一般指 generate_czsc_signals 函数计算的结果缓存
+        :param kwargs:
+            categories  信号取值字典，sigs 中的信号值为整数编码时传入，参见 czsc.utils.sig.signal_codes
+            vectorize   是否使用 PositionSimulator 向量化回测，默认 False；此时 sigs 为信号 DataFrame 或信号字典列表，
+                        信号值不能是整数编码
         :return: 完成策略回测后的 CzscTrader 对象
         """
+        if kwargs.get('vectorize', False):
+            sim = PositionSimulator(sigs)
+            trader = CzscTrader(positions=[sim.simulate(pos) for pos in self.positions])
+            if len(sim.rows):
+                trader.s = sim.df.iloc[sim.rows[-1]].to_dict()
+                trader.symbol, trader.end_dt = trader.s['symbol'], trader.s['dt']
+                trader.bid, trader.latest_price = trader.s['id'], trader.s['close']
+            return trader
+
         sleep_time = kwargs.get('sleep_time', 0)
         sleep_step = kwargs.get('sleep_step', 1000)
 
         trader = CzscTrader(positions=deepcopy(self.positions))
+        if kwargs.get('categories'):
+            trader.matcher.set_categories(kwargs['categories'])
         for i, sig in tqdm(enumerate(sigs), desc=f"回测 {self.symbol} {self.sorted_freqs}"):
             trader.on_sig(sig)
 
@@ -10,6 +10,8 @@ from czsc.traders.performance import (
     PairsPerformance, combine_holds_and_pairs, combine_dates_and_pairs, stock_holds_performance
 )
 from czsc.traders.dummy import DummyBacktest
+from czsc.traders.sim import PositionSimulator, position_grid
+from czsc.traders.snapshot import dump_snapshot, load_snapshot
 
 
 
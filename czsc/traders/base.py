@@ -19,10 +19,11 @@ from pyecharts.charts import Tab
 from pyecharts.components import Table
 from pyecharts.options import ComponentTitleOpts
 from czsc.analyze import CZSC
-from czsc.objects import Position, RawBar, Signal
+from czsc.objects import Position, RawBar, Signal, EventMatcher
 from czsc.utils.bar_generator import BarGenerator
 from czsc.utils.cache import home_path
 from czsc.utils import sorted_freqs
+from czsc.utils.sig import encode_signals
 
 
 class CzscSignals:
@@ -45,13 +46,13 @@ class CzscSignals:
             self.symbol = bg.symbol
             self.base_freq = bg.base_freq
             self.freqs = list(bg.bars.keys())
-            self.kas = {freq: CZSC(b) for freq, b in bg.bars.items()}
+            self.kas = {freq: CZSC.from_bars(b) for freq, b in bg.bars.items()}
 
             last_bar = self.kas[self.base_freq].bars_raw[-1]
             self.end_dt, self.bid, self.latest_price = last_bar.dt, last_bar.id, last_bar.close
             if self.get_signals:
                 self.s = self.get_signals(self)
-                self.s.update(last_bar.__dict__)
+                self.s.update(last_bar.to_dict())
             else:
                 self.s = OrderedDict()
         else:
@@ -123,7 +124,7 @@ class CzscSignals:
 
         if self.get_signals:
             self.s = self.get_signals(self)
-            self.s.update(last_bar.__dict__)
+            self.s.update(last_bar.to_dict())
 
 
 def generate_czsc_signals(bars: List[RawBar], get_signals: Callable, freqs: List[AnyStr],
@@ -136,6 +137,14 @@ def generate_czsc_signals(bars: List[RawBar], get_signals: Callable, freqs: List
     :param sdt: 信号计算开始时间
     :param init_n: 用于 BarGenerator 初始化的基础周期K线数量
     :param df: 是否返回 df 格式的信号计算结果，默认 False
+    :param kwargs:
+        bg_max_count  BarGenerator 每个周期最多保留的K线数量，默认 5000
+        bg_inplace    BarGenerator 是否原地更新未完成的高级别K线，默认 False
+        vectorize     是否向量化计算信号，默认 False；仅在 df=True 且 get_signals 为 SignalPlan 时生效，
+                      有向量化实现的信号一次性计算整段历史，其余信号逐K线计算，合并后的列顺序与逐K线计算一致；
+                      全部信号都有向量化实现时不再逐K线更新 CZSC 对象，结果中 cache 列为 None
+        categorical   是否将信号列转换为 pandas Categorical，默认 False；仅在 df=True 时生效，
+                      每个信号共用一份取值字典，参见 czsc.utils.sig.encode_signals
     :return: 信号计算结果
     """
     freqs = [freq for freq in freqs if freq != bars[0].freq.value]
@@ -155,23 +164,66 @@ def generate_czsc_signals(bars: List[RawBar], get_signals: Callable, freqs: List
             return []
 
     base_freq = str(bars[0].freq.value)
-    bg = BarGenerator(base_freq=base_freq, freqs=freqs, max_count=kwargs.get("bg_max_count", 5000))
+    bg = BarGenerator(base_freq=base_freq, freqs=freqs, max_count=kwargs.get("bg_max_count", 5000),
+                      inplace=kwargs.get("bg_inplace", False))
     for bar in bars_left:
         bg.update(bar)
 
     _sigs = []
     cs = CzscSignals(bg, get_signals)
     cs.cache.update({'gsc_kwargs': kwargs})
+
+    if kwargs.get('vectorize', False) and df:
+        from czsc.signals import SignalPlan
+        from czsc.signals.vector import split_plan
+
+        if isinstance(get_signals, SignalPlan):
+            columns = list(cs.s.keys())
+            vec_sigs, cs.get_signals = split_plan(get_signals, bars_left + bars_right, len(bars_left), cs)
+            if cs.get_signals.tasks:
+                for bar in tqdm(bars_right, desc=f'generate signals of {bg.symbol}'):
+                    cs.update_signals(bar)
+                    _sigs.append(dict(cs.s))
+                dfs = pd.DataFrame(_sigs)
+            else:
+                dfs = _bars_frame(bg, bars_right)
+            for key, values in vec_sigs.items():
+                dfs[key] = values
+            dfs = dfs[columns]
+            return encode_signals(dfs) if kwargs.get('categorical', False) else dfs
+        logger.warning("get_signals 不是 SignalPlan 对象，无法向量化计算信号")
+
     for bar in tqdm(bars_right, desc=f'generate signals of {bg.symbol}'):
         cs.update_signals(bar)
         _sigs.append(dict(cs.s))
 
     if df:
-        return pd.DataFrame(_sigs)
+        dfs = pd.DataFrame(_sigs)
+        return encode_signals(dfs) if kwargs.get('categorical', False) else dfs
     else:
         return _sigs
 
 
+def _bars_frame(bg: BarGenerator, bars: List[RawBar]) -> pd.DataFrame:
+    """不逐K线计算信号时，按 BarGenerator 生成基础周期K线的规则构造 bar.to_dict() 对应的列"""
+    base = bg.bars[bg.base_freq]
+    freq = bg.freq_map[bg.base_freq]
+    dts = bg.calendar.end_times(pd.DatetimeIndex([x.dt for x in bars]), freq)
+    return pd.DataFrame({
+        "symbol": [x.symbol for x in bars],
+        "dt": pd.DatetimeIndex(dts).to_pydatetime(),
+        "close": [x.close for x in bars],
+        "id": np.arange(1, len(bars) + 1) + (base[-1].id if base else -1),
+        "freq": freq,
+        "open": [x.open for x in bars],
+        "high": [x.high for x in bars],
+        "low": [x.low for x in bars],
+        "vol": [x.vol for x in bars],
+        "amount": [x.amount for x in bars],
+        "cache": None,
+    })
+
+
 def check_signals_acc(bars: List[RawBar], get_signals: Callable, delta_days: int = 5, **kwargs) -> None:
     """人工验证形态信号识别的准确性的辅助工具：
 
@@ -268,6 +320,19 @@ class CzscTrader(CzscSignals):
         self.positions = positions
         self.__ensemble_method = ensemble_method
 
+        # 所有仓位的开平仓事件编译到同一个匹配器中，每根K线上相同的信号只计算一次
+        self.matcher = EventMatcher()
+        for position in self.positions or []:
+            position.set_matcher(self.matcher)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # 旧版本序列化的对象没有共用的事件匹配器，恢复时重新登记所有仓位
+        if 'matcher' not in state:
+            self.matcher = EventMatcher()
+            for position in self.positions or []:
+                position.set_matcher(self.matcher)
+
     def update(self, bar: RawBar) -> None:
         """输入基础周期已完成K线，更新信号，更新仓位
 
@@ -276,6 +341,7 @@ class CzscTrader(CzscSignals):
         """
         self.update_signals(bar)
         if self.positions:
+            self.matcher.reset(self.s)
             for position in self.positions:
                 position.update(self.s)
 
@@ -291,6 +357,7 @@ class CzscTrader(CzscSignals):
         self.symbol, self.end_dt = self.s['symbol'], self.s['dt']
         self.bid, self.latest_price = self.s['id'], self.s['close']
         if self.positions:
+            self.matcher.reset(self.s)
             for position in self.positions:
                 position.update(self.s)
 
@@ -9,11 +9,16 @@ import os
 import time
 import pandas as pd
 from tqdm import tqdm
+from typing import List
+from functools import partial
 from loguru import logger
 from concurrent.futures import ProcessPoolExecutor
 from czsc import fsa
+from czsc.objects import Position
 from czsc.traders.base import generate_czsc_signals
+from czsc.traders.sim import PositionSimulator
 from czsc.traders.performance import PairsPerformance
+from czsc.utils.sig import encode_signals, signal_codes
 
 
 class DummyBacktest:
@@ -26,6 +31,9 @@ class DummyBacktest:
         :param read_bars: 读入K线数据的函数
             函数签名为：read_bars(symbol, freq, sdt, edt, fq) -> List[RawBar]
         :param kwargs:
+            sdt         回测开始时间，默认 20100101
+            edt         回测结束时间，默认 20230301
+            vectorize   是否使用 PositionSimulator 向量化回测，默认 False
         """
         from czsc.strategies import CzscStrategyBase
         assert issubclass(strategy, CzscStrategyBase), "strategy 必须是 CzscStrategyBase 的子类"
@@ -52,6 +60,20 @@ class DummyBacktest:
         bars = self.read_bars(symbol, tactic.base_freq, self.sdt, self.edt, fq='后复权')
         tactic.replay(bars, os.path.join(self.results_path, f"{symbol}_replay"), sdt='20200101')
 
+    def symbol_signals(self, symbol) -> pd.DataFrame:
+        """读取单个品种的信号缓存，缓存不存在时计算并保存"""
+        file_sigs = os.path.join(self.signals_path, f"{symbol}.sigs")
+        if os.path.exists(file_sigs):
+            return pd.read_parquet(file_sigs)
+
+        tactic = self.strategy(symbol=symbol)
+        bars = self.read_bars(symbol, tactic.base_freq, self.bars_sdt, self.edt, fq='后复权')
+        sigs = generate_czsc_signals(bars, tactic.get_signals, freqs=tactic.freqs, sdt=self.sdt,
+                                     df=True, categorical=True)
+        sigs.drop(columns=['freq', 'cache'], inplace=True)
+        sigs.to_parquet(file_sigs)
+        return sigs
+
     def one_symbol_dummy(self, symbol):
         """回测单个品种"""
         start_time = time.time()
@@ -63,17 +85,13 @@ class DummyBacktest:
 
         os.makedirs(symbol_path, exist_ok=True)
         try:
-            file_sigs = os.path.join(self.signals_path, f"{symbol}.sigs")
-            if not os.path.exists(file_sigs):
-                bars = self.read_bars(symbol, tactic.base_freq, self.bars_sdt, self.edt, fq='后复权')
-                sigs = generate_czsc_signals(bars, tactic.get_signals, freqs=tactic.freqs, sdt=self.sdt, df=True)
-                sigs.drop(columns=['freq', 'cache'], inplace=True)
-                sigs.to_parquet(file_sigs)
+            sigs = self.symbol_signals(symbol)
+            if self.kwargs.get('vectorize', False):
+                trader = tactic.dummy(sigs, vectorize=True)
             else:
-                sigs = pd.read_parquet(file_sigs)
-
-            sigs = sigs.to_dict('records')
-            trader = tactic.dummy(sigs)
+                # 信号列按字典编码存储，回测时直接用整数编码匹配
+                sigs, categories = signal_codes(encode_signals(sigs))
+                trader = tactic.dummy(sigs, categories=categories)
 
         except Exception as e:
             logger.exception(e)
@@ -87,7 +105,7 @@ class DummyBacktest:
                 pairs = pd.DataFrame(pos.pairs)
                 pairs.to_parquet(file_pairs)
 
-                dfh = pd.DataFrame(pos.holds)
+                dfh = pos.holds_df
                 dfh['n1b'] = (dfh['price'].shift(-1) / dfh['price'] - 1) * 10000
                 dfh.drop(columns=['bid'], inplace=True)
                 dfh.fillna(0, inplace=True)
@@ -130,6 +148,39 @@ class DummyBacktest:
         else:
             return None
 
+    def one_symbol_sweep(self, symbol, positions: List[Position], trade_dir="多空"):
+        """单个品种的参数扫描，所有仓位变体共用一次信号读取和事件计算"""
+        try:
+            sim = PositionSimulator(self.symbol_signals(symbol))
+            return sim.sweep(positions, trade_dir)
+        except Exception as e:
+            logger.exception(f"{symbol} 参数扫描失败，原因：{e}")
+            return None
+
+    def sweep(self, symbols, positions: List[Position], n_jobs=2, trade_dir="多空") -> pd.DataFrame:
+        """多品种参数扫描（支持多进程执行）
+
+        :param symbols: 品种列表
+        :param positions: 仓位变体列表，一般由 czsc.traders.sim.position_grid 生成，名称需要唯一
+        :param n_jobs: 进程数量，默认为 2
+        :param trade_dir: 交易方向，可选值 ['多头', '空头', '多空']；传入列表时每个方向各输出一行
+        :return: 每个品种、每个仓位变体一行的评估结果，同时保存到 results_path 下的 sweep.feather
+        """
+        names = [pos.name for pos in positions]
+        assert len(set(names)) == len(names), "仓位变体名称不能重复"
+        logger.info(f"参数扫描，仓位变体数量：{len(positions)}，共 {len(symbols)} 只标的，使用 {n_jobs} 个进程")
+
+        func = partial(self.one_symbol_sweep, positions=positions, trade_dir=trade_dir)
+        with ProcessPoolExecutor(n_jobs) as pool:
+            dfs = [x for x in pool.map(func, sorted(symbols)) if x is not None]
+
+        if not dfs:
+            return pd.DataFrame()
+        df = pd.concat(dfs, ignore_index=True)
+        df.to_feather(os.path.join(self.results_path, "sweep.feather"))
+        logger.info(f"参数扫描完成，结果保存在 {self.results_path}")
+        return df
+
     def execute(self, symbols, n_jobs=2, **kwargs):
         """回测多个品种
 
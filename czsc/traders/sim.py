@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/3/30 20:16
+describe: 基于信号缓存的向量化仓位回测
+"""
+import numpy as np
+import pandas as pd
+from copy import copy
+from itertools import product
+from typing import List, Union
+from czsc.enum import Operate
+from czsc.objects import Position, EventMatcher, _parse_signal_value, _is_value_match, _holds_edges, _holds_metrics
+from czsc.utils.hold_store import HoldStore
+
+
+# 仓位状态机中使用的操作编码
+HO, LO, SO, LE, SE = 0, 1, 2, 3, 4
+_op_codes = {Operate.HO: HO, Operate.LO: LO, Operate.SO: SO, Operate.LE: LE, Operate.SE: SE}
+_code_ops = {v: k for k, v in _op_codes.items()}
+
+
+class PositionSimulator:
+    """基于信号缓存的向量化仓位回测
+
+    1. 每个 Event 在整段信号上一次性计算为布尔数组，多个仓位共用 EventMatcher 的编译结果，
+       相同的 Signal、Event 只计算一次；
+    2. 仓位状态机在数组上逐K线模拟，规则与 Position.update 完全一致（interval、timeout、stop_loss、T0），
+       空仓期间直接跳到下一个开仓事件；
+    3. 输出的 operates、holds、pairs 与逐条 Position.update 的结果一致。
+
+    使用示例：
+
+        sim = PositionSimulator(sigs)
+        positions = [sim.simulate(pos) for pos in tactic.positions]
+
+    需要注意：信号列中的缺失值视为不匹配；Position.update 遇到缺失的信号值会抛出异常。
+    """
+
+    def __init__(self, sigs: Union[pd.DataFrame, List[dict]]):
+        """
+
+        :param sigs: 信号缓存，generate_czsc_signals 返回的 DataFrame 或信号字典列表；信号列可以是 Categorical
+        """
+        df = sigs if isinstance(sigs, pd.DataFrame) else pd.DataFrame(sigs)
+        self.df = df.reset_index(drop=True)
+        self.matcher = EventMatcher()
+
+        dts = pd.to_datetime(self.df['dt'])
+        self.dt = self.df['dt'].tolist()
+        self.price = self.df['close'].tolist()
+        self.bid = self.df['id'].tolist()
+        self.ns = dts.values.astype('datetime64[ns]').astype(np.int64).tolist()
+        self.day = dts.dt.normalize().values.astype('datetime64[D]').astype(np.int64).tolist()
+
+        # Position.update 会忽略时间不晚于上一次信号的数据，这里预先剔除
+        ns = np.array(self.ns, dtype=np.int64)
+        prev_max = np.maximum.accumulate(np.concatenate([[np.iinfo(np.int64).min], ns[:-1]]))
+        self.rows = np.flatnonzero(ns > prev_max)
+
+        self._codes = {}
+        self._signals = {}
+        self._events = {}
+        self._holds_base = None
+
+    def __repr__(self):
+        return f"PositionSimulator(rows={len(self.rows)}, {self.matcher})"
+
+    def _key_codes(self, key: str) -> tuple:
+        """信号列的整数编码及取值字典，缺失值编码为 -1"""
+        if key not in self._codes:
+            if key not in self.df.columns:
+                raise ValueError(f"{key} 不在信号列表中")
+            col = self.df[key]
+            if not isinstance(col.dtype, pd.CategoricalDtype):
+                col = col.astype('category')
+            self._codes[key] = (col.cat.codes.values, list(col.cat.categories))
+        return self._codes[key]
+
+    def _signal(self, sid: int) -> np.ndarray:
+        """编号为 sid 的信号在每根K线上是否满足"""
+        mask = self._signals.get(sid)
+        if mask is None:
+            key, v1, v2, v3, score = self.matcher.signals[sid]
+            codes, categories = self._key_codes(key)
+            table = [_is_value_match(_parse_signal_value(x), v1, v2, v3, score) for x in categories]
+            # 最后一位对应缺失值的编码 -1
+            mask = self._signals[sid] = np.array(table + [False], dtype=bool)[codes]
+        return mask
+
+    def _all(self, sids: tuple) -> np.ndarray:
+        mask = np.ones(len(self.df), dtype=bool)
+        for sid in sids:
+            mask &= self._signal(sid)
+        return mask
+
+    def _any(self, sids: tuple) -> np.ndarray:
+        mask = np.zeros(len(self.df), dtype=bool)
+        for sid in sids:
+            mask |= self._signal(sid)
+        return mask
+
+    def _event(self, eid: int) -> np.ndarray:
+        """编号为 eid 的事件在每根K线上第一个满足的因子序号，事件不满足为 -1"""
+        fidx = self._events.get(eid)
+        if fidx is None:
+            _, _, nots, alls, anys, factors = self.matcher.events[eid]
+            fidx = np.full(len(self.df), -1, dtype=np.int32)
+            for j in range(len(factors) - 1, -1, -1):
+                _, f_nots, f_alls, f_anys = factors[j]
+                m = ~self._any(f_nots) & self._all(f_alls)
+                if f_anys:
+                    m = m & self._any(f_anys)
+                fidx[m] = j
+
+            ok = ~self._any(nots) & self._all(alls)
+            if anys:
+                ok = ok & self._any(anys)
+            fidx[~ok] = -1
+            self._events[eid] = fidx
+        return fidx
+
+    def operates_of(self, position: Position) -> tuple:
+        """计算每根K线上仓位触发的操作，规则与 Position.update 中按事件顺序取第一个满足的事件一致
+
+        :param position: 仓位对象
+        :return: (ops, desc_ids, descs)
+            ops         - 每根K线上的操作编码，HO/LO/SO/LE/SE
+            desc_ids    - 每根K线上的操作描述编号，没有操作为 -1
+            descs       - 操作描述列表，如 '开多@日线一买'
+        """
+        n = len(self.df)
+        ops = np.zeros(n, dtype=np.int8)
+        desc_ids = np.full(n, -1, dtype=np.int32)
+        descs = []
+
+        eids = self.matcher.add_events(position.events)
+        # 倒序覆盖，排在前面的事件优先
+        for eid in reversed(eids):
+            operate, name, *_, factors = self.matcher.events[eid]
+            fidx = self._event(eid)
+            for j, factor in enumerate(factors):
+                m = fidx == j
+                if m.any():
+                    ops[m] = _op_codes[operate]
+                    desc_ids[m] = len(descs)
+                    descs.append(f"{name}@{factor[0]}")
+        return ops, desc_ids, descs
+
+    def run(self, position: Position) -> tuple:
+        """在信号缓存上模拟仓位状态机
+
+        :param position: 仓位对象，从空仓状态开始模拟
+        :return: (pos, operates, state)
+            pos         - self.rows 中每根K线上的持仓，1 多头，-1 空头，0 空仓
+            operates    - 操作列表，元素为 (行号, 操作编码, 操作描述, 操作后持仓)
+            state       - 模拟结束时的状态，(last_event 行号, last_event 操作编码, last_event 描述, 最近开多行号, 最近开空行号)
+        """
+        ops, desc_ids, descs = self.operates_of(position)
+        rows = self.rows
+        m = len(rows)
+
+        # 空仓时只有开仓事件会改变状态，next_open[k] 是 k 之后（含）第一个开仓事件的位置
+        is_open = np.isin(ops[rows], (LO, SO))
+        next_open = np.where(is_open, np.arange(m), m)
+        next_open = np.minimum.accumulate(next_open[::-1])[::-1].tolist()
+
+        ops_ = ops.tolist()
+        desc_ids_ = desc_ids.tolist()
+        rows_ = rows.tolist()
+        ns, day, price, bid = self.ns, self.day, self.price, self.bid
+
+        T0 = position.T0
+        interval = position.interval
+        timeout = position.timeout
+        sl = position.stop_loss / 10000
+        sl_long = f"平多@{position.stop_loss}BP止损"
+        sl_short = f"平空@{position.stop_loss}BP止损"
+        to_long = f"平多@{position.timeout}K超时"
+        to_short = f"平空@{position.timeout}K超时"
+
+        pos_seq = [0] * m
+        operates = []
+        pos = 0
+        ev, ev_op, ev_desc = None, None, None
+        last_lo, last_so = None, None
+
+        k = 0
+        while k < m:
+            i = rows_[k]
+            op = ops_[i]
+            if pos == 0 and op != LO and op != SO:
+                k = next_open[k]
+                continue
+
+            desc = descs[desc_ids_[i]] if op != HO else ""
+            if op == LO or op == SO:
+                ev, ev_op, ev_desc = i, op, desc
+
+            if op == LO:
+                if pos != 1 and (last_lo is None or (ns[i] - ns[last_lo]) / 1e9 > interval):
+                    pos = 1
+                    operates.append((i, LO, desc, pos))
+                    last_lo = i
+                elif pos == -1 and (T0 or day[i] != day[last_so]):
+                    pos = 0
+                    operates.append((i, SE, desc, pos))
+
+            if op == SO:
+                if pos != -1 and (last_so is None or (ns[i] - ns[last_so]) / 1e9 > interval):
+                    pos = -1
+                    operates.append((i, SO, desc, pos))
+                    last_so = i
+                elif pos == 1 and (T0 or day[i] != day[last_lo]):
+                    pos = 0
+                    operates.append((i, LE, desc, pos))
+
+            if pos == 1 and (T0 or day[i] != day[last_lo]):
+                if op == LE:
+                    pos = 0
+                    operates.append((i, LE, desc, pos))
+                if price[i] / price[ev] - 1 < -sl:
+                    pos = 0
+                    operates.append((i, LE, sl_long, pos))
+                if bid[i] - bid[ev] > timeout:
+                    pos = 0
+                    operates.append((i, LE, to_long, pos))
+
+            if pos == -1 and (T0 or day[i] != day[last_so]):
+                if op == SE:
+                    pos = 0
+                    operates.append((i, SE, desc, pos))
+                if 1 - price[i] / price[ev] < -sl:
+                    pos = 0
+                    operates.append((i, SE, sl_short, pos))
+                if bid[i] - bid[ev] > timeout:
+                    pos = 0
+                    operates.append((i, SE, to_short, pos))
+
+            pos_seq[k] = pos
+            k += 1
+
+        return pos_seq, operates, (ev, ev_op, ev_desc, last_lo, last_so)
+
+    def _position(self, position: Position, result: tuple, with_holds: bool = True) -> Position:
+        pos_seq, operates, (ev, ev_op, ev_desc, last_lo, last_so) = result
+        dt, price, bid = self.dt, self.price, self.bid
+
+        p = copy(position)
+        p.last_event = dict(position.last_event)
+        p.holds = HoldStore()
+        p.operates = [{'symbol': p.symbol, 'dt': dt[i], 'bid': bid[i], 'price': price[i],
+                       'op': _code_ops[op], 'op_desc': desc, 'pos': pos} for i, op, desc, pos in operates]
+        if with_holds:
+            rows = self.rows
+            p.holds = HoldStore.from_arrays(np.array(self.ns, dtype='datetime64[ns]')[rows], np.array(pos_seq),
+                                            np.array(price)[rows], np.array(bid)[rows])
+
+        p.pos = pos_seq[-1] if pos_seq else 0
+        p.pos_changed = bool(operates) and operates[-1][0] == self.rows[-1]
+        if ev is not None:
+            p.last_event = {'dt': dt[ev], 'bid': bid[ev], 'price': price[ev], 'op': _code_ops[ev_op], 'op_desc': ev_desc}
+        p.last_lo_dt = dt[last_lo] if last_lo is not None else None
+        p.last_so_dt = dt[last_so] if last_so is not None else None
+        p.end_dt = dt[self.rows[-1]] if len(self.rows) else None
+        return p
+
+    def simulate(self, position: Position) -> Position:
+        """模拟仓位，返回填充了 operates、holds 及最终状态的仓位副本，pairs、evaluate 等可以直接使用
+
+        :param position: 仓位对象，从空仓状态开始模拟
+        :return: 完成回测的仓位对象
+        """
+        return self._position(position, self.run(position))
+
+    def _evaluate_holds(self, position: Position, pos_seq: list, trade_dir: str = "多空") -> dict:
+        """在持仓数组上计算 Position.evaluate_holds，结果与其一致"""
+        p = {"交易标的": position.symbol, "策略标记": position.name, "交易方向": trade_dir,
+             "开始时间": "", "结束时间": "",
+             '覆盖率': 0, '夏普': 0, '卡玛': 0, '最大回撤': 0, '年化收益': 0, '日胜率': 0}
+
+        pos = np.array(pos_seq, dtype=np.int64)
+        if trade_dir != '多空':
+            _OD = 1 if trade_dir == "多头" else -1
+            pos = np.where(pos == _OD, pos, 0)
+        if len(pos) == 0 or not pos.any():
+            return p
+
+        if self._holds_base is None:
+            rows = self.rows.tolist()
+            dts = [self.dt[i] for i in rows]
+            n1b, date_codes = _holds_edges(dts, [self.price[i] for i in rows])
+            self._holds_base = (n1b, date_codes, dts[0].strftime('%Y-%m-%d'), dts[-1].strftime('%Y-%m-%d'))
+        n1b, date_codes, sdt, edt = self._holds_base
+
+        p.update({"开始时间": sdt, "结束时间": edt})
+        p.update(_holds_metrics(n1b, pos, date_codes))
+        return p
+
+    def evaluate(self, position: Position, trade_dir: str = "多空") -> dict:
+        """模拟仓位并评估交易表现，结果与 Position.evaluate 一致；不生成 holds 列表，适合大批量参数扫描
+
+        :param position: 仓位对象，从空仓状态开始模拟
+        :param trade_dir: 交易方向，可选值 ['多头', '空头', '多空']
+        :return: 交易表现
+        """
+        result = self.run(position)
+        p = self._position(position, result, with_holds=False)
+        res = p.evaluate_pairs(trade_dir)
+        res.update(self._evaluate_holds(p, result[0], trade_dir))
+        return res
+
+    def sweep(self, positions: List[Position], trade_dir: Union[str, List[str]] = "多空") -> pd.DataFrame:
+        """批量评估仓位变体，所有变体共用同一份信号及事件计算结果
+
+        :param positions: 仓位变体列表，一般由 position_grid 生成
+        :param trade_dir: 交易方向，可选值 ['多头', '空头', '多空']；传入列表时每个方向各输出一行
+        :return: 每个仓位变体一行的评估结果，包含 interval、timeout、stop_loss、T0 参数列
+        """
+        trade_dirs = [trade_dir] if isinstance(trade_dir, str) else trade_dir
+        symbol = self.df['symbol'].iloc[0] if 'symbol' in self.df.columns and len(self.df) else None
+
+        rows = []
+        for position in positions:
+            result = self.run(position)
+            p = self._position(position, result, with_holds=False)
+            params = {"interval": p.interval, "timeout": p.timeout, "stop_loss": p.stop_loss, "T0": p.T0}
+            for _dir in trade_dirs:
+                res = p.evaluate_pairs(_dir)
+                res.update(self._evaluate_holds(p, result[0], _dir))
+                if symbol is not None:
+                    res['交易标的'] = symbol
+                res.update(params)
+                rows.append(res)
+        return pd.DataFrame(rows)
+
+
+def position_grid(position: Position, **grid) -> List[Position]:
+    """按参数网格生成仓位变体
+
+    使用示例：
+
+        variants = position_grid(pos, timeout=[20, 50, 100], stop_loss=[50, 100, 300], T0=[True, False])
+
+    :param position: 基础仓位对象
+    :param grid: 参数网格，每个参数传入候选值列表；可选参数 interval、timeout、stop_loss、T0、opens、exits，
+        其中 opens、exits 的候选值为事件列表
+    :return: 仓位变体列表，名称为 基础名称#参数取值，opens、exits 以候选序号表示
+    """
+    keys = ['opens', 'exits', 'interval', 'timeout', 'stop_loss', 'T0']
+    unknown = set(grid.keys()) - set(keys)
+    if unknown:
+        raise ValueError(f"不支持的参数：{unknown}")
+
+    names = [k for k in keys if k in grid]
+    variants = []
+    for idx in product(*[range(len(grid[k])) for k in names]):
+        values = [grid[k][i] for k, i in zip(names, idx)]
+        kw = {"opens": position.opens, "exits": position.exits, "interval": position.interval,
+              "timeout": position.timeout, "stop_loss": position.stop_loss, "T0": position.T0}
+        kw.update(dict(zip(names, values)))
+
+        tags = []
+        for k, i, v in zip(names, idx, values):
+            tags.append(f"{k}={i}" if k in ['opens', 'exits'] else f"{k}={v}")
+        name = f"{position.name}#{'_'.join(tags)}" if tags else position.name
+        variants.append(Position(symbol=position.symbol, name=name, **kw))
+    return variants
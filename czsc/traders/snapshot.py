@@ -0,0 +1,553 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/4/8 16:20
+describe: CZSC、BarGenerator、Position、CzscTrader 状态的列式快照
+
+快照文件是 NumPy 的 npz 格式（zip 包），由一个 JSON 格式的文件头和若干 NumPy 数组组成：
+
+1. K线、无包含K线、分型、笔都转成列式数组，对象之间的引用关系用序号表示；
+2. 读取时按需加载数组，可以只加载部分周期，比如只加载基础周期；
+3. K线、笔等对象的 cache 中，浮点数、浮点数字典按列保存，其他可以 JSON 序列化的值按字符串保存；
+   对象类型的缓存（如 BI 的 fake_bis）是可以重新计算的派生数据，不保存；
+   bars_raw 的指标列直接保存为数组，流式指标引擎的状态写入文件头；
+4. 信号计算函数不进入快照，加载时重新传入。
+
+使用示例：
+
+    dump_snapshot(trader, "000001.SH.cts")
+    trader = load_snapshot("000001.SH.cts", get_signals=tactic.get_signals, positions=tactic.positions)
+"""
+import json
+import numpy as np
+import pandas as pd
+from loguru import logger
+from typing import List, Callable, Union
+from collections import OrderedDict
+from czsc.analyze import CZSC, check_fxs
+from czsc.enum import Freq, Mark, Direction, Operate
+from czsc.objects import RawBar, NewBar, FX, BI, Position, Event, HoldsMeter
+from czsc.utils.bar_store import BarStore, BarCache
+from czsc.utils.hold_store import HoldStore
+from czsc.utils.bar_generator import BarGenerator, TradingCalendar
+from czsc.traders.base import CzscSignals, CzscTrader
+
+SNAPSHOT_FORMAT = "czsc-snapshot"
+SNAPSHOT_VERSION = 1
+_MISSING = object()
+
+
+def _ts(dt):
+    """时间转换为 ISO 格式字符串，用于写入文件头"""
+    return None if dt is None else pd.Timestamp(dt).isoformat()
+
+
+def _dt(value):
+    """文件头中的 ISO 格式字符串转换为时间"""
+    return None if value is None else pd.Timestamp(value).to_pydatetime()
+
+
+def _dts(values: np.ndarray) -> list:
+    """datetime64 数组转换为 datetime 列表"""
+    return values.astype('datetime64[us]').tolist()
+
+
+def caches_to_arrays(objs: list, prefix: str):
+    """对象序列的 cache 转换为列式数组
+
+    浮点数和浮点数字典合并为一个 (n, m) 的浮点数矩阵，其他值 JSON 序列化后合并为一个字符串矩阵，
+    是否存在某个 key 记录在 (n, k) 的布尔矩阵中。
+
+    :param objs: 对象序列，比如 K线、笔
+    :param prefix: 数组名称前缀
+    :return: 数组字典, 列定义
+    """
+    # 指标列单独保存，这里只处理 BarCache 中的普通字典
+    caches = [x.cache.data if isinstance(x.cache, BarCache) else x.cache for x in objs]
+    keys = OrderedDict()
+    for cache in caches:
+        for k in (cache or {}).keys():
+            keys[k] = None
+
+    floats, texts, masks, columns = [], [], [], []
+    for k in keys:
+        values = [cache.get(k, _MISSING) if cache else _MISSING for cache in caches]
+        present = [v is not _MISSING for v in values]
+        found = [v for v in values if v is not _MISSING]
+        if all(isinstance(v, float) for v in found):
+            columns.append({"key": k, "kind": "float"})
+            floats.append([v if p else np.nan for v, p in zip(values, present)])
+        elif all(isinstance(v, dict) and all(isinstance(y, float) for y in v.values()) for v in found) \
+                and len(set(tuple(v.keys()) for v in found)) == 1:
+            subkeys = list(found[0].keys())
+            columns.append({"key": k, "kind": "dict", "subkeys": subkeys})
+            for y in subkeys:
+                floats.append([v[y] if p else np.nan for v, p in zip(values, present)])
+        else:
+            try:
+                found = iter([json.dumps(v, ensure_ascii=False) for v in found])
+            except TypeError:
+                continue
+            columns.append({"key": k, "kind": "json"})
+            texts.append([next(found) if p else "" for p in present])
+        masks.append(present)
+
+    n = len(objs)
+    arrays = {
+        f"{prefix}values": np.array(floats, dtype=np.float64).reshape(-1, n).T,
+        f"{prefix}text": np.array(texts, dtype=str).reshape(-1, n).T,
+        f"{prefix}mask": np.array(masks, dtype=bool).reshape(-1, n).T,
+    }
+    return arrays, columns
+
+
+def caches_from_arrays(objs: list, data, prefix: str, columns: list) -> None:
+    """将列式数组中的 cache 写回对象序列，caches_to_arrays 的逆过程；objs 中为 None 的位置跳过"""
+    if not columns:
+        return
+
+    # 每一列在浮点数矩阵或字符串矩阵中的位置
+    plan, i, j = [], 0, 0
+    for column in columns:
+        if column['kind'] == 'float':
+            plan.append((column['key'], 0, i, None))
+            i += 1
+        elif column['kind'] == 'dict':
+            plan.append((column['key'], 1, slice(i, i + len(column['subkeys'])), column['subkeys']))
+            i += len(column['subkeys'])
+        else:
+            plan.append((column['key'], 2, j, None))
+            j += 1
+
+    masks = data[f"{prefix}mask"].tolist()
+    floats = data[f"{prefix}values"].tolist()
+    texts = data[f"{prefix}text"].tolist()
+    for x, mask, fs, ts in zip(objs, masks, floats, texts):
+        if x is None or not any(mask):
+            continue
+        cache = x.cache if x.cache is not None else {}
+        for (key, kind, k, subkeys), p in zip(plan, mask):
+            if p:
+                if kind == 0:
+                    cache[key] = fs[k]
+                elif kind == 1:
+                    cache[key] = dict(zip(subkeys, fs[k]))
+                else:
+                    cache[key] = json.loads(ts[k])
+        x.cache = cache
+
+
+def bars_to_arrays(bars: Union[BarStore, List[RawBar]], prefix: str):
+    """K线序列转换为列式数组
+
+    :return: 数组字典, cache 的列定义
+    """
+    if not isinstance(bars, BarStore):
+        bars = BarStore(bars)
+    arrays, columns = caches_to_arrays(bars.to_list(), f"{prefix}cache/")
+    arrays.update({
+        f"{prefix}id": bars.id,
+        f"{prefix}dt": bars.dt,
+        f"{prefix}values": bars.values,
+    })
+    return arrays, columns
+
+
+def bars_from_arrays(data, prefix: str, symbol: str, freq: Freq, columns: list = None, maxlen: int = None,
+                     bar_pool: List[RawBar] = None, shared: np.ndarray = None) -> BarStore:
+    """列式数组转换为K线序列
+
+    :param bar_pool: 共享K线对象的K线序列，shared 中大于等于 0 的位置直接复用 bar_pool 中的对象
+    :param shared: 每根K线在 bar_pool 中的位置，-1 表示不共享
+    """
+    ids, dts, values = data[f"{prefix}id"], data[f"{prefix}dt"], data[f"{prefix}values"]
+    rows = values.tolist()
+    rows[5] = [None if np.isnan(x) else x for x in rows[5]]
+    bars = [RawBar(symbol, i, dt, freq, o, c, h, l, v, a)
+            for i, dt, o, c, h, l, v, a in zip(ids.tolist(), _dts(dts), *rows)]
+    if bar_pool is not None and shared is not None:
+        fresh = list(bars)
+        for i, j in enumerate(shared.tolist()):
+            if 0 <= j < len(bar_pool):
+                bars[i], fresh[i] = bar_pool[j], None
+        caches_from_arrays(fresh, data, f"{prefix}cache/", columns or [])
+    else:
+        caches_from_arrays(bars, data, f"{prefix}cache/", columns or [])
+    return BarStore.from_arrays(bars, ids, dts, values, maxlen=maxlen)
+
+
+def czsc_to_arrays(c: CZSC, prefix: str = "", bar_pool: List[RawBar] = None):
+    """CZSC 对象转换为列式数组
+
+    :param c: CZSC 对象
+    :param prefix: 数组名称前缀
+    :param bar_pool: 与 c.bars_raw 共享K线对象的K线序列，通常是 BarGenerator 中对应周期的K线；
+        共享的K线记录其在 bar_pool 中的位置，加载时直接复用 bar_pool 中的对象
+    :return: 数组字典, 文件头
+    """
+    gid0, rows = c.bars_raw.retained()
+    nb_map, nbs, fx_map, fxs = {}, [], {}, []
+
+    def nb_index(x: NewBar) -> int:
+        if id(x) not in nb_map:
+            if x.store is not c.bars_raw:
+                raise ValueError("只支持按序号区间引用 bars_raw 的无包含K线")
+            nb_map[id(x)] = len(nbs)
+            nbs.append(x)
+        return nb_map[id(x)]
+
+    def fx_index(x: FX) -> int:
+        if id(x) not in fx_map:
+            fx_map[id(x)] = len(fxs)
+            fxs.append((1 if x.mark == Mark.G else -1, [nb_index(e) for e in x.elements]))
+        return fx_map[id(x)]
+
+    bi_fx, bi_direction, bi_bars, bi_bars_offset, bi_fxs, bi_fxs_offset = [], [], [], [0], [], [0]
+    for bi in c.bi_list:
+        bi_fx.append([fx_index(bi.fx_a), fx_index(bi.fx_b)])
+        bi_direction.append(1 if bi.direction == Direction.Up else -1)
+        bi_fxs.extend([fx_index(x) for x in bi.fxs])
+        bi_fxs_offset.append(len(bi_fxs))
+        bi_bars.extend([nb_index(x) for x in bi.bars])
+        bi_bars_offset.append(len(bi_bars))
+    ubi = [nb_index(x) for x in c.bars_ubi]
+
+    arrays, raw_cache = bars_to_arrays(rows, f"{prefix}raw_")
+
+    # 合并之后被替换过的最后一根原始K线，单独保存合并时的版本
+    row_ids = {id(x) for x in rows}
+    nb_tail = [i for i, x in enumerate(nbs) if x.tail is not None and id(x.tail) not in row_ids]
+    tail_cache = []
+    if nb_tail:
+        tail_arrays, tail_cache = bars_to_arrays([nbs[i].tail for i in nb_tail], f"{prefix}nb_tail_")
+        tail_arrays[f"{prefix}nb_tail"] = np.array(nb_tail, dtype=np.int64)
+        arrays.update(tail_arrays)
+    bi_arrays, bi_cache = caches_to_arrays(c.bi_list, f"{prefix}bi_cache/")
+    arrays.update(bi_arrays)
+    raw_columns, column_arrays = c.bars_raw.dump_columns()
+    for i, key in enumerate(raw_columns):
+        arrays[f"{prefix}raw_column{i}"] = column_arrays[key]
+    if bar_pool is not None:
+        pool = {id(x): i for i, x in enumerate(bar_pool)}
+        arrays[f"{prefix}raw_shared"] = np.array([pool.get(id(x), -1) for x in rows], dtype=np.int64)
+    arrays.update({
+        f"{prefix}nb_range": np.array([[x.start - gid0, x.end - gid0] for x in nbs], dtype=np.int64).reshape(-1, 2),
+        f"{prefix}nb_id": np.array([x.id for x in nbs], dtype=np.int64),
+        f"{prefix}nb_dt": pd.DatetimeIndex([x.dt for x in nbs]).values,
+        f"{prefix}nb_values": np.array([[x.open, x.close, x.high, x.low, x.vol] for x in nbs],
+                                       dtype=np.float64).reshape(-1, 5),
+        f"{prefix}fx_mark": np.array([x[0] for x in fxs], dtype=np.int8),
+        f"{prefix}fx_elements": np.array([x[1] for x in fxs], dtype=np.int64).reshape(-1, 3),
+        f"{prefix}bi_fx": np.array(bi_fx, dtype=np.int64).reshape(-1, 2),
+        f"{prefix}bi_direction": np.array(bi_direction, dtype=np.int8),
+        f"{prefix}bi_bars": np.array(bi_bars, dtype=np.int64),
+        f"{prefix}bi_bars_offset": np.array(bi_bars_offset, dtype=np.int64),
+        f"{prefix}bi_fxs": np.array(bi_fxs, dtype=np.int64),
+        f"{prefix}bi_fxs_offset": np.array(bi_fxs_offset, dtype=np.int64),
+        f"{prefix}ubi": np.array(ubi, dtype=np.int64),
+    })
+    header = {
+        "symbol": c.symbol,
+        "freq": c.freq.value,
+        "max_bi_num": c.max_bi_num,
+        "state_version": c.state_version,
+        "hidden": len(rows) - len(c.bars_raw),
+        "raw_cache": raw_cache,
+        "nb_tail_cache": tail_cache,
+        "raw_columns": raw_columns,
+        "bi_cache": bi_cache,
+        "indicators": c.indicators.dump() if c.indicators.bars is c.bars_raw else {},
+    }
+    return arrays, header
+
+
+def czsc_from_arrays(data, header: dict, prefix: str = "", bar_pool: List[RawBar] = None) -> CZSC:
+    """列式数组转换为 CZSC 对象，czsc_to_arrays 的逆过程"""
+    symbol, freq = header['symbol'], Freq(header['freq'])
+    shared = data[f"{prefix}raw_shared"] if f"{prefix}raw_shared" in data else None
+    store = bars_from_arrays(data, f"{prefix}raw_", symbol, freq, header['raw_cache'], bar_pool=bar_pool, shared=shared)
+    store.remove_head(header['hidden'], keep=0)
+    raw_columns = header.get('raw_columns') or {}
+    store.load_columns(raw_columns, {k: data[f"{prefix}raw_column{i}"] for i, k in enumerate(raw_columns)})
+
+    nb_range = data[f"{prefix}nb_range"].tolist()
+    nb_values = data[f"{prefix}nb_values"].tolist()
+    nb_dt = _dts(data[f"{prefix}nb_dt"])
+    nbs = [NewBar(symbol=symbol, id=i, freq=freq, dt=dt, open=o, close=c, high=h, low=l, vol=v,
+                  store=store, start=s, end=e)
+           for i, dt, (o, c, h, l, v), (s, e) in zip(data[f"{prefix}nb_id"].tolist(), nb_dt, nb_values, nb_range)]
+    for nb in nbs:
+        tail = store.grange(nb.end - 1, nb.end)
+        nb.tail = tail[0] if tail else None
+    if f"{prefix}nb_tail" in data:
+        tails = bars_from_arrays(data, f"{prefix}nb_tail_", symbol, freq, header['nb_tail_cache'])
+        for i, tail in zip(data[f"{prefix}nb_tail"].tolist(), tails.to_list()):
+            nbs[i].tail = tail
+
+    fxs = []
+    for mark, (i1, i2, i3) in zip(data[f"{prefix}fx_mark"].tolist(), data[f"{prefix}fx_elements"].tolist()):
+        k1, k2, k3 = nbs[i1], nbs[i2], nbs[i3]
+        fxs.append(FX(symbol=symbol, dt=k2.dt, mark=Mark.G if mark == 1 else Mark.D, high=k2.high, low=k2.low,
+                      fx=k2.high if mark == 1 else k2.low, elements=[k1, k2, k3]))
+
+    bi_list = []
+    bi_bars, bi_bars_offset = data[f"{prefix}bi_bars"].tolist(), data[f"{prefix}bi_bars_offset"].tolist()
+    bi_fxs, bi_fxs_offset = data[f"{prefix}bi_fxs"].tolist(), data[f"{prefix}bi_fxs_offset"].tolist()
+    for i, ((a, b), direction) in enumerate(zip(data[f"{prefix}bi_fx"].tolist(),
+                                                data[f"{prefix}bi_direction"].tolist())):
+        bi = BI(symbol=symbol, fx_a=fxs[a], fx_b=fxs[b],
+                fxs=[fxs[j] for j in bi_fxs[bi_fxs_offset[i]: bi_fxs_offset[i + 1]]],
+                direction=Direction.Up if direction == 1 else Direction.Down,
+                bars=[nbs[j] for j in bi_bars[bi_bars_offset[i]: bi_bars_offset[i + 1]]])
+        bi_list.append(bi)
+    caches_from_arrays(bi_list, data, f"{prefix}bi_cache/", header['bi_cache'])
+
+    c = CZSC(store[:1], max_bi_num=header['max_bi_num'])
+    c.bars_raw = store
+    c.bi_list = bi_list
+    c.bars_ubi = [nbs[j] for j in data[f"{prefix}ubi"].tolist()]
+    c._ubi_fxs = check_fxs(c.bars_ubi)
+    c.state_version = header['state_version']
+    c.indicators.load(header.get('indicators') or {}, store)
+    return c
+
+
+def bg_to_arrays(bg: BarGenerator, prefix: str = "bg/"):
+    """BarGenerator 对象转换为列式数组"""
+    arrays, cache = {}, {}
+    for freq, bars in bg.bars.items():
+        _arrays, cache[freq] = bars_to_arrays(bars, f"{prefix}{freq}/")
+        arrays.update(_arrays)
+    header = {
+        "symbol": bg.symbol,
+        "end_dt": _ts(bg.end_dt),
+        "base_freq": bg.base_freq,
+        "freqs": list(bg.freqs),
+        "max_count": bg.max_count,
+        "inplace": bg.inplace,
+        "calendar": bg.calendar.dump(),
+        "cache": cache,
+    }
+    return arrays, header
+
+
+def bg_from_arrays(data, header: dict, prefix: str = "bg/", freqs: List[str] = None) -> BarGenerator:
+    """列式数组转换为 BarGenerator 对象
+
+    :param freqs: 只加载指定周期的K线，默认加载全部；基础周期总是加载
+    """
+    base_freq = header['base_freq']
+    freqs = [x for x in header['freqs'] if freqs is None or x in freqs]
+    calendar = TradingCalendar.load(header['calendar']) if header.get('calendar') else None
+    bg = BarGenerator(base_freq=base_freq, freqs=freqs, max_count=header['max_count'], calendar=calendar,
+                      inplace=header.get('inplace', False))
+    for freq in [base_freq] + freqs:
+        bg.bars[freq] = bars_from_arrays(data, f"{prefix}{freq}/", header['symbol'], bg.freq_map[freq],
+                                         header['cache'][freq], maxlen=bg.max_count)
+    bg.symbol, bg.end_dt = header['symbol'], _dt(header['end_dt'])
+    return bg
+
+
+def position_to_arrays(pos: Position, prefix: str = ""):
+    """Position 对象转换为列式数组，开平仓事件的定义写入文件头"""
+    ops, holds = pos.operates, pos.holds
+    arrays = {
+        f"{prefix}op_dt": pd.DatetimeIndex([x['dt'] for x in ops]).values,
+        f"{prefix}op_bid": np.array([x['bid'] for x in ops], dtype=np.int64),
+        f"{prefix}op_price": np.array([x['price'] for x in ops], dtype=np.float64),
+        f"{prefix}op_op": np.array([x['op'].value for x in ops], dtype=str),
+        f"{prefix}op_desc": np.array([x['op_desc'] for x in ops], dtype=str),
+        f"{prefix}op_pos": np.array([x['pos'] for x in ops], dtype=np.int8),
+    }
+    # 持仓状态直接保存 HoldStore 的各列，带时区时 dt 列是当地时间，时区写入文件头
+    arrays.update({
+        f"{prefix}hold_dt": np.array(holds.dt, dtype='datetime64[ns]'),
+        f"{prefix}hold_pos": np.array(holds.pos, dtype=np.int8),
+        f"{prefix}hold_price": np.array(holds.price, dtype=np.float64),
+        f"{prefix}hold_bid": np.array(holds.bid, dtype=np.int64),
+    })
+    last_event = dict(pos.last_event)
+    last_event['dt'] = _ts(last_event['dt'])
+    last_event['op'] = last_event['op'].value if last_event['op'] else None
+    header = pos.dump()
+    header.update({
+        "pos": pos.pos,
+        "pos_changed": pos.pos_changed,
+        "last_event": last_event,
+        "last_lo_dt": _ts(pos.last_lo_dt),
+        "last_so_dt": _ts(pos.last_so_dt),
+        "end_dt": _ts(pos.end_dt),
+        "holds_tz": str(holds.tz) if holds.tz is not None else None,
+        "holds_meter": pos.holds_meter.dump() if pos.holds_meter is not None else None,
+    })
+    return arrays, header
+
+
+def position_from_arrays(data, header: dict, prefix: str = "", pos: Position = None) -> Position:
+    """列式数组转换为 Position 对象
+
+    :param pos: 已经按策略定义创建好的 Position 对象，只恢复持仓状态；默认按文件头中的事件定义创建
+    """
+    if pos is None:
+        pos = Position(symbol=header['symbol'], name=header['name'],
+                       opens=[Event.load(x) for x in header['opens']],
+                       exits=[Event.load(x) for x in header['exits']],
+                       interval=header['interval'], timeout=header['timeout'],
+                       stop_loss=header['stop_loss'], T0=header['T0'])
+
+    symbol = pos.symbol
+    pos.operates = [{'symbol': symbol, 'dt': dt, 'bid': bid, 'price': price, 'op': Operate(op),
+                     'op_desc': op_desc, 'pos': p}
+                    for dt, bid, price, op, op_desc, p in zip(
+                        _dts(data[f"{prefix}op_dt"]), data[f"{prefix}op_bid"].tolist(),
+                        data[f"{prefix}op_price"].tolist(), data[f"{prefix}op_op"].tolist(),
+                        data[f"{prefix}op_desc"].tolist(), data[f"{prefix}op_pos"].tolist())]
+    pos.holds = HoldStore.from_arrays(data[f"{prefix}hold_dt"], data[f"{prefix}hold_pos"],
+                                      data[f"{prefix}hold_price"], data[f"{prefix}hold_bid"],
+                                      tz=header.get('holds_tz'), spill_path=pos.holds.spill_path)
+    # 直接恢复在线统计的状态；旧版本快照没有保存时为 None，Position.update 时再按持仓状态重建
+    meter = header.get('holds_meter')
+    pos.holds_meter = HoldsMeter.load(meter) if meter else None
+
+    last_event = dict(header['last_event'])
+    last_event['dt'] = _dt(last_event['dt'])
+    last_event['op'] = Operate(last_event['op']) if last_event['op'] else None
+    pos.pos, pos.pos_changed, pos.last_event = header['pos'], header['pos_changed'], last_event
+    pos.last_lo_dt, pos.last_so_dt = _dt(header['last_lo_dt']), _dt(header['last_so_dt'])
+    pos.end_dt = _dt(header['end_dt'])
+    return pos
+
+
+def trader_to_arrays(trader: CzscSignals):
+    """CzscSignals / CzscTrader 对象转换为列式数组"""
+    arrays, bg_header = bg_to_arrays(trader.bg)
+    header = {
+        "symbol": trader.symbol,
+        "base_freq": trader.base_freq,
+        "freqs": list(trader.kas.keys()),
+        "end_dt": _ts(trader.end_dt),
+        "bid": trader.bid,
+        "latest_price": trader.latest_price,
+        "bg": bg_header,
+        "kas": {},
+        "positions": [],
+        "cache": None,
+    }
+    try:
+        header['cache'] = json.loads(json.dumps(trader.cache, ensure_ascii=False))
+    except TypeError:
+        logger.warning(f"{trader.symbol} 的信号计算缓存不能 JSON 序列化，不保存到快照中")
+    for freq, c in trader.kas.items():
+        _arrays, header['kas'][freq] = czsc_to_arrays(c, f"kas/{freq}/", bar_pool=trader.bg.bars[freq].to_list())
+        arrays.update(_arrays)
+
+    if isinstance(trader, CzscTrader):
+        method = trader._CzscTrader__ensemble_method
+        header['ensemble_method'] = method if isinstance(method, str) else None
+        for i, pos in enumerate(trader.positions or []):
+            _arrays, _header = position_to_arrays(pos, f"positions/{i}/")
+            arrays.update(_arrays)
+            header['positions'].append(_header)
+    return arrays, header
+
+
+def trader_from_arrays(data, header: dict, freqs: List[str] = None, get_signals: Callable = None,
+                       positions: List[Position] = None) -> CzscSignals:
+    """列式数组转换为 CzscSignals / CzscTrader 对象
+
+    :param freqs: 只加载指定周期的K线和分析结果，默认加载全部；不包含基础周期时不恢复 bg
+    :param get_signals: 信号计算函数
+    :param positions: 按策略定义创建好的 Position 对象，按 name 匹配后恢复持仓状态
+    """
+    base_freq = header['base_freq']
+    if freqs is None or base_freq in freqs:
+        bg = bg_from_arrays(data, header['bg'], freqs=freqs)
+    else:
+        bg = None
+
+    if header['type'] == 'CzscTrader':
+        positions = {x.name: x for x in positions or []}
+        _positions = [position_from_arrays(data, h, f"positions/{i}/", positions.get(h['name']))
+                      for i, h in enumerate(header['positions'])]
+        trader = CzscTrader(get_signals=get_signals, positions=_positions or None,
+                            ensemble_method=header.get('ensemble_method') or "mean")
+    else:
+        trader = CzscSignals(get_signals=get_signals)
+
+    kas = OrderedDict()
+    for freq in header['freqs']:
+        if freqs is not None and freq not in freqs:
+            continue
+        bar_pool = bg.bars[freq].to_list() if bg and freq in bg.bars else None
+        kas[freq] = czsc_from_arrays(data, header['kas'][freq], f"kas/{freq}/", bar_pool=bar_pool)
+
+    trader.bg = bg
+    trader.symbol, trader.base_freq, trader.freqs, trader.kas = header['symbol'], base_freq, list(kas.keys()), kas
+    trader.end_dt, trader.bid, trader.latest_price = _dt(header['end_dt']), header['bid'], header['latest_price']
+    trader.cache = OrderedDict(header['cache'] or {})
+    if get_signals and freqs is None:
+        trader.s = get_signals(trader)
+        trader.s.update(kas[base_freq].bars_raw[-1].to_dict())
+    return trader
+
+
+def dump_snapshot(obj, file: str) -> None:
+    """将 CZSC、BarGenerator、Position、CzscSignals、CzscTrader 对象保存为列式快照
+
+    :param obj: 需要保存的对象
+    :param file: 快照文件路径
+    """
+    if isinstance(obj, CzscSignals):
+        arrays, header = trader_to_arrays(obj)
+        _type = 'CzscTrader' if isinstance(obj, CzscTrader) else 'CzscSignals'
+    elif isinstance(obj, CZSC):
+        arrays, header = czsc_to_arrays(obj)
+        _type = 'CZSC'
+    elif isinstance(obj, BarGenerator):
+        arrays, header = bg_to_arrays(obj, prefix="")
+        _type = 'BarGenerator'
+    elif isinstance(obj, Position):
+        arrays, header = position_to_arrays(obj)
+        _type = 'Position'
+    else:
+        raise TypeError(f"不支持的对象类型：{type(obj)}")
+
+    header.update({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "type": _type})
+    header = json.dumps(header, ensure_ascii=False, default=lambda x: x.item() if isinstance(x, np.generic) else str(x))
+    arrays['header'] = np.frombuffer(header.encode('utf-8'), dtype=np.uint8)
+    with open(file, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def load_snapshot(file: str, freqs: List[str] = None, get_signals: Callable = None,
+                  positions: List[Position] = None):
+    """从列式快照中加载对象
+
+    :param file: 快照文件路径
+    :param freqs: 只加载指定周期的K线和分析结果，默认加载全部；仅对 CzscSignals、CzscTrader、BarGenerator 有效
+    :param get_signals: 信号计算函数；对 CZSC、CzscSignals、CzscTrader 有效，加载全部周期时会计算一次最新信号
+    :param positions: 按策略定义创建好的 Position 对象，按 name 匹配后恢复持仓状态；仅对 CzscTrader、Position 有效
+    :return: 快照中保存的对象
+    """
+    with np.load(file, allow_pickle=False) as data:
+        header = json.loads(data['header'].tobytes().decode('utf-8'))
+        if header.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(f"{file} 不是 CZSC 快照文件")
+        if header['version'] > SNAPSHOT_VERSION:
+            raise ValueError(f"{file} 的快照版本为 {header['version']}，当前只支持 {SNAPSHOT_VERSION} 及以下版本")
+
+        if header['type'] in ['CzscSignals', 'CzscTrader']:
+            return trader_from_arrays(data, header, freqs, get_signals, positions)
+        if header['type'] == 'CZSC':
+            c = czsc_from_arrays(data, header)
+            if get_signals:
+                c.get_signals = get_signals
+                c.signals = get_signals(c=c)
+            return c
+        if header['type'] == 'BarGenerator':
+            return bg_from_arrays(data, header, prefix="", freqs=freqs)
+        if header['type'] == 'Position':
+            pos = positions[0] if positions else None
+            return position_from_arrays(data, header, pos=pos)
+        raise ValueError(f"不支持的快照类型：{header['type']}")
@@ -9,10 +9,15 @@ from . import echarts_plot
 from .echarts_plot import kline_pro, heat_map
 from .word_writer import WordWriter
 from .corr import nmi_matrix, single_linear
-from .bar_generator import BarGenerator, freq_end_time, resample_bars
+from .bar_generator import BarGenerator, TradingCalendar, freq_end_time, freq_end_times, resample_bars, resample_panel
+from .tick_aggregator import TickAggregator, read_ticks, replay_ticks
+from .bar_store import BarStore, BarCache
+from .hold_store import HoldStore
+from .stream_ta import StreamIndicators
 from .io import dill_dump, dill_load, read_json, save_json
 from .sig import check_pressure_support, check_gap_info, is_bis_down, is_bis_up, get_sub_elements
 from .sig import same_dir_counts, fast_slow_cross, count_last_same, create_single_signal
+from .sig import get_signal_columns, encode_signals, signal_codes
 from .plotly_plot import KlineChart
 from .trade import cal_trade_price
 
@@ -5,10 +5,13 @@ email: zeng_bin8888@163.com
 create_dt: 2021/11/14 12:39
 describe: 从任意周期K线开始合成更高周期K线的工具类
 """
+import numpy as np
 import pandas as pd
+from loguru import logger
 from datetime import datetime, timedelta
 from typing import List, Union, AnyStr
 from czsc.objects import RawBar, Freq
+from czsc.utils.bar_store import BarStore
 
 
 def freq_end_time(dt: datetime, freq: Union[Freq, AnyStr]) -> datetime:
@@ -79,6 +82,271 @@ def freq_end_time(dt: datetime, freq: Union[Freq, AnyStr]) -> datetime:
     return dt
 
 
+# 60分钟K线的结束时间，与 freq_end_time 中的 dt_span 一致，单位：分钟
+_f60_span_minutes = np.array([60, 120, 180, 630, 690, 840, 900, 1320, 1380, 1439], dtype=np.int64)
+
+
+def freq_end_times(dts, freq: Union[Freq, AnyStr]) -> np.ndarray:
+    """freq_end_time 的向量化版本，批量获取K线周期结束时间，结果与逐个调用 freq_end_time 完全一致
+
+    :param dts: 时间序列，支持 datetime64 数组、DatetimeIndex、Series 等
+    :param freq: K线周期
+    :return: datetime64[ns] 数组；输入带时区时，返回 DatetimeIndex
+    """
+    if not isinstance(freq, Freq):
+        freq = Freq(freq)
+
+    idx = pd.DatetimeIndex(dts)
+    tz = idx.tz
+    if tz is not None:
+        idx = idx.tz_localize(None)
+
+    minutes = idx.values.astype('datetime64[m]')
+    day = minutes.astype('datetime64[D]')
+    mod = (minutes - day).astype(np.int64)  # 当天的第几分钟
+
+    if freq in [Freq.F1, Freq.F5, Freq.F15, Freq.F30]:
+        m = int(str(freq.value).strip("分钟"))
+        edt = minutes + (-mod % m)
+    elif freq == Freq.F60:
+        edt = day.astype('datetime64[m]') + _f60_span_minutes[np.searchsorted(_f60_span_minutes, mod)]
+    elif freq == Freq.D:
+        edt = day
+    elif freq == Freq.W:
+        # 1970-01-01 是周四，weekday 以周一为 0
+        weekday = (day.astype(np.int64) + 3) % 7
+        edt = day + (4 - weekday)
+    elif freq == Freq.M:
+        edt = (day.astype('datetime64[M]') + 1).astype('datetime64[D]') - 1
+    elif freq == Freq.S:
+        month = day.astype('datetime64[M]').astype(np.int64)
+        edt = (month - month % 3 + 3).astype('datetime64[M]').astype('datetime64[D]') - 1
+    elif freq == Freq.Y:
+        edt = (day.astype('datetime64[Y]') + 1).astype('datetime64[D]') - 1
+    else:
+        logger.error(f'freq_end_times 不支持的K线周期：{freq}，返回所在日期')
+        edt = day
+
+    edt = edt.astype('datetime64[ns]')
+    if tz is not None:
+        return pd.DatetimeIndex(edt).tz_localize(tz)
+    return edt
+
+
+def _minutes(hm: str) -> int:
+    """将 "HH:MM" 转换为当天的第几分钟"""
+    hour, minute = hm.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+class TradingCalendar:
+    """交易日历：预先计算K线周期结束时间的查找表，替代逐根K线调用 freq_end_time
+
+    1. 分钟级别：按市场的交易时段，预先计算当天每一分钟所属K线的结束时间，查表即可得到结果；
+    2. 日线以上级别：传入交易日列表时，周、月、季、年的结束时间取该周期内最后一个交易日，节假日所在的周期也能得到正确结果；
+       没有传入交易日列表时，与 freq_end_time 一致，按自然日历计算；
+    3. 期货市场的夜盘K线归属下一个交易日；
+    4. 逐根K线按时间顺序查询时，同一天的日线以上级别结果只计算一次。
+
+    默认市场为 "默认"，结果与 freq_end_time 完全一致。
+    """
+    # 各市场 60 分钟K线的结束时间，晚于最后一个结束时间的分钟归入最后一根K线
+    f60_spans = {
+        "默认": ["01:00", "02:00", "03:00", '10:30', "11:30", "14:00", "15:00", "22:00", "23:00", "23:59"],
+        "A股": ['10:30', "11:30", "14:00", "15:00"],
+        "期货": ["01:00", "02:00", "02:30", "10:00", "11:15", "14:15", "15:00", "22:00", "23:00", "23:59"],
+    }
+    # 各市场的连续交易时段 (开盘, 收盘)，收盘早于开盘表示跨越零点；默认市场为 A股 的日盘加上夜盘
+    sessions = {
+        "默认": [("21:00", "03:00"), ("09:30", "11:30"), ("13:00", "15:00")],
+        "A股": [("09:30", "11:30"), ("13:00", "15:00")],
+        "期货": [("21:00", "02:30"), ("09:00", "10:15"), ("10:30", "11:30"), ("13:30", "15:00")],
+    }
+    # 有夜盘的市场，晚于该时间的K线归属下一个交易日
+    night_starts = {"期货": "20:00"}
+    minute_freqs = [Freq.F1, Freq.F5, Freq.F15, Freq.F30, Freq.F60]
+    period_freqs = [Freq.D, Freq.W, Freq.M, Freq.S, Freq.Y]
+
+    def __init__(self, market: str = "默认", trade_dates=None):
+        """
+
+        :param market: 市场，可选值见 f60_spans
+        :param trade_dates: 交易日列表，默认为空，表示按自然日历计算日线以上级别的结束时间；
+            需要覆盖K线所在的完整周期，最后一个不完整的周、月、季、年按自然日历计算
+        """
+        assert market in self.f60_spans, f"market 可选值为 {list(self.f60_spans.keys())}"
+        self.market = market
+        self.night_start = _minutes(self.night_starts[market]) if market in self.night_starts else None
+        self.trade_dates = None
+        if trade_dates is not None and len(trade_dates) > 0:
+            self.trade_dates = np.unique(pd.DatetimeIndex(pd.to_datetime(trade_dates)).values.astype('datetime64[D]'))
+
+        # 分钟级别：当天第几分钟 -> K线结束时间是当天第几分钟
+        mod = np.arange(24 * 60)
+        spans = np.array([_minutes(x) for x in self.f60_spans[market]])
+        self.minute_tables = {Freq.F60: spans[np.minimum(np.searchsorted(spans, mod), len(spans) - 1)]}
+        for freq in self.minute_freqs[:-1]:
+            m = int(str(freq.value).strip("分钟"))
+            self.minute_tables[freq] = mod + (-mod % m)
+        self.__minute_lists = {k: v.tolist() for k, v in self.minute_tables.items()}
+
+        # 日线以上级别：每个交易日所在周期的最后一个交易日
+        self.period_ends = {}
+        if self.trade_dates is not None:
+            days = self.trade_dates.astype(np.int64)
+            months = self.trade_dates.astype('datetime64[M]').astype(np.int64)
+            keys = {
+                Freq.D: days,
+                Freq.W: (days + 3) // 7,
+                Freq.M: months,
+                Freq.S: months // 3,
+                Freq.Y: months // 12,
+            }
+            for freq, key in keys.items():
+                first = np.r_[True, key[1:] != key[:-1]]
+                last = np.r_[np.flatnonzero(first)[1:] - 1, len(key) - 1]
+                ends = self.trade_dates[last[np.cumsum(first) - 1]]
+                # 最后一个周期可能不完整，按自然日历计算
+                tail = key == key[-1]
+                if freq != Freq.D:
+                    ends[tail] = freq_end_times(self.trade_dates[tail], freq).astype('datetime64[D]')
+                self.period_ends[freq] = ends
+
+        self.__cache = {}
+
+    def __repr__(self):
+        n = 0 if self.trade_dates is None else len(self.trade_dates)
+        return f"<TradingCalendar market={self.market} trade_dates={n}>"
+
+    @property
+    def is_default(self) -> bool:
+        """是否与 freq_end_time 的计算规则完全一致"""
+        return self.market == "默认" and self.trade_dates is None
+
+    def dump(self) -> dict:
+        """转换为 dict，用于保存"""
+        dates = [] if self.trade_dates is None else np.datetime_as_string(self.trade_dates).tolist()
+        return {"market": self.market, "trade_dates": dates}
+
+    @classmethod
+    def load(cls, raw: dict):
+        """从 dump 的结果创建"""
+        return cls(market=raw['market'], trade_dates=raw['trade_dates'] or None)
+
+    def session_table(self, grace: int = 1, pre_open: int = 15) -> List[int]:
+        """按交易时段修正K线时间的查找表：当天第几分钟 -> 修正后是当天第几分钟
+
+        K线区间左开右闭，第 m 分钟表示 (m - 1, m] 内的时间：
+
+        1. 收盘之后 grace 分钟内（如 15:00:03 的收盘集合竞价快照）归入收盘时间，即当前时段的最后一根K线；
+        2. 开盘之前 pre_open 分钟内以及开盘时刻（如 09:25 的开盘集合竞价）归入开盘后第一分钟，即当前时段的第一根K线；
+        3. 交易时段内和其他时间不修正。
+
+        :param grace: 收盘之后的宽限时间，单位：分钟
+        :param pre_open: 开盘之前的集合竞价时间，单位：分钟
+        :return: 长度为 1440 的列表
+        """
+        table = np.arange(24 * 60)
+        sessions = [(_minutes(start), _minutes(end)) for start, end in self.sessions[self.market]]
+        for start, _ in sessions:
+            table[np.arange(start - pre_open + 1, start + 1) % 1440] = (start + 1) % 1440
+        # 宽限时间优先于下一个时段的开盘之前
+        for _, end in sessions:
+            table[np.arange(end + 1, end + grace + 1) % 1440] = end
+        return table.tolist()
+
+    def trade_days(self, days: np.ndarray, mod: np.ndarray) -> np.ndarray:
+        """计算K线所属的交易日
+
+        :param days: K线的自然日，datetime64[D]
+        :param mod: K线时间是当天的第几分钟
+        :return: 交易日，datetime64[D]
+        """
+        if self.night_start is not None:
+            days = days + (mod >= self.night_start)
+        if self.trade_dates is None:
+            return np.busday_offset(days, 0, roll='forward') if self.night_start is not None else days
+
+        i = np.minimum(np.searchsorted(self.trade_dates, days), len(self.trade_dates) - 1)
+        return np.where(days <= self.trade_dates[-1], self.trade_dates[i], days)
+
+    def period_end_days(self, days: np.ndarray, freq: Freq) -> np.ndarray:
+        """计算交易日所在周期的结束日期
+
+        :param days: 交易日，datetime64[D]
+        :param freq: 日线以上级别的K线周期
+        :return: datetime64[D]
+        """
+        if self.trade_dates is None:
+            return freq_end_times(days, freq).astype('datetime64[D]')
+
+        i = np.minimum(np.searchsorted(self.trade_dates, days), len(self.trade_dates) - 1)
+        inside = self.trade_dates[i] == days
+        if inside.all():
+            return self.period_ends[freq][i]
+        return np.where(inside, self.period_ends[freq][i], freq_end_times(days, freq).astype('datetime64[D]'))
+
+    def end_times(self, dts, freq: Union[Freq, AnyStr]) -> np.ndarray:
+        """批量获取K线周期结束时间，freq_end_times 的交易日历版本
+
+        :param dts: 时间序列
+        :param freq: K线周期
+        :return: datetime64[ns] 数组
+        """
+        if not isinstance(freq, Freq):
+            freq = Freq(freq)
+        if self.is_default:
+            return freq_end_times(dts, freq)
+
+        idx = pd.DatetimeIndex(dts)
+        tz = idx.tz
+        if tz is not None:
+            idx = idx.tz_localize(None)
+
+        minutes = idx.values.astype('datetime64[m]')
+        days = minutes.astype('datetime64[D]')
+        mod = (minutes - days).astype(np.int64)
+        if freq in self.minute_tables:
+            edt = days.astype('datetime64[m]') + self.minute_tables[freq][mod]
+        else:
+            edt = self.period_end_days(self.trade_days(days, mod), freq)
+
+        edt = edt.astype('datetime64[ns]')
+        if tz is not None:
+            return pd.DatetimeIndex(edt).tz_localize(tz)
+        return edt
+
+    def end_time(self, dt: datetime, freq: Freq) -> datetime:
+        """获取 dt 对应的K线周期结束时间，freq_end_time 的查表版本
+
+        :param dt: K线时间
+        :param freq: K线周期
+        :return: 与 dt 类型一致的结束时间
+        """
+        mod = dt.hour * 60 + dt.minute
+        table = self.__minute_lists.get(freq)
+        if table is not None:
+            e = table[mod]
+            if e < 1440:
+                return dt.replace(hour=e // 60, minute=e % 60, second=0, microsecond=0)
+            return dt.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(minutes=e)
+
+        # 日线以上级别：按时间顺序查询时，同一天的结果只计算一次
+        key = (dt.year, dt.month, dt.day, self.night_start is not None and mod >= self.night_start)
+        last = self.__cache.get(freq)
+        if last is not None and last[0] == key:
+            return last[1]
+
+        if self.is_default:
+            edt = freq_end_time(dt, freq)
+        else:
+            day = np.array([dt.strftime("%Y-%m-%d")], dtype='datetime64[D]')
+            end = self.period_end_days(self.trade_days(day, np.array([mod])), freq)[0]
+            edt = dt.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=int((end - day[0]).astype(int)))
+        self.__cache[freq] = (key, edt)
+        return edt
+
+
 def resample_bars(df: pd.DataFrame, target_freq: Union[Freq, AnyStr], raw_bars=True, **kwargs):
     """将df中的K线序列转换为目标周期的K线序列
 
@@ -97,12 +365,18 @@ def resample_bars(df: pd.DataFrame, target_freq: Union[Freq, AnyStr], raw_bars=T
         4   402854600  1.315272e+12
     :param target_freq: 目标周期
     :param raw_bars: 是否将转换后的K线序列转换为RawBar对象
+    :param kwargs:
+        calendar  交易日历 TradingCalendar 对象，默认按 freq_end_time 的规则计算K线周期结束时间
     :return: 转换后的K线序列
     """
     if not isinstance(target_freq, Freq):
         target_freq = Freq(target_freq)
 
-    df['freq_edt'] = df['dt'].apply(lambda x: freq_end_time(x, target_freq))
+    calendar: TradingCalendar = kwargs.get('calendar', None)
+    if calendar is not None:
+        df['freq_edt'] = calendar.end_times(df['dt'], target_freq)
+    else:
+        df['freq_edt'] = freq_end_times(df['dt'], target_freq)
     dfk1 = df.groupby('freq_edt').agg(
         {'symbol': 'first', 'dt': 'last', 'open': 'first', 'close': 'last', 'high': 'max',
          'low': 'min', 'vol': 'sum', 'amount': 'sum', 'freq_edt': 'last'})
@@ -125,18 +399,118 @@ def resample_bars(df: pd.DataFrame, target_freq: Union[Freq, AnyStr], raw_bars=T
         return dfk1
 
 
+def _panel_columns(data) -> dict:
+    """从 DataFrame 或 pyarrow.Table 中取出 resample_panel 需要的列"""
+    names = ['symbol', 'dt', 'open', 'close', 'high', 'low', 'vol', 'amount']
+    if hasattr(data, 'column_names'):
+        # pyarrow.Table，不转换整张表，只取需要的列
+        cols = {k: data.column(k).to_numpy() for k in names if k != 'dt'}
+        cols['dt'] = pd.DatetimeIndex(data.column('dt').to_pandas())
+    else:
+        cols = {k: data[k].to_numpy() for k in names if k != 'dt'}
+        cols['dt'] = pd.DatetimeIndex(data['dt'])
+    return cols
+
+
+def resample_panel(data, freqs: List[Union[Freq, AnyStr]], raw_bars=False, drop_unfinished=True, **kwargs):
+    """全市场K线一次性合成多个周期，resample_bars 的多标的、多周期版本
+
+    1. 输入所有标的的长格式K线，按 (symbol, dt) 排序一次，各周期都在排序后的数组上用 reduceat 分组聚合，不再逐个标的、逐个周期 groupby；
+    2. 每个标的最后一根未完成的K线的处理与 resample_bars 一致：最后一根原始K线的时间早于周期结束时间时丢弃；
+       vol、amount 按时间顺序逐根累加，与 BarGenerator 的结果一致，与 groupby 求和可能有浮点误差；
+    3. raw_bars=True 时，每个周期返回一个迭代器，逐个标的生成 RawBar 列表，避免一次性创建全市场的 RawBar 对象。
+
+    :param data: 全市场K线，DataFrame 或 pyarrow.Table，必须包含列：symbol, dt, open, close, high, low, vol, amount
+    :param freqs: 目标周期列表
+    :param raw_bars: 是否返回 RawBar 对象
+    :param drop_unfinished: 是否丢弃每个标的最后一根未完成的K线
+    :param kwargs:
+        calendar  交易日历 TradingCalendar 对象，默认按 freq_end_time 的规则计算K线周期结束时间
+    :return: {周期: K线}，raw_bars=False 时K线为 DataFrame，列与 resample_bars 一致，按 symbol, dt 排序；
+        raw_bars=True 时为 (symbol, List[RawBar]) 的迭代器
+    """
+    calendar: TradingCalendar = kwargs.get('calendar', None)
+    cols = _panel_columns(data)
+    dt_index = cols.pop('dt')
+    tz = dt_index.tz
+    dts = (dt_index.tz_localize(None) if tz is not None else dt_index).values
+
+    # 标的编码后按 (symbol, dt) 排序，输入已经有序时跳过排序
+    codes, symbols = pd.factorize(cols.pop('symbol'), sort=True)
+    ordered = len(codes) < 2 or bool(np.all((np.diff(codes) > 0) | ((np.diff(codes) == 0) & (np.diff(dts) >= np.timedelta64(0)))))
+    if not ordered:
+        order = np.lexsort((dts, codes))
+        codes, dts = codes[order], dts[order]
+        cols = {k: v[order] for k, v in cols.items()}
+
+    results = {}
+    for freq in freqs:
+        freq = freq if isinstance(freq, Freq) else Freq(freq)
+        edt = calendar.end_times(dts, freq) if calendar is not None else freq_end_times(dts, freq)
+        edt = np.asarray(edt, dtype='datetime64[ns]')
+
+        # 同一个标的、同一个周期结束时间的原始K线是连续的一段
+        starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (edt[1:] != edt[:-1])])
+        ends = np.r_[starts[1:], len(codes)] - 1
+        keep = np.ones(len(starts), dtype=bool)
+        if drop_unfinished and len(starts):
+            last = np.r_[codes[starts][1:] != codes[starts][:-1], True]
+            keep = ~(last & (dts[ends] < edt[starts]))
+
+        dfk = pd.DataFrame({
+            'symbol': symbols[codes[starts]],
+            'dt': edt[starts],
+            'open': cols['open'][starts],
+            'close': cols['close'][ends],
+            'high': np.maximum.reduceat(cols['high'], starts) if len(starts) else cols['high'][:0],
+            'low': np.minimum.reduceat(cols['low'], starts) if len(starts) else cols['low'][:0],
+            'vol': np.add.reduceat(cols['vol'], starts) if len(starts) else cols['vol'][:0],
+            'amount': np.add.reduceat(cols['amount'], starts) if len(starts) else cols['amount'][:0],
+        })[keep].reset_index(drop=True)
+        if tz is not None:
+            dfk['dt'] = dfk['dt'].dt.tz_localize(tz)
+        results[freq.value] = _panel_raw_bars(dfk, freq) if raw_bars else dfk
+    return results
+
+
+def _panel_raw_bars(dfk: pd.DataFrame, freq: Freq):
+    """逐个标的将 resample_panel 的结果转换为 RawBar 列表，id 从 1 开始，与 resample_bars 一致"""
+    bounds = np.flatnonzero(np.r_[True, dfk['symbol'].values[1:] != dfk['symbol'].values[:-1], True])
+    dts = pd.DatetimeIndex(dfk['dt']).to_pydatetime()
+    values = {k: dfk[k].tolist() for k in ['open', 'close', 'high', 'low', 'vol', 'amount']}
+    symbols = dfk['symbol'].values
+    for s, e in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        symbol = symbols[s]
+        yield symbol, [RawBar(symbol=symbol, id=i - s + 1, dt=dts[i], freq=freq, open=values['open'][i],
+                              close=values['close'][i], high=values['high'][i], low=values['low'][i],
+                              vol=values['vol'][i], amount=values['amount'][i]) for i in range(s, e)]
+
+
 class BarGenerator:
     """使用日线合成周线、月线、季线"""
 
-    def __init__(self, base_freq: str, freqs: List[str], max_count: int = 5000):
+    def __init__(self, base_freq: str, freqs: List[str], max_count: int = 5000, calendar: TradingCalendar = None,
+                 inplace: bool = False):
+        """
+
+        :param base_freq: 基础周期
+        :param freqs: 需要合成的周期列表
+        :param max_count: 每个周期最多保留的K线数量
+        :param calendar: 交易日历，用于查询K线周期结束时间，默认与 freq_end_time 的规则一致
+        :param inplace: 是否原地更新未完成的高级别K线，默认 False 表示每次更新都创建新的K线对象；
+            设置为 True 时，bars[freq][-1] 在周期结束前始终是同一个对象，不要在外部保存它的引用并假设其不变
+        """
         self.symbol = None
         self.end_dt = None
         self.base_freq = base_freq
         self.max_count = max_count
         self.freqs = freqs
-        self.bars = {v: [] for v in self.freqs}
-        self.bars.update({base_freq: []})
+        # 各周期K线使用有界的列式存储，超过 max_count 的K线自动从头部丢弃
+        self.bars = {v: BarStore(maxlen=max_count) for v in self.freqs}
+        self.bars.update({base_freq: BarStore(maxlen=max_count)})
         self.freq_map = {f.value: f for _, f in Freq.__members__.items()}
+        self.calendar = calendar if calendar is not None else TradingCalendar()
+        self.inplace = inplace
         self.__validate_freq_params()
 
     def __validate_freq_params(self):
@@ -168,7 +542,7 @@ class BarGenerator:
         """
         assert freq in self.bars.keys()
         assert not self.bars[freq], f"self.bars['{freq}'] 不为空，不允许执行初始化"
-        self.bars[freq] = bars
+        self.bars[freq] = BarStore(bars, maxlen=self.max_count)
         self.symbol = bars[-1].symbol
 
     def __repr__(self):
@@ -181,25 +555,36 @@ class BarGenerator:
         :param freq: 目标周期
         :return:
         """
-        freq_edt = freq_end_time(bar.dt, freq)
+        freq_edt = self.calendar.end_time(bar.dt, freq)
+        bars = self.bars[freq.value]
 
-        if not self.bars[freq.value]:
+        if not bars:
             bar_ = RawBar(symbol=bar.symbol, freq=freq, dt=freq_edt, id=0, open=bar.open,
                           close=bar.close, high=bar.high, low=bar.low, vol=bar.vol, amount=bar.amount)
-            self.bars[freq.value].append(bar_)
+            bars.append(bar_)
             return
 
-        last: RawBar = self.bars[freq.value][-1]
-        if freq_edt != self.bars[freq.value][-1].dt:
+        last: RawBar = bars[-1]
+        if freq_edt != last.dt:
             bar_ = RawBar(symbol=bar.symbol, freq=freq, dt=freq_edt, id=last.id + 1, open=bar.open,
                           close=bar.close, high=bar.high, low=bar.low, vol=bar.vol, amount=bar.amount)
-            self.bars[freq.value].append(bar_)
+            bars.append(bar_)
+
+        elif self.inplace:
+            # 原地更新未完成的K线，清空 cache 与新建K线对象保持一致
+            last.close = bar.close
+            last.high = max(last.high, bar.high)
+            last.low = min(last.low, bar.low)
+            last.vol = last.vol + bar.vol
+            last.amount = last.amount + bar.amount
+            last.cache = None
+            bars.refresh(-1)
 
         else:
             bar_ = RawBar(symbol=bar.symbol, freq=freq, dt=freq_edt, id=last.id,
                           open=last.open, close=bar.close, high=max(last.high, bar.high),
                           low=min(last.low, bar.low), vol=last.vol + bar.vol, amount=last.amount + bar.amount)
-            self.bars[freq.value][-1] = bar_
+            bars[-1] = bar_
 
     def update(self, bar: RawBar) -> None:
         """更新各周期K线
@@ -218,7 +603,3 @@ class BarGenerator:
 
         for freq in self.bars.keys():
             self._update_freq(bar, self.freq_map[freq])
-
-        # 限制存在内存中的K限制数量
-        for f, b in self.bars.items():
-            self.bars[f] = b[-self.max_count:]
@@ -0,0 +1,526 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/4/2 10:12
+describe: 列式存储的K线序列容器，用于替代 CZSC、BarGenerator 中的 List[RawBar]
+"""
+import weakref
+import numpy as np
+from collections.abc import MutableMapping
+from typing import List, Iterable, Union, Tuple
+from czsc.objects import RawBar
+
+
+class BarStore:
+    """列式存储的K线序列容器（环形缓冲区）
+
+    1. 行访问与 List[RawBar] 兼容：支持索引、切片、迭代、len、末尾替换，行对象就是传入的K线对象本身；
+    2. 列访问：id, dt, open, close, high, low, vol, amount 以 NumPy 数组视图的形式提供，不发生拷贝；
+    3. 设置 maxlen 后为有界序列，超出 maxlen 的K线从头部丢弃；
+    4. 每根K线有一个全局序号，从 0 开始按加入的顺序递增，不随头部丢弃而变化；NewBar 通过全局序号区间引用原始K线；
+    5. 指标列：按 key（如 SMA5、MACD12#26#9）保存与K线对齐的浮点数列，随K线一起搬移、从头部丢弃；
+       写入了指标列的K线，其 cache 替换为 BarCache，bar.cache[key] 的读法保持不变；
+       K线同时属于多个 BarStore 时，bar.cache[key] 在全部 BarStore 中查找。
+
+    **注意：** 列视图只在下一次写入之前有效，写入之后需要重新获取；直接修改了行对象的属性时，需要调用 refresh 同步到各列。
+
+    实现说明：数据存放在容量为 capacity 的数组中，有效区间为 [start, end)，[keep, start) 是已经从序列中丢弃、
+    但仍然可以通过 grange 访问的K线；写到数组末尾时，将 [keep, end) 整体搬到数组头部，超过容量的一半时扩容。
+    设置 maxlen 后容量最大为 2 * maxlen，搬移的均摊成本是 O(1)。
+    逐行写入时只保存行对象，各列的写入延迟到下一次读取列视图或搬移数组时批量完成。
+    """
+    float_columns = ('open', 'close', 'high', 'low', 'vol', 'amount')
+
+    def __init__(self, bars: Iterable[RawBar] = None, maxlen: int = None, capacity: int = 64):
+        """
+
+        :param bars: 初始K线序列
+        :param maxlen: 最大保留的K线数量，默认不限制
+        :param capacity: 初始容量
+        """
+        self.maxlen = maxlen
+        self.offset = 0  # 序列中第一根K线的全局序号
+        self.version = 0  # 行写入、头部丢弃时递增，用于判断序列自上次读取之后是否有变化
+        self._keep = 0
+        self._start = 0
+        self._end = 0
+        self._dirty = []  # 行对象已经写入、但还没有同步到各列的位置
+        self._rows = np.empty(0, dtype=object)
+        self._id = np.empty(0, dtype=np.int64)
+        self._dt = np.empty(0, dtype='datetime64[ns]')
+        self._values = np.empty((len(self.float_columns), 0), dtype=np.float64)
+        self._columns = {}  # 指标列：key -> [多值指标的字段名, 数组, 已写入区间的第一个、最后一个全局序号]
+        self._resize(capacity)
+
+        if bars is not None:
+            self.extend(bars)
+
+    @classmethod
+    def from_arrays(cls, bars: List[RawBar], id: np.ndarray, dt: np.ndarray, values: np.ndarray, maxlen: int = None):
+        """使用已有的列数据创建，不再逐根读取K线的属性
+
+        :param bars: K线序列
+        :param id: K线序号
+        :param dt: K线时间，datetime64[ns]
+        :param values: 形状为 (6, n) 的浮点数列，顺序与 float_columns 一致
+        :param maxlen: 最大保留的K线数量，默认不限制
+        :return: BarStore 对象
+        """
+        if maxlen and len(bars) > maxlen:
+            bars, id, dt, values = bars[-maxlen:], id[-maxlen:], dt[-maxlen:], values[:, -maxlen:]
+        n = len(bars)
+        store = cls(maxlen=maxlen, capacity=max(n, 64))
+        store._rows[:n] = bars
+        store._id[:n] = id
+        store._dt[:n] = dt
+        store._values[:, :n] = values
+        store._end = n
+        store.version += 1
+        return store
+
+    def __repr__(self):
+        return f"<BarStore len={len(self)} maxlen={self.maxlen}>"
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __iter__(self):
+        return iter(self._rows[self._start: self._end].tolist())
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[RawBar, List[RawBar]]:
+        if isinstance(key, slice):
+            return self._rows[self._start: self._end][key].tolist()
+        return self._rows[self._index(key)]
+
+    def __setitem__(self, key: int, bar: RawBar):
+        i = self._index(key)
+        self._set(i, bar)
+        self._invalidate(i)
+
+    def _index(self, key: int) -> int:
+        """将序列索引转换为数组中的位置"""
+        n = len(self)
+        if key < 0:
+            key += n
+        if not 0 <= key < n:
+            raise IndexError("BarStore index out of range")
+        return self._start + key
+
+    def _resize(self, capacity: int):
+        """将 [keep, end) 区间搬到容量为 capacity 的新数组头部"""
+        self._flush()
+        rows = np.empty(capacity, dtype=object)
+        ids = np.zeros(capacity, dtype=np.int64)
+        dts = np.zeros(capacity, dtype='datetime64[ns]')
+        values = np.zeros((len(self.float_columns), capacity), dtype=np.float64)
+
+        k, e = self._keep, self._end
+        n = e - k
+        rows[:n] = self._rows[k: e]
+        ids[:n] = self._id[k: e]
+        dts[:n] = self._dt[k: e]
+        values[:, :n] = self._values[:, k: e]
+        for column in self._columns.values():
+            arr = np.full(column[1].shape[:-1] + (capacity,), np.nan)
+            arr[..., :n] = column[1][..., k: e]
+            column[1] = arr
+
+        self._rows, self._id, self._dt, self._values = rows, ids, dts, values
+        self._keep, self._start, self._end = 0, self._start - k, n
+
+    def _set(self, i: int, bar: RawBar):
+        self._rows[i] = bar
+        self.version += 1
+        dirty = self._dirty
+        if not dirty or dirty[-1] != i:
+            dirty.append(i)
+
+    def _flush(self):
+        """将延迟写入的行同步到各列"""
+        if not self._dirty:
+            return
+        index = [i for i in dict.fromkeys(self._dirty) if self._keep <= i < self._end]
+        self._dirty = []
+        if len(index) <= 8:
+            v = self._values
+            for i in index:
+                bar = self._rows[i]
+                self._id[i] = bar.id
+                self._dt[i] = bar.dt
+                v[0, i] = bar.open
+                v[1, i] = bar.close
+                v[2, i] = bar.high
+                v[3, i] = bar.low
+                v[4, i] = bar.vol
+                v[5, i] = bar.amount if bar.amount is not None else np.nan
+            return
+
+        bars = self._rows[index].tolist()
+        self._id[index] = [x.id for x in bars]
+        self._dt[index] = np.array([x.dt for x in bars], dtype='datetime64[ns]')
+        self._values[:, index] = np.array([[x.open, x.close, x.high, x.low, x.vol,
+                                            x.amount if x.amount is not None else np.nan] for x in bars],
+                                          dtype=np.float64).T
+
+    def refresh(self, key: int = -1):
+        """直接修改了第 key 根K线的属性之后，标记该行需要重新同步到各列"""
+        i = self._index(key)
+        self._set(i, self._rows[i])
+        self._invalidate(i)
+
+    def append(self, bar: RawBar):
+        """在末尾加入一根K线"""
+        capacity = len(self._rows)
+        if self._end == capacity:
+            n = self._end - self._keep
+            if n * 2 > capacity:
+                capacity = capacity * 2
+                if self.maxlen:
+                    capacity = max(min(capacity, 2 * self.maxlen), n + 1)
+            self._resize(capacity)
+
+        self._set(self._end, bar)
+        self._end += 1
+        if self.maxlen and len(self) > self.maxlen:
+            self.remove_head(len(self) - self.maxlen)
+
+    def extend(self, bars: Iterable[RawBar]):
+        """在末尾加入多根K线，按数组剩余空间分块批量写入各列"""
+        bars = list(bars)
+        while bars:
+            if self._end == len(self._rows):
+                self.append(bars[0])
+                bars = bars[1:]
+                continue
+
+            chunk, bars = bars[: len(self._rows) - self._end], bars[len(self._rows) - self._end:]
+            s, e = self._end, self._end + len(chunk)
+            self._rows[s: e] = chunk
+            self._id[s: e] = [x.id for x in chunk]
+            self._dt[s: e] = np.array([x.dt for x in chunk], dtype='datetime64[ns]')
+            self._values[:, s: e] = np.array([[x.open, x.close, x.high, x.low, x.vol,
+                                               x.amount if x.amount is not None else np.nan] for x in chunk],
+                                             dtype=np.float64).T
+            self._end = e
+            self.version += 1
+            if self.maxlen and len(self) > self.maxlen:
+                self.remove_head(len(self) - self.maxlen)
+
+    def remove_head(self, n: int, keep: int = None):
+        """丢弃头部的 n 根K线，不拷贝数据
+
+        :param n: 丢弃的K线数量
+        :param keep: 全局序号大于等于 keep 的K线丢弃之后仍然可以通过 grange 访问，默认不保留
+        """
+        n = min(max(n, 0), len(self))
+        start = self._start + n
+        if keep is None:
+            keep = start
+        else:
+            keep = min(max(self._start + keep - self.offset, self._keep), start)
+        self._rows[self._keep: keep] = None
+        self._keep, self._start = keep, start
+        self.offset += n
+        self.version += 1
+
+    def grange(self, start: int, end: int) -> List[RawBar]:
+        """按全局序号区间 [start, end) 获取K线，只返回仍然保留的部分"""
+        s = max(self._start + start - self.offset, self._keep)
+        e = min(self._start + end - self.offset, self._end)
+        return self._rows[s: e].tolist() if s < e else []
+
+    def to_list(self) -> List[RawBar]:
+        """转换为 List[RawBar]"""
+        return self._rows[self._start: self._end].tolist()
+
+    def retained(self):
+        """仍然保留的全部K线，包括已经从序列中丢弃、但仍然可以通过 grange 访问的部分
+
+        :return: (第一根K线的全局序号, K线列表)
+        """
+        return self.offset - (self._start - self._keep), self._rows[self._keep: self._end].tolist()
+
+    # 列视图
+    # ==================================================================================================================
+    @property
+    def id(self) -> np.ndarray:
+        self._flush()
+        return self._id[self._start: self._end]
+
+    @property
+    def dt(self) -> np.ndarray:
+        self._flush()
+        return self._dt[self._start: self._end]
+
+    @property
+    def open(self) -> np.ndarray:
+        self._flush()
+        return self._values[0, self._start: self._end]
+
+    @property
+    def close(self) -> np.ndarray:
+        self._flush()
+        return self._values[1, self._start: self._end]
+
+    @property
+    def high(self) -> np.ndarray:
+        self._flush()
+        return self._values[2, self._start: self._end]
+
+    @property
+    def low(self) -> np.ndarray:
+        self._flush()
+        return self._values[3, self._start: self._end]
+
+    @property
+    def vol(self) -> np.ndarray:
+        self._flush()
+        return self._values[4, self._start: self._end]
+
+    @property
+    def amount(self) -> np.ndarray:
+        self._flush()
+        return self._values[5, self._start: self._end]
+
+    @property
+    def values(self) -> np.ndarray:
+        """全部浮点数列，形状为 (6, n)，顺序与 float_columns 一致"""
+        self._flush()
+        return self._values[:, self._start: self._end]
+
+    # 指标列
+    # ==================================================================================================================
+    def add_column(self, key: str, names: Tuple[str, ...] = None):
+        """增加一个与K线对齐的指标列，已经存在时清空
+
+        :param key: 指标的缓存 key，如 SMA5、MACD12#26#9
+        :param names: 多值指标各个值的名称，如 ('dif', 'dea', 'macd')，默认单值
+        """
+        shape = (len(names), len(self._rows)) if names else (len(self._rows),)
+        self._columns[key] = [tuple(names) if names else None, np.full(shape, np.nan), 0, -1]
+
+    def has_column(self, key: str) -> bool:
+        return key in self._columns
+
+    def column(self, key: str, name: str = None) -> np.ndarray:
+        """指标列的视图，与 close 等列对齐；多值指标不指定 name 时返回形状为 (m, n) 的数组
+
+        :param key: 指标的缓存 key
+        :param name: 多值指标中某个值的名称，如 'macd'
+        """
+        names, arr = self._columns[key][:2]
+        if name is not None:
+            arr = arr[names.index(name)]
+        return arr[..., self._start: self._end]
+
+    def lookup(self, key: str, bars: List[RawBar], name: str = None) -> np.ndarray:
+        """按K线时间查找 bars 在指标列中的值，bars 可以包含已经从序列中丢弃、但仍然可以通过 grange 访问的K线
+
+        用于读取分型、笔中原始K线的指标值，这些K线不是序列中连续的一段，不能直接对 column 切片。
+
+        :param key: 指标的缓存 key
+        :param bars: 需要查找的K线，必须在 BarStore 中
+        :param name: 多值指标中某个值的名称，如 'macd'
+        :return: 与 bars 对齐的数组
+        """
+        self._flush()
+        names, arr, first, last = self._columns[key]
+        if name is not None:
+            arr = arr[names.index(name)]
+        dts = np.array([x.dt for x in bars], dtype='datetime64[ns]')
+        index = self._keep + np.searchsorted(self._dt[self._keep: self._end], dts)
+        if len(index):
+            gid = self.offset + index - self._start
+            if index.max() >= self._end or (self._dt[index] != dts).any() or gid.min() < first or gid.max() > last:
+                raise KeyError(key)
+        return arr[..., index]
+
+    def set_value(self, key: str, gid: int, value):
+        """写入全局序号为 gid 的K线的指标值，并将该K线的 cache 绑定到指标列
+
+        :param key: 指标的缓存 key
+        :param gid: K线的全局序号
+        :param value: 单值指标为浮点数，多值指标为按 names 顺序的元组，或者以 names 为 key 的字典
+        """
+        names, arr, _, _ = column = self._columns[key]
+        i = self._start + gid - self.offset
+        if not self._keep <= i < self._end:
+            raise IndexError(f"全局序号 {gid} 的K线不在 BarStore 中")
+        if names and isinstance(value, dict):
+            value = [value[x] for x in names]
+        arr[..., i] = value
+        self._extend_range(column, gid, gid)
+        self._bind(i, gid)
+
+    def set_column(self, key: str, values: np.ndarray, start: int = 0):
+        """从序列的第 start 根K线开始批量写入指标值，并绑定这些K线的 cache
+
+        :param key: 指标的缓存 key
+        :param values: 单值指标为一维数组，多值指标为形状 (m, k) 的数组
+        :param start: 序列中的起始位置，支持负数
+        """
+        names, arr, _, _ = column = self._columns[key]
+        s = self._index(start) if len(self) else self._start
+        e = s + np.shape(values)[-1]
+        arr[..., s: e] = values
+        gid = self.offset + s - self._start
+        self._extend_range(column, gid, gid + e - s - 1)
+        for i in range(s, e):
+            self._bind(i, gid + i - s)
+
+    def get_value(self, key: str, gid: int):
+        """读取全局序号为 gid 的K线的指标值，多值指标返回字典；没有值时抛出 KeyError"""
+        column = self._columns.get(key)
+        if column is not None:
+            i = self._start + gid - self.offset
+            if column[2] <= gid <= column[3] and self._keep <= i < self._end:
+                names, arr = column[0], column[1]
+                if names:
+                    return dict(zip(names, arr[:, i].tolist()))
+                return float(arr[i])
+        raise KeyError(key)
+
+    def has_value(self, key: str, index: int = -1) -> bool:
+        """序列中第 index 根K线是否已经写入了指标值；K线被其他 BarStore 共享时，只看本 BarStore 的指标列"""
+        return self._has_value(key, self.offset + self._index(index) - self._start)
+
+    def _has_value(self, key: str, gid: int) -> bool:
+        column = self._columns.get(key)
+        return column is not None and column[2] <= gid <= column[3] \
+            and self._keep <= self._start + gid - self.offset < self._end
+
+    @staticmethod
+    def _extend_range(column: list, first: int, last: int):
+        """将 [first, last] 并入指标列的已写入区间；与原区间不相连时，只保留新的区间"""
+        if column[3] < column[2] or first > column[3] + 1 or last < column[2] - 1:
+            column[2], column[3] = first, last
+        else:
+            column[2], column[3] = min(column[2], first), max(column[3], last)
+
+    def _invalidate(self, i: int):
+        """数组位置 i 上的K线被替换或修改，各指标列在这根K线及之后的值失效"""
+        gid = self.offset + i - self._start
+        for column in self._columns.values():
+            if column[2] <= gid <= column[3]:
+                column[3] = gid - 1
+
+    def _bind(self, i: int, gid: int):
+        """将数组位置 i 上K线的 cache 绑定到指标列；K线同时属于其他 BarStore 时，保留对其他 BarStore 的绑定"""
+        bar = self._rows[i]
+        cache = bar.cache
+        if cache.__class__ is BarCache:
+            cache.bind(self, gid)
+        else:
+            bar.cache = BarCache(self, gid, cache)
+
+    def dump_columns(self) -> Tuple[dict, dict]:
+        """导出仍然保留的K线（见 retained）上的全部指标列
+
+        :return: (列定义, 数组)，列定义记录每列的 names 和已写入区间在保留K线中的位置
+        """
+        gid0 = self.offset - (self._start - self._keep)
+        meta, arrays = {}, {}
+        for key, (names, arr, first, last) in self._columns.items():
+            meta[key] = {"names": list(names) if names else None, "first": max(first - gid0, 0), "last": last - gid0}
+            arrays[key] = arr[..., self._keep: self._end]
+        return meta, arrays
+
+    def load_columns(self, meta: dict, arrays: dict):
+        """dump_columns 的逆过程，数组与当前仍然保留的K线对齐"""
+        gid0 = self.offset - (self._start - self._keep)
+        for key, m in meta.items():
+            self.add_column(key, m['names'])
+            column = self._columns[key]
+            column[1][..., self._keep: self._end] = arrays[key]
+            column[2], column[3] = gid0 + m['first'], gid0 + m['last']
+            for i in range(self._keep + m['first'], self._keep + m['last'] + 1):
+                self._bind(i, gid0 + i - self._keep)
+
+
+class BarCache(MutableMapping):
+    """写入了指标列的K线的 cache，兼容原来的字典读写方式
+
+    key 是指标列时，读写对应 BarStore 中的指标列，多值指标读出来是字典；其他 key 读写普通字典 data。
+    同一根K线可能同时属于多个 BarStore（比如用同一组K线创建了两个 CZSC 对象），BarCache 记录K线在每个
+    BarStore 中的全局序号，按最近写入的顺序依次查找；对 BarStore 只保留弱引用，BarStore 释放后自动失效。
+    BarCache 不是 dict 的子类，需要普通字典（比如 JSON 序列化）时使用 dict(bar.cache)。
+    """
+    __slots__ = ('refs', 'data')
+
+    def __init__(self, store: BarStore, gid: int, data: dict = None):
+        """
+
+        :param store: 写入指标列的 BarStore
+        :param gid: K线在 store 中的全局序号
+        :param data: K线原来的 cache，其中与指标列同名的 key 以指标列为准
+        """
+        self.refs = [(weakref.ref(store), gid)]  # (BarStore 的弱引用, 全局序号)，越靠后越新
+        if isinstance(data, BarCache):
+            data = data.data
+        self.data = data if data is not None else {}
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __reduce__(self):
+        # 弱引用不能序列化，pickle、deepcopy 时按仍然存活的 BarStore 保存
+        return _restore_bar_cache, (list(self._stores())[::-1], self.data)
+
+    def bind(self, store: BarStore, gid: int):
+        """记录K线在 store 中的全局序号，并将 store 移到查找顺序的最前面"""
+        ref, g = self.refs[-1]
+        if g == gid and ref() is store:
+            return
+        refs = [(r, g) for r, g in self.refs if r() is not None and r() is not store]
+        refs.append((weakref.ref(store), gid))
+        self.refs = refs
+
+    def _stores(self):
+        """K线所在的全部 BarStore 及其全局序号，最近写入的在前"""
+        for ref, gid in reversed(self.refs):
+            store = ref()
+            if store is not None:
+                yield store, gid
+
+    def __getitem__(self, key):
+        for store, gid in self._stores():
+            if key in store._columns:
+                try:
+                    return store.get_value(key, gid)
+                except KeyError:
+                    pass
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        for store, gid in self._stores():
+            if store._has_value(key, gid):
+                store.set_value(key, gid, value)
+                return
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __contains__(self, key):
+        return any(store._has_value(key, gid) for store, gid in self._stores()) or key in self.data
+
+    def __iter__(self):
+        keys = {}
+        for store, gid in self._stores():
+            keys.update((k, None) for k in store._columns if k not in keys and store._has_value(k, gid))
+        keys.update((k, None) for k in self.data if k not in keys)
+        return iter(keys)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def _restore_bar_cache(stores: list, data: dict) -> BarCache:
+    """BarCache.__reduce__ 的逆过程；BarStore 都已经释放时，还原为普通字典"""
+    if not stores:
+        return data
+    cache = BarCache(stores[0][0], stores[0][1], data)
+    for store, gid in stores[1:]:
+        cache.bind(store, gid)
+    return cache
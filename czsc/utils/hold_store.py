@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/4/6 21:08
+describe: 列式存储的持仓状态序列，用于替代 Position.holds 中的 List[dict]
+"""
+import os
+import shutil
+import tempfile
+import weakref
+import numpy as np
+import pandas as pd
+from typing import List, Union
+
+
+class HoldStore:
+    """列式存储的持仓状态序列
+
+    1. 行访问与 List[dict] 兼容：支持索引、切片、迭代、len、append，行是按需生成的 {'dt', 'pos', 'price', 'bid'} 字典，
+       dt 是 datetime 对象；修改行中的值（如 holds[-1]['pos'] = 0）或者整行赋值（holds[-1] = {...}）时写回各列；
+    2. 列访问：dt, pos, price, bid 以 NumPy 数组视图的形式提供；to_frame 转换为 DataFrame，to_records 转换为结构化数组；
+       带时区的持仓时间按第一次写入时的时区 tz 保存为当地时间，dt 列是不带时区的当地时间，行访问、to_frame 时恢复时区；
+    3. 设置 spill_path 后，行数超过 spill_size 时各列转存到 memmap 文件，不再占用进程内存；
+       每个对象在 spill_path 下使用独立的临时子目录，多个对象可以共用同一个 spill_path，close、对象回收或者进程退出时删除。
+
+    **注意：** 列视图只在下一次写入之前有效；序列化（pickle、deepcopy）时保留 spill_path，反序列化得到的对象转存到新的子目录。
+
+    实现说明：逐行写入时先暂存为元组，积累 flush_size 行或读取时再批量转换写入各列，避免逐个标量转换 datetime64。
+    """
+    flush_size = 4096
+    dtypes = {'dt': 'datetime64[ns]', 'pos': np.int8, 'price': np.float64, 'bid': np.int64}
+
+    def __init__(self, spill_path: str = None, spill_size: int = 1000000, capacity: int = 1024):
+        """
+
+        :param spill_path: memmap 文件目录，默认 None 表示始终保存在内存中
+        :param spill_size: 行数超过 spill_size 时转存到 memmap 文件
+        :param capacity: 初始容量
+        """
+        self.spill_path = spill_path
+        self.spill_size = spill_size
+        self.spilled = False
+        self.spill_dir = None  # 本对象的 memmap 文件目录，转存时在 spill_path 下创建
+        self._finalizer = None  # 删除 spill_dir 的 weakref.finalize，对象回收或者进程退出时执行
+        self.tz = None  # 持仓时间的时区，第一次写入带时区的时间时确定
+        self._n = 0
+        self._pending = []  # 已经写入、但还没有同步到各列的持仓状态
+        self._dt = np.empty(0, dtype=self.dtypes['dt'])
+        self._pos = np.empty(0, dtype=self.dtypes['pos'])
+        self._price = np.empty(0, dtype=self.dtypes['price'])
+        self._bid = np.empty(0, dtype=self.dtypes['bid'])
+        self._resize(capacity)
+
+    @classmethod
+    def from_arrays(cls, dt: np.ndarray, pos: np.ndarray, price: np.ndarray, bid: np.ndarray, tz=None, **kwargs):
+        """使用已有的列数据创建
+
+        :param dt: 持仓时间，datetime64[ns]，带时区时为时区 tz 的当地时间
+        :param pos: 持仓，1 多头，-1 空头，0 空仓
+        :param price: 价格
+        :param bid: K线序号
+        :param tz: 持仓时间的时区，默认不带时区
+        :return: HoldStore 对象
+        """
+        n = len(dt)
+        store = cls(capacity=max(n, 1024), **kwargs)
+        store.tz = tz
+        store._dt[:n] = dt
+        store._pos[:n] = pos
+        store._price[:n] = price
+        store._bid[:n] = bid
+        store._n = n
+        return store
+
+    def __repr__(self):
+        return f"<HoldStore len={len(self)} spilled={self.spilled}>"
+
+    def __len__(self):
+        return self._n + len(self._pending)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[dict, List[dict]]:
+        self._flush()
+        if isinstance(key, slice):
+            return self._rows(*key.indices(self._n))
+        if key < 0:
+            key += self._n
+        if not 0 <= key < self._n:
+            raise IndexError("HoldStore index out of range")
+        return self._rows(key, key + 1, 1)[0]
+
+    def __setitem__(self, key: int, hold: dict):
+        self._flush()
+        if key < 0:
+            key += self._n
+        if not 0 <= key < self._n:
+            raise IndexError("HoldStore index out of range")
+        for name in self.dtypes:
+            self._set_field(key, name, hold[name])
+
+    def __iter__(self):
+        self._flush()
+        return iter(self._rows(0, self._n, 1))
+
+    def __eq__(self, other):
+        if isinstance(other, (HoldStore, list)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __getstate__(self):
+        self._flush()
+        n = self._n
+        return {'spill_path': self.spill_path, 'spill_size': self.spill_size, 'tz': self.tz,
+                'dt': np.array(self._dt[:n]), 'pos': np.array(self._pos[:n]),
+                'price': np.array(self._price[:n]), 'bid': np.array(self._bid[:n])}
+
+    def __setstate__(self, state):
+        store = HoldStore.from_arrays(state['dt'], state['pos'], state['price'], state['bid'], tz=state.get('tz'),
+                                      spill_path=state.get('spill_path'), spill_size=state['spill_size'])
+        self.__dict__.update(store.__dict__)
+        if store._finalizer is not None:
+            # memmap 文件目录交给 self 负责删除，避免临时对象回收时删除
+            store._finalizer.detach()
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+
+    def close(self):
+        """将各列读回内存并删除 memmap 文件目录；之后继续写入超过 spill_size 时，会转存到新的目录"""
+        if not self.spill_dir:
+            return
+        self._flush()
+        for name in self.dtypes:
+            setattr(self, f"_{name}", np.array(getattr(self, f"_{name}")))
+        self.spilled = False
+        self._finalizer()
+        self._finalizer = None
+        self.spill_dir = None
+
+    def _rows(self, start: int, stop: int, step: int) -> List[dict]:
+        sl = slice(start, stop, step)
+        dts = self._datetimes(self._dt[:self._n][sl]).to_pydatetime()
+        return [HoldRow(self, i, dt, p, price, bid) for i, dt, p, price, bid in
+                zip(range(start, stop, step), dts, self._pos[:self._n][sl].tolist(),
+                    self._price[:self._n][sl].tolist(), self._bid[:self._n][sl].tolist())]
+
+    def _datetimes(self, values: np.ndarray) -> pd.DatetimeIndex:
+        """dt 列转换为时间序列，恢复时区"""
+        dts = pd.DatetimeIndex(values)
+        return dts.tz_localize(self.tz) if self.tz is not None else dts
+
+    def _local(self, dts) -> np.ndarray:
+        """持仓时间转换为 dt 列的当地时间；第一次遇到带时区的时间时记录时区"""
+        idx = pd.DatetimeIndex(dts)
+        if idx.tz is not None:
+            if self.tz is None:
+                self.tz = idx.tz
+            idx = idx.tz_convert(self.tz).tz_localize(None)
+        return idx.values.astype('datetime64[ns]')
+
+    def _set_field(self, i: int, name: str, value):
+        """修改第 i 行的一个值"""
+        if name == 'dt':
+            self._dt[i] = self._local([value])[0]
+        else:
+            getattr(self, f"_{name}")[i] = value
+
+    def _alloc(self, name: str, capacity: int) -> np.ndarray:
+        if not self.spilled:
+            return np.zeros(capacity, dtype=self.dtypes[name])
+        if not self.spill_dir:
+            os.makedirs(self.spill_path, exist_ok=True)
+            self.spill_dir = tempfile.mkdtemp(prefix='holds_', dir=self.spill_path)
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+        file = os.path.join(self.spill_dir, f"{name}_{capacity}.bin")
+        return np.memmap(file, dtype=self.dtypes[name], mode='w+', shape=(capacity,))
+
+    def _resize(self, capacity: int):
+        """将各列搬到容量为 capacity 的新数组，超过 spill_size 时转存到 memmap 文件"""
+        old_spilled = self.spilled
+        if self.spill_path and capacity > self.spill_size:
+            self.spilled = True
+
+        n = self._n
+        for name in self.dtypes:
+            old = getattr(self, f"_{name}")
+            arr = self._alloc(name, capacity)
+            arr[:n] = old[:n]
+            setattr(self, f"_{name}", arr)
+
+            if old_spilled:
+                file = old.filename
+                del old
+                os.remove(file)
+
+    def append(self, hold: dict):
+        """追加一个持仓状态，兼容 List[dict] 的写法"""
+        self.push(hold['dt'], hold['pos'], hold['price'], hold['bid'])
+
+    def push(self, dt, pos: int, price: float, bid: int):
+        """追加一个持仓状态"""
+        self._pending.append((dt, pos, price, bid))
+        if len(self._pending) >= self.flush_size:
+            self._flush()
+
+    def _flush(self):
+        """将暂存的持仓状态批量写入各列"""
+        if not self._pending:
+            return
+        dts, pos, price, bid = zip(*self._pending)
+        self._pending = []
+
+        n, m = self._n, len(dts)
+        capacity = len(self._dt)
+        if n + m > capacity:
+            while capacity < n + m:
+                capacity *= 2
+            self._resize(capacity)
+        self._dt[n: n + m] = self._local(dts)
+        self._pos[n: n + m] = pos
+        self._price[n: n + m] = price
+        self._bid[n: n + m] = bid
+        self._n = n + m
+
+    @property
+    def dt(self) -> np.ndarray:
+        self._flush()
+        return self._dt[:self._n]
+
+    @property
+    def pos(self) -> np.ndarray:
+        self._flush()
+        return self._pos[:self._n]
+
+    @property
+    def price(self) -> np.ndarray:
+        self._flush()
+        return self._price[:self._n]
+
+    @property
+    def bid(self) -> np.ndarray:
+        self._flush()
+        return self._bid[:self._n]
+
+    def to_frame(self) -> pd.DataFrame:
+        """转换为 DataFrame，列为 dt, pos, price, bid"""
+        return pd.DataFrame({'dt': self._datetimes(np.array(self.dt)), 'pos': np.array(self.pos),
+                             'price': np.array(self.price), 'bid': np.array(self.bid)})
+
+    def to_records(self) -> np.ndarray:
+        """转换为结构化数组"""
+        self._flush()
+        arr = np.empty(self._n, dtype=[(k, v) for k, v in self.dtypes.items()])
+        for name in self.dtypes:
+            arr[name] = getattr(self, name)
+        return arr
+
+
+class HoldRow(dict):
+    """HoldStore 的一行，修改其中的 dt、pos、price、bid 时写回 HoldStore"""
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store: HoldStore, index: int, dt, pos: int, price: float, bid: int):
+        super().__init__(dt=dt, pos=pos, price=price, bid=bid)
+        self.store = store
+        self.index = index
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key in HoldStore.dtypes:
+            self.store._set_field(self.index, key, value)
+
+    def __reduce__(self):
+        # 序列化时只保留字典内容，与原来的 List[dict] 一致
+        return dict, (dict(self),)
@@ -6,6 +6,7 @@ create_dt: 2022/10/27 23:23
 describe: 用于信号计算函数的各种辅助工具函数
 """
 import numpy as np
+import pandas as pd
 from collections import Counter, OrderedDict
 from typing import List, Any, Dict, Union, Tuple
 from czsc.enum import Direction
@@ -322,3 +323,59 @@ def get_zs_seq(bis: List[BI]) -> List[ZS]:
                 zs.bis.append(bi)
                 zs_list[-1] = zs
     return zs_list
+
+
+def get_signal_columns(df: pd.DataFrame) -> List[str]:
+    """获取信号列，信号值的格式为 v1_v2_v3_score
+
+    :param df: generate_czsc_signals 返回的信号 DataFrame
+    :return: 信号列名列表
+    """
+    cols = []
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            values = df[col].cat.categories
+        elif df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype):
+            values = df[col].dropna().unique()
+        else:
+            continue
+
+        if len(values) and all(isinstance(v, str) and v.count("_") == 3 for v in values):
+            cols.append(col)
+    return cols
+
+
+def encode_signals(df: pd.DataFrame, columns: List[str] = None) -> pd.DataFrame:
+    """将信号列转换为 pandas Categorical，每个信号共用一份取值字典
+
+    信号值是少量长字符串的反复出现，字典编码后每个值只存一次，行内只保留整数编码；
+    to_parquet 时 Categorical 按 parquet 的字典编码写入，read_parquet 读回仍然是 Categorical。
+
+    :param df: generate_czsc_signals 返回的信号 DataFrame
+    :param columns: 需要编码的信号列，默认为 get_signal_columns(df)
+    :return: 信号列为 Categorical 的 DataFrame
+    """
+    columns = get_signal_columns(df) if columns is None else columns
+    df = df.copy()
+    for col in columns:
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def signal_codes(df: pd.DataFrame) -> Tuple[List[dict], Dict[str, List[str]]]:
+    """将信号 DataFrame 转换为 Position 可以直接匹配的整数编码记录
+
+    :param df: 信号列为 Categorical 的 DataFrame，参见 encode_signals
+    :return: (records, categories)
+        records     - 信号列替换为整数编码的记录列表，缺失值编码为 -1
+        categories  - 每个信号列的取值字典，编码 i 对应 categories[key][i]
+    """
+    categories = {}
+    dfc = df.copy()
+    for col in get_signal_columns(df):
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories[col] = list(df[col].cat.categories)
+            dfc[col] = df[col].cat.codes.astype(int)
+    return dfc.to_dict('records'), categories
+
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/4/11 21:05
+describe: 流式技术指标，逐根K线增量计算，结果与 ta-lib 一致到浮点舍入误差的量级
+
+每个指标有两个更新方法：
+
+1. push(*x)：输入一根新的K线，返回这根K线的指标值；
+2. replace(*x)：最后一根K线被替换（未完成K线的更新），用替换后的值重新计算最后一根K线的指标值。
+
+指标内部保存的是最后一根K线之前的状态，replace 只重算最后一步，所以两个方法的成本都是常数级别；
+计算方法与 ta-lib 的 C 实现一致（包括初始值的取法、累加和的加减顺序），结果与 ta-lib 的差异只在浮点舍入误差的量级；
+例外是 SMA、WMA（以及基于 SMA 的 BOLL），每次按窗口重新求和（成本与周期成正比），避免整段序列上的累加和在长时间运行时积累舍入误差。
+ta-lib 本身不同的编译版本（比如是否启用 FMA 指令）之间也存在这个量级的差异，所以不追求逐位相等。
+"""
+import math
+from collections import deque
+from typing import Callable, Tuple
+from czsc.utils.bar_store import BarStore
+
+nan = float('nan')
+
+
+class StreamIndicator:
+    """流式指标的基类，子类实现 push、replace，params 是构造参数"""
+    params = ()
+
+    def push(self, *x):
+        raise NotImplementedError
+
+    def replace(self, *x):
+        raise NotImplementedError
+
+    def to_dict(self) -> dict:
+        """导出指标状态，可以 JSON 序列化"""
+        state = {}
+        for k, v in vars(self).items():
+            if k == 'params':
+                continue
+            if isinstance(v, StreamIndicator):
+                v = v.to_dict()
+            elif isinstance(v, deque):
+                v = list(v)
+            state[k] = v
+        return {"name": self.__class__.__name__, "params": list(self.params), "state": state}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """从 to_dict 的结果恢复指标"""
+        obj = _indicators[data['name']](*data['params'])
+        for k, v in data['state'].items():
+            current = getattr(obj, k)
+            if isinstance(current, StreamIndicator):
+                v = StreamIndicator.from_dict(v)
+            elif isinstance(current, deque):
+                current.extend(v)
+                continue
+            setattr(obj, k, v)
+        return obj
+
+
+class StreamSMA(StreamIndicator):
+    """简单移动平均，对应 ta.SMA
+
+    每次按窗口重新求和，不维护整段序列上的累加和：长时间实盘运行时累加和的舍入误差会不断累积，
+    使 close >= ma 这类恰好相等的比较结果发生翻转；周期一般不大，重新求和的成本可以忽略。
+    """
+
+    def __init__(self, timeperiod: int = 30):
+        self.params = (timeperiod,)
+        self.timeperiod = timeperiod
+        self.window = deque(maxlen=timeperiod)  # 最近 timeperiod 个输入，最后一个是当前K线
+
+    def value(self) -> float:
+        w = self.window
+        if len(w) < self.timeperiod:
+            return nan
+        return math.fsum(w) / self.timeperiod
+
+    def push(self, x: float) -> float:
+        self.window.append(x)
+        return self.value()
+
+    def replace(self, x: float) -> float:
+        self.window[-1] = x
+        return self.value()
+
+
+class StreamEMA(StreamIndicator):
+    """指数移动平均，对应 ta.EMA：前 timeperiod 个输入的简单平均作为初始值"""
+
+    def __init__(self, timeperiod: int = 30):
+        self.params = (timeperiod,)
+        self.timeperiod = timeperiod
+        self.k = 2.0 / (timeperiod + 1)
+        self.count = 0  # 包括当前K线在内的输入数量
+        self.base = 0.0  # 当前K线之前的状态：初始化阶段是累加和，之后是上一个 EMA
+        self.last = nan  # 当前K线的 EMA；初始化阶段是包括当前K线的累加和
+
+    def calc(self, x: float) -> float:
+        n, base = self.timeperiod, self.base
+        if self.count < n:
+            self.last = base + x
+            return nan
+        if self.count == n:
+            self.last = (base + x) / n
+        else:
+            self.last = (x - base) * self.k + base
+        return self.last
+
+    def push(self, x: float) -> float:
+        if self.count:
+            self.base = self.last
+        self.count += 1
+        return self.calc(x)
+
+    def replace(self, x: float) -> float:
+        return self.calc(x)
+
+
+class StreamWMA(StreamIndicator):
+    """加权移动平均，对应 ta.WMA
+
+    与 StreamSMA 一样每次按窗口重新计算加权和，不维护整段序列上的加权和、简单和。
+    """
+
+    def __init__(self, timeperiod: int = 30):
+        self.params = (timeperiod,)
+        self.timeperiod = timeperiod
+        self.divider = (timeperiod * (timeperiod + 1)) >> 1
+        self.window = deque(maxlen=timeperiod)  # 最近 timeperiod 个输入，最后一个是当前K线
+
+    def value(self) -> float:
+        w = self.window
+        if len(w) < self.timeperiod:
+            return nan
+        return math.fsum([x * i for i, x in enumerate(w, 1)]) / self.divider
+
+    def push(self, x: float) -> float:
+        self.window.append(x)
+        return self.value()
+
+    def replace(self, x: float) -> float:
+        self.window[-1] = x
+        return self.value()
+
+
+class StreamIdentity(StreamIndicator):
+    """timeperiod 为 1 的均线，ta.MA 直接返回输入"""
+
+    def __init__(self, timeperiod: int = 1):
+        self.params = (timeperiod,)
+
+    def push(self, x: float) -> float:
+        return x
+
+    def replace(self, x: float) -> float:
+        return x
+
+
+def stream_ma(ma_type: str, timeperiod: int) -> StreamIndicator:
+    """创建流式均线，与 ta.MA(x, timeperiod, matype) 一致
+
+    :param ma_type: 均线类型，支持 SMA、EMA、WMA
+    :param timeperiod: 计算周期
+    :return: 流式均线对象
+    """
+    if timeperiod == 1:
+        return StreamIdentity(timeperiod)
+    return {"SMA": StreamSMA, "EMA": StreamEMA, "WMA": StreamWMA}[ma_type.upper()](timeperiod)
+
+
+class StreamMACD(StreamIndicator):
+    """MACD，对应 ta.MACD，返回 (dif, dea, macd)
+
+    与 ta-lib 一致，快线 EMA 的初始值是慢线第一个有效值之前 fastperiod 个输入的简单平均，不是从第一个输入开始计算。
+    """
+
+    def __init__(self, fastperiod: int = 12, slowperiod: int = 26, signalperiod: int = 9):
+        self.params = (fastperiod, slowperiod, signalperiod)
+        if slowperiod < fastperiod:
+            fastperiod, slowperiod = slowperiod, fastperiod
+        self.fastperiod, self.slowperiod, self.signalperiod = fastperiod, slowperiod, signalperiod
+        self.fast = StreamEMA(fastperiod)
+        self.slow = StreamEMA(slowperiod)
+        self.signal = StreamEMA(signalperiod)
+        self.count = 0
+
+    def calc(self, x: float, method: str) -> Tuple[float, float, float]:
+        if self.count > self.slowperiod - self.fastperiod:
+            getattr(self.fast, method)(x)
+        slow = getattr(self.slow, method)(x)
+        if self.count < self.slowperiod:
+            return nan, nan, nan
+
+        dif = self.fast.last - slow
+        dea = getattr(self.signal, method)(dif)
+        if self.count < self.slowperiod + self.signalperiod - 1:
+            return nan, nan, nan
+        return dif, dea, dif - dea
+
+    def push(self, x: float) -> Tuple[float, float, float]:
+        self.count += 1
+        return self.calc(x, 'push')
+
+    def replace(self, x: float) -> Tuple[float, float, float]:
+        return self.calc(x, 'replace')
+
+
+class StreamBOLL(StreamIndicator):
+    """布林线的中线和标准差，对应 ta.BBANDS(matype=0)，返回 (中线, 标准差)
+
+    上下轨为 中线 ± 标准差 * nbdev，见 boll_bands
+    """
+
+    def __init__(self, timeperiod: int = 20):
+        self.params = (timeperiod,)
+        self.middle = StreamSMA(timeperiod)
+        self.square = StreamSMA(timeperiod)  # 平方的简单平均
+
+    def calc(self, m: float, m2: float) -> Tuple[float, float]:
+        if m != m:
+            return nan, nan
+        v = m2 - m * m
+        return m, math.sqrt(v) if not v < 0.00000001 else 0.0
+
+    def push(self, x: float) -> Tuple[float, float]:
+        return self.calc(self.middle.push(x), self.square.push(x * x))
+
+    def replace(self, x: float) -> Tuple[float, float]:
+        return self.calc(self.middle.replace(x), self.square.replace(x * x))
+
+
+def boll_bands(middle: float, std: float, nbdev: float) -> Tuple[float, float]:
+    """布林线的上下轨，计算方式与 ta.BBANDS 一致
+
+    :return: (上轨, 下轨)
+    """
+    if nbdev == 1.0:
+        return middle + std, middle - std
+    d = std * nbdev
+    return middle + d, middle - d
+
+
+class StreamSTOCH(StreamIndicator):
+    """KD 指标，对应 ta.STOCH(slowk_matype=0, slowd_matype=0)，返回 (k, d)"""
+
+    def __init__(self, fastk_period: int = 5, slowk_period: int = 3, slowd_period: int = 3):
+        self.params = (fastk_period, slowk_period, slowd_period)
+        self.fastk_period = fastk_period
+        self.lookback = fastk_period + slowk_period + slowd_period - 3
+        self.highs = deque(maxlen=fastk_period)
+        self.lows = deque(maxlen=fastk_period)
+        self.slowk = stream_ma('SMA', slowk_period)
+        self.slowd = stream_ma('SMA', slowd_period)
+        self.count = 0
+
+    def calc(self, close: float, method: str) -> Tuple[float, float]:
+        if self.count < self.fastk_period:
+            return nan, nan
+
+        lowest = min(self.lows)
+        diff = max(self.highs) - lowest
+        fastk = (close - lowest) / diff * 100.0 if diff != 0.0 else 0.0
+        k = getattr(self.slowk, method)(fastk)
+        if k != k:
+            return nan, nan
+        d = getattr(self.slowd, method)(k)
+        if self.count <= self.lookback:
+            return nan, nan
+        return k, d
+
+    def push(self, high: float, low: float, close: float) -> Tuple[float, float]:
+        self.count += 1
+        self.highs.append(high)
+        self.lows.append(low)
+        return self.calc(close, 'push')
+
+    def replace(self, high: float, low: float, close: float) -> Tuple[float, float]:
+        self.highs[-1] = high
+        self.lows[-1] = low
+        return self.calc(close, 'replace')
+
+
+class StreamRSI(StreamIndicator):
+    """相对强弱指数，对应 ta.RSI"""
+
+    def __init__(self, timeperiod: int = 14):
+        self.params = (timeperiod,)
+        self.timeperiod = timeperiod
+        self.count = 0
+        self.base = (nan, 0.0, 0.0)  # 当前K线之前的 (收盘价, 平均涨幅, 平均跌幅)；初始化阶段是涨跌幅的累加和
+        self.last = (nan, 0.0, 0.0)
+
+    def calc(self, x: float) -> float:
+        n = self.timeperiod
+        prev, gain, loss = self.base
+        if self.count == 1:
+            self.last = (x, 0.0, 0.0)
+            return nan
+
+        d = x - prev
+        if self.count > n + 1:
+            loss *= (n - 1)
+            gain *= (n - 1)
+        if d < 0:
+            loss -= d
+        else:
+            gain += d
+        if self.count < n + 1:
+            self.last = (x, gain, loss)
+            return nan
+
+        loss /= n
+        gain /= n
+        self.last = (x, gain, loss)
+        t = gain + loss
+        return 100.0 * (gain / t) if t != 0.0 else 0.0
+
+    def push(self, x: float) -> float:
+        if self.count:
+            self.base = self.last
+        self.count += 1
+        return self.calc(x)
+
+    def replace(self, x: float) -> float:
+        return self.calc(x)
+
+
+_indicators = {x.__name__: x for x in [StreamSMA, StreamEMA, StreamWMA, StreamIdentity, StreamMACD, StreamBOLL,
+                                       StreamSTOCH, StreamRSI]}
+
+
+class StreamIndicators:
+    """挂在 CZSC 对象上的流式指标引擎，按 bars_raw 的全局序号跟踪每个指标已经计算到的位置
+
+    1. 第一次使用某个指标时，从 bars_raw 的第一根K线开始计算，之后每根K线只做一次常数级别的增量更新；
+    2. 最后一根K线被替换（时间相同的K线再次输入 CZSC.update）时，只重算最后一根K线；
+    3. 计算结果写入 bars_raw 的指标列（见 BarStore.add_column），信号函数可以直接读取列视图，
+       也可以继续按 bar.cache[key] 的方式读取；
+    4. 记录每个指标更新时 bars_raw 的版本号（BarStore.version），同一根K线上多个信号函数重复调用时直接返回。
+    """
+
+    def __init__(self):
+        self.bars = None
+        self.items = {}  # key -> [指标, 最后计算的K线的全局序号, 最后计算的K线, 最后计算的K线的输入, bars 的版本号]
+
+    def __repr__(self):
+        return f"<StreamIndicators {list(self.items.keys())}>"
+
+    def update(self, bars: BarStore, key: str, factory: Callable[[], StreamIndicator],
+               fields: Tuple[str, ...] = ('close',), fmt: Callable = None, names: Tuple[str, ...] = None) -> str:
+        """将指标 key 更新到 bars 的最后一根K线，结果写入 bars 的指标列 key
+
+        :param bars: CZSC 对象的 bars_raw
+        :param key: 指标的缓存 key，也是指标列的名称
+        :param factory: 创建指标对象的函数，key 第一次出现时调用
+        :param fields: 指标的输入字段，按顺序传给 push、replace
+        :param fmt: 写入指标列之前的转换函数，输入为 (指标值, 输入值元组)，默认直接写入指标值
+        :param names: 多值指标各个值的名称，fmt 按这个顺序返回元组
+        :return: key
+        """
+        if bars is not self.bars:
+            self.bars, self.items = bars, {}
+
+        item = self.items.get(key)
+        if item is not None and item[4] == bars.version:
+            return key
+
+        n = len(bars)
+        if n == 0:
+            return key
+        offset = bars.offset
+        if item is None or item[1] >= offset + n or not bars.has_column(key):
+            bars.add_column(key, names)
+            item = self.items[key] = [factory(), offset - 1, None, None, -1]
+        ind, last, bar, inputs = item[:4]
+
+        if last >= offset:
+            # 最后计算的K线可能已经被替换，或者被原地修改（BarGenerator 的 inplace 模式会清空 cache）
+            x = bars[last - offset]
+            xin = tuple([getattr(x, f) for f in fields])
+            cache = x.cache
+            if x is not bar or xin != inputs or cache is None or key not in cache:
+                value = ind.replace(*xin)
+                bars.set_value(key, last, fmt(value, xin) if fmt else value)
+                item[2], item[3] = x, xin
+
+        if last < offset + n - 1:
+            gid = max(last + 1, offset)
+            for x in bars[gid - offset:]:
+                xin = tuple([getattr(x, f) for f in fields])
+                value = ind.push(*xin)
+                bars.set_value(key, gid, fmt(value, xin) if fmt else value)
+                gid += 1
+            item[1], item[2], item[3] = offset + n - 1, x, xin
+        item[4] = bars.version
+        return key
+
+    def dump(self) -> dict:
+        """导出全部指标的状态，可以 JSON 序列化，用于快照；最后计算的K线记录为在 bars 中的位置"""
+        offset = self.bars.offset if self.bars is not None else 0
+        return {k: {"indicator": v[0].to_dict(), "index": v[1] - offset, "inputs": list(v[3]) if v[3] else None}
+                for k, v in self.items.items()}
+
+    def load(self, data: dict, bars: BarStore):
+        """从 dump 的结果恢复指标状态
+
+        :param data: dump 的结果
+        :param bars: 指标对应的 bars_raw
+        """
+        self.bars = bars
+        self.items = {k: [StreamIndicator.from_dict(v['indicator']), v['index'] + bars.offset, None,
+                          tuple(v['inputs']) if v['inputs'] else None, -1] for k, v in data.items()}
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/4/10 20:36
+describe: 多标的 Tick 流合成分钟K线，合成的K线可以直接输入 BarGenerator、CzscTrader
+"""
+import os
+import time
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import List, Callable, Union, AnyStr, Iterable
+from czsc.objects import RawBar, Tick, Freq
+from czsc.utils.bar_generator import TradingCalendar
+
+
+class TickAggregator:
+    """多标的 Tick 流合成分钟K线
+
+    1. K线区间左开右闭：K线结束时间为 end 时，包含 (end - 1分钟, end] 内的 Tick，再按 calendar 归入目标周期；
+       按 calendar 所属市场的交易时段修正：收盘之后 grace 分钟内的 Tick（如 15:00:03 的收盘集合竞价）归入该时段的
+       最后一根K线，开盘之前 pre_open 分钟内的 Tick（如 09:25 的开盘集合竞价）归入该时段的第一根K线；
+    2. 输入的 Tick 整体按时间升序：某个 Tick 所在的K线结束时间大于之前所有 Tick 时，之前所有标的未完成的K线都视为完成，
+       停牌、成交稀疏的标的不需要等待自己的下一个 Tick；
+    3. 每个标的只保存一根未完成的K线和累计成交量等少量状态，内存占用只与标的数量有关，与 Tick 数量无关；
+    4. 晚于所在K线完成时间到达的 Tick 丢弃，数量记录在 late 中；累计口径下，其成交量计入该标的的下一根K线。
+    """
+
+    def __init__(self, freq: Union[Freq, AnyStr] = Freq.F1, cumulative: bool = False,
+                 calendar: TradingCalendar = None, on_bar: Callable[[RawBar], None] = None,
+                 grace: int = 1, pre_open: int = 15):
+        """
+
+        :param freq: K线周期，支持 1/5/15/30/60 分钟
+        :param cumulative: Tick 中的 vol、amount 是否为当日累计值，默认 False 表示单笔成交量、成交额
+        :param calendar: 交易日历，用于确定K线结束时间、交易时段和累计成交量的交易日，默认与 BarGenerator 一致；
+            期货等交易时段与默认市场不同的品种，需要传入对应市场的 TradingCalendar
+        :param on_bar: K线完成时的回调函数，比如 lambda bar: traders[bar.symbol].on_bar(bar)
+        :param grace: 收盘之后归入最后一根K线的宽限时间，单位：分钟
+        :param pre_open: 开盘之前归入第一根K线的集合竞价时间，单位：分钟
+        """
+        self.freq = freq if isinstance(freq, Freq) else Freq(freq)
+        assert self.freq in TradingCalendar.minute_freqs, f"TickAggregator 不支持的K线周期：{self.freq}"
+        self.cumulative = cumulative
+        self.calendar = calendar if calendar is not None else TradingCalendar()
+        self.on_bar = on_bar
+        self.__sessions = self.calendar.session_table(grace=grace, pre_open=pre_open)
+
+        self.bars = {}  # 各标的未完成的K线：[end, open, high, low, close, vol, amount]
+        self.meta = {}  # 各标的的状态：[下一根K线的 id, 最后完成的K线结束时间, 交易日, 累计成交量, 累计成交额]
+        self.pending = {}  # K线结束时间 -> 有未完成K线的标的
+        self.end_dt = None  # 当前K线结束时间，即所有 Tick 所在K线结束时间的最大值
+        self.ticks = 0
+        self.late = 0
+        self.__span = (None, None, None)  # 最近一次计算的 (lo, hi, end)，(lo, hi] 内的 Tick 归入结束时间为 end 的K线
+
+    def __repr__(self):
+        return f"<TickAggregator {self.freq.value} symbols={len(self.meta)} end_dt={self.end_dt}>"
+
+    def __end_time(self, dt: datetime) -> datetime:
+        """Tick 所在K线的结束时间"""
+        lo, hi, end = self.__span
+        if lo is not None and lo < dt <= hi:
+            return end
+
+        hi = dt.replace(second=0, microsecond=0)
+        if hi != dt:
+            hi += timedelta(minutes=1)
+        mod = hi.hour * 60 + hi.minute
+        delta = self.__sessions[mod] - mod
+        if delta:
+            # 修正后的时间可能跨越零点，比如 23:50 开盘的时段，取距离最近的方向
+            delta = (delta + 720) % 1440 - 720
+            end = self.calendar.end_time(hi + timedelta(minutes=delta), self.freq)
+        else:
+            end = self.calendar.end_time(hi, self.freq)
+        self.__span = (hi - timedelta(minutes=1), hi, end)
+        return end
+
+    def __emit(self, symbol: str, state: list) -> RawBar:
+        """完成 symbol 的K线"""
+        meta = self.meta[symbol]
+        end, open_, high, low, close, vol, amount = state
+        bar = RawBar(symbol=symbol, id=meta[0], dt=end, freq=self.freq, open=open_, close=close,
+                     high=high, low=low, vol=vol, amount=amount)
+        meta[0] += 1
+        meta[1] = end
+        if self.on_bar:
+            self.on_bar(bar)
+        return bar
+
+    def __release(self, end_dt: datetime) -> List[RawBar]:
+        """完成结束时间早于 end_dt 的所有K线"""
+        completed = []
+        for end in sorted(x for x in self.pending if x < end_dt):
+            for symbol in self.pending.pop(end):
+                state = self.bars.get(symbol)
+                if state is not None and state[0] == end:
+                    del self.bars[symbol]
+                    completed.append(self.__emit(symbol, state))
+        return completed
+
+    def update(self, tick: Tick) -> List[RawBar]:
+        """输入一个 Tick
+
+        :param tick: Tick 对象
+        :return: 因为这个 Tick 而完成的K线列表，通常为空
+        """
+        self.ticks += 1
+        symbol, dt, price = tick.symbol, tick.dt, tick.price
+        end = self.__end_time(dt)
+
+        completed = []
+        if self.end_dt is None or end > self.end_dt:
+            if self.end_dt is not None:
+                completed = self.__release(end)
+            self.end_dt = end
+
+        meta = self.meta.get(symbol)
+        if meta is None:
+            meta = self.meta[symbol] = [0, None, None, 0, 0]
+
+        state = self.bars.get(symbol)
+        if (meta[1] is not None and end <= meta[1]) or (state is not None and end < state[0]):
+            self.late += 1
+            return completed
+
+        vol, amount = tick.vol, tick.amount
+        if self.cumulative:
+            # 累计值在交易日切换或者变小时重新开始
+            trade_day = self.calendar.end_time(dt, Freq.D)
+            if trade_day != meta[2] or vol < meta[3]:
+                meta[2], meta[3], meta[4] = trade_day, 0, 0
+            vol, amount, meta[3], meta[4] = vol - meta[3], amount - meta[4], vol, amount
+
+        if state is not None and state[0] == end:
+            if price > state[2]:
+                state[2] = price
+            elif price < state[3]:
+                state[3] = price
+            state[4] = price
+            state[5] += vol
+            state[6] += amount
+            return completed
+
+        if state is not None:
+            completed.append(self.__emit(symbol, state))
+
+        self.bars[symbol] = [end, price, price, price, price, vol, amount]
+        self.pending.setdefault(end, []).append(symbol)
+        return completed
+
+    def flush(self, dt: datetime = None) -> List[RawBar]:
+        """完成结束时间小于等于 dt 的K线，用于收盘、数据流结束时输出最后一根K线
+
+        :param dt: 时间，默认完成所有未完成的K线
+        :return: 完成的K线列表
+        """
+        if dt is None:
+            return self.__release(datetime.max)
+        return self.__release(self.__end_time(dt) + timedelta(microseconds=1))
+
+
+def read_ticks(file: str, chunksize: int = 100000) -> Iterable[Tick]:
+    """分块读取 Tick 文件，内存占用与文件大小无关
+
+    :param file: csv 或 parquet 文件，包含 symbol, dt, price, vol 列，可选 amount, name 列，按 dt 升序排列
+    :param chunksize: 每次读取的行数
+    :return: Tick 迭代器
+    """
+    if file.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(file).iter_batches(batch_size=chunksize))
+    else:
+        chunks = pd.read_csv(file, chunksize=chunksize, parse_dates=['dt'])
+
+    for df in chunks:
+        n = len(df)
+        names = df['name'].tolist() if 'name' in df.columns else [""] * n
+        amounts = df['amount'].tolist() if 'amount' in df.columns else [0] * n
+        dts = pd.DatetimeIndex(df['dt']).to_pydatetime()
+        for symbol, name, price, vol, dt, amount in zip(df['symbol'].tolist(), names, df['price'].tolist(),
+                                                        df['vol'].tolist(), dts, amounts):
+            yield Tick(symbol=symbol, name=name, price=price, vol=vol, dt=dt, amount=amount)
+
+
+def replay_ticks(file: str, aggregator: TickAggregator, chunksize: int = 100000) -> dict:
+    """回放 Tick 文件，用于离线测试 Tick 合成K线以及下游的 BarGenerator、CzscTrader
+
+    :param file: Tick 文件，格式见 read_ticks
+    :param aggregator: TickAggregator 对象，完成的K线通过它的 on_bar 回调输出
+    :param chunksize: 每次读取的行数
+    :return: 回放统计
+    """
+    assert os.path.exists(file), f"{file} 不存在"
+    start = time.perf_counter()
+    n_bars = 0
+    for tick in read_ticks(file, chunksize=chunksize):
+        n_bars += len(aggregator.update(tick))
+    n_bars += len(aggregator.flush())
+    seconds = time.perf_counter() - start
+    return {"ticks": aggregator.ticks, "bars": n_bars, "late": aggregator.late, "symbols": len(aggregator.meta),
+            "seconds": round(seconds, 3), "ticks_per_sec": round(aggregator.ticks / seconds, 2) if seconds else None}
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2023/4/5 21:08
+describe: CZSC.update 单根K线耗时的微基准测试
+
+用随机游走生成1分钟K线，逐根调用 CZSC.update，按分段统计每根K线的平均耗时；
+max_bi_num 设置得足够大，使 bars_raw 随历史长度持续增长，用于观察单根K线耗时是否随历史长度增长。
+
+运行方式：python examples/czsc_update_benchmark.py --bars 100000 --step 10000
+
+吞吐量、内存峰值的完整基准测试见 czsc.benchmarks：python -m czsc.benchmarks
+"""
+import time
+import argparse
+from czsc.analyze import CZSC
+from czsc.benchmarks import random_walk_bars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CZSC.update 单根K线耗时")
+    parser.add_argument('--bars', type=int, default=100000, help="K线数量")
+    parser.add_argument('--step', type=int, default=10000, help="统计分段的K线数量")
+    parser.add_argument('--max_bi_num', type=int, default=100000, help="最大保留的笔数量")
+    args = parser.parse_args()
+
+    bars = random_walk_bars(args.bars)
+    c = CZSC(bars[:3], max_bi_num=args.max_bi_num)
+    print(f"{'history':>10} {'bars_raw':>10} {'us/bar':>10}")
+    for i in range(3, len(bars), args.step):
+        chunk = bars[i: i + args.step]
+        start = time.perf_counter()
+        for bar in chunk:
+            c.update(bar)
+        cost = (time.perf_counter() - start) / len(chunk) * 1e6
+        print(f"{i + len(chunk):>10} {len(c.bars_raw):>10} {cost:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
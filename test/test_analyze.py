@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+describe: CZSC 批量初始化与逐K线更新的一致性测试
+"""
+from czsc.analyze import CZSC
+from czsc.objects import RawBar
+from czsc.benchmarks.mock import random_walk_bars
+
+
+def _fx(fx):
+    return fx.dt, fx.mark, fx.high, fx.low, fx.fx, [x.dt for x in fx.elements]
+
+
+def _state(c: CZSC):
+    """CZSC 对象的分析结果：原始K线、未完成笔的无包含K线、笔、分型"""
+    return {
+        "bars_raw": [(x.dt, x.open, x.close, x.high, x.low) for x in c.bars_raw],
+        "bars_ubi": [(x.dt, x.high, x.low, [y.dt for y in x.raw_bars]) for x in c.bars_ubi],
+        "bi_list": [(x.sdt, x.edt, x.direction, x.high, x.low, [_fx(y) for y in x.fxs],
+                     [y.dt for y in x.bars], [y.dt for y in x.raw_bars]) for x in c.bi_list],
+        "fx_list": [_fx(x) for x in c.fx_list],
+        "ubi_fxs": [_fx(x) for x in c.ubi_fxs],
+        "finished_bis": len(c.finished_bis),
+    }
+
+
+def test_from_bars():
+    """from_bars 与逐K线 update 的结果一致，包括 bars_raw 被裁剪的情况；之后继续更新、替换最后一根K线也一致"""
+    bars = random_walk_bars(6000, freq='30分钟', seed=11)
+    for max_bi_num in [50, 6]:
+        for n in [2, 100, 3000, 5000]:
+            c1 = CZSC(bars[:n], max_bi_num=max_bi_num)
+            c2 = CZSC.from_bars(bars[:n], max_bi_num=max_bi_num)
+            assert _state(c1) == _state(c2)
+
+            for i, bar in enumerate(bars[n:n + 500]):
+                if i % 7 == 0:
+                    # 先输入一根未完成的K线，再用完成的K线替换
+                    part = RawBar(symbol=bar.symbol, id=bar.id, dt=bar.dt, freq=bar.freq, open=bar.open,
+                                  close=bar.open, high=max(bar.open, bar.low), low=bar.low, vol=0, amount=0)
+                    c1.update(part)
+                    c2.update(part)
+                c1.update(bar)
+                c2.update(bar)
+            assert _state(c1) == _state(c2)
+        assert len(c1.bi_list) <= max_bi_num and c1.bars_raw[0].dt > bars[0].dt
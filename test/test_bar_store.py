@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+describe: BarStore 指标列与 bar.cache 兼容读写的测试
+"""
+import numpy as np
+from czsc.analyze import CZSC
+from czsc.benchmarks.mock import random_walk_bars
+from czsc.signals.tas import update_ma_cache, tas_ma_base_V221101, tas_ma_round_V221206
+from czsc.signals.cxt import cxt_bi_end_V230104
+
+
+def test_shared_bars_between_czsc():
+    """同一组K线创建的两个 CZSC 对象，各自写入的指标列互不覆盖"""
+    bars = random_walk_bars(2000)
+    c1 = CZSC(bars)
+    c2 = CZSC(bars)
+    key1 = update_ma_cache(c1, 'SMA', 5)
+    key2 = update_ma_cache(c2, 'SMA', 10)
+
+    bar = c1.bars_raw[-1]
+    assert bar is c2.bars_raw[-1]
+    assert bar.cache[key1] == c1.bars_raw.column(key1)[-1]
+    assert bar.cache[key2] == c2.bars_raw.column(key2)[-1]
+    assert key1 in bar.cache and key2 in bar.cache
+    assert set(dict(bar.cache)) >= {key1, key2}
+
+    assert tas_ma_base_V221101(c1, di=1, ma_type='SMA', timeperiod=5)
+    assert tas_ma_round_V221206(c1, di=1, ma_type='SMA', timeperiod=5)
+    assert cxt_bi_end_V230104(c1)
+    assert tas_ma_base_V221101(c2, di=1, ma_type='SMA', timeperiod=10)
+
+    # 丢弃 c2 之后，bar.cache 不再返回 c2 的指标列
+    del c2
+    assert key2 not in bar.cache
+    assert bar.cache[key1] == c1.bars_raw.column(key1)[-1]
+
+
+def test_shared_bars_talib_ma():
+    """非流式均线按本 BarStore 的指标列判断是否需要更新，不受共享K线上其他 CZSC 的指标值影响"""
+    bars = random_walk_bars(500)
+    c1 = CZSC(bars)
+    c2 = CZSC(bars)
+    key = update_ma_cache(c1, 'KAMA', 10)
+    assert update_ma_cache(c2, 'KAMA', 10) == key
+    assert np.allclose(c1.bars_raw.column(key)[-100:], c2.bars_raw.column(key)[-100:])
+
+
+def test_lookup():
+    bars = random_walk_bars(300)
+    c = CZSC(bars)
+    key = update_ma_cache(c, 'SMA', 5)
+    picked = [c.bars_raw[30], c.bars_raw[100], c.bars_raw[-1]]
+    values = c.bars_raw.lookup(key, picked)
+    assert np.allclose(values, c.bars_raw.column(key)[[30, 100, -1]])
+
+
+def test_bar_cache_pickle():
+    import pickle
+    from copy import deepcopy
+
+    c = CZSC(random_walk_bars(500))
+    key = update_ma_cache(c, 'SMA', 5)
+    for c2 in [pickle.loads(pickle.dumps(c)), deepcopy(c)]:
+        assert c2.bars_raw[-1].cache[key] == c.bars_raw[-1].cache[key]
+        update_ma_cache(c2, 'SMA', 10)
+        assert 'SMA10' in c2.bars_raw[-1].cache and 'SMA10' not in c.bars_raw[-1].cache
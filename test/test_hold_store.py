@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+describe: HoldStore 时区与行写回的测试
+"""
+import pickle
+from datetime import datetime, timedelta, timezone
+from czsc.utils.hold_store import HoldStore
+
+PRC = timezone(timedelta(hours=8))
+
+
+def test_tz_aware_dt():
+    store = HoldStore()
+    dt0 = datetime(2023, 4, 10, 10, 0, tzinfo=PRC)
+    for i in range(10):
+        store.push(dt0 + timedelta(minutes=i), 1, 10.0 + i, i)
+
+    row = store[0]
+    assert type(row['dt']) is datetime
+    assert row['dt'] == dt0 and row['dt'].utcoffset() == timedelta(hours=8)
+    assert store[0]['dt'].hour == 10 and [x['dt'] for x in store][-1] == dt0 + timedelta(minutes=9)
+    assert store.to_frame()['dt'].iloc[0] == dt0
+    # dt 列是当地时间
+    assert str(store.dt[0]).startswith('2023-04-10T10:00')
+
+    restored = pickle.loads(pickle.dumps(store))
+    assert restored[0]['dt'] == dt0 and restored.tz is not None
+
+
+def test_row_write_back():
+    store = HoldStore()
+    for i in range(5):
+        store.append({'dt': datetime(2023, 4, 10, 10, i), 'pos': 1, 'price': 10.0, 'bid': i})
+
+    store[-1]['pos'] = 0
+    assert store[-1]['pos'] == 0 and store.pos[-1] == 0
+    store[1] = {'dt': datetime(2023, 4, 10, 10, 1), 'pos': -1, 'price': 9.5, 'bid': 1}
+    assert store[1] == {'dt': datetime(2023, 4, 10, 10, 1), 'pos': -1, 'price': 9.5, 'bid': 1}
+    assert type(pickle.loads(pickle.dumps(store[0]))) is dict
+
+
+def test_spill_dir_removed_at_exit(tmp_path):
+    """转存到 memmap 的对象及其 deepcopy、pickle 副本在进程退出时仍然存活，临时目录也要删除"""
+    import subprocess
+    import sys
+    code = f"""
+import pickle
+from copy import deepcopy
+from datetime import datetime, timedelta
+from czsc.utils.hold_store import HoldStore
+store = HoldStore(spill_path={str(tmp_path)!r}, spill_size=1000)
+for i in range(5000):
+    store.push(datetime(2023, 1, 1) + timedelta(minutes=i), 1, 10.0, i)
+copies = [deepcopy(store), pickle.loads(pickle.dumps(store))]
+assert store.spilled and all(x.spilled for x in copies)
+assert len(set([store.spill_dir] + [x.spill_dir for x in copies])) == 3
+"""
+    res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert res.returncode == 0, res.stderr
+    assert 'Error' not in res.stderr
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_close_removes_spill_dir(tmp_path):
+    import os
+    store = HoldStore(spill_path=str(tmp_path), spill_size=1000)
+    for i in range(2000):
+        store.push(datetime(2023, 1, 1) + timedelta(minutes=i), 1, 10.0, i)
+    spill_dir = store.spill_dir
+    assert os.path.exists(spill_dir)
+    store.close()
+    assert not os.path.exists(spill_dir) and len(store) == 2000 and store[-1]['bid'] == 1999
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+describe: czsc.objects 中数据结构的兼容性测试
+"""
+from datetime import datetime
+from czsc.analyze import CZSC
+from czsc.objects import NewBar, Freq
+from czsc.benchmarks.mock import random_walk_bars
+
+
+def test_new_bar_elements():
+    bars = random_walk_bars(10)
+    nb = NewBar(symbol='000001.SH', id=1, dt=datetime(2023, 4, 10), freq=Freq.F1, open=1, close=1, high=1,
+                low=1, vol=1, elements=bars[:2])
+    assert nb.elements == nb.raw_bars == nb.raw_list == bars[:2]
+
+    # 引用 store 的无包含K线，赋值 elements 之后改为使用指定的原始K线
+    c = CZSC(random_walk_bars(300))
+    nb = c.bars_ubi[-1]
+    assert nb.elements == nb.raw_bars
+    nb.elements = bars[:3]
+    assert nb.store is None and nb.raw_bars == bars[:3]
+
+
+def test_event_matcher():
+    """编译后的事件匹配与 Event.is_match 一致；设置取值字典后，整数编码和字符串信号值都可以匹配"""
+    import random
+    from czsc.objects import Event, EventMatcher, Factor, Signal, Operate
+
+    rd = random.Random(0)
+    keys = ['15分钟_D1K_SMA5', '30分钟_D1K_MACD', '日线_D1_表里关系']
+    values = [f"{a}_{b}_{c}_{s}" for a in ['多头', '空头'] for b in ['向上', '向下'] for c in ['任意', '其他'] for s in [0, 1]]
+
+    def signal():
+        v1, v2, v3 = rd.choice(['多头', '空头', '任意']), rd.choice(['向上', '向下', '任意']), rd.choice(['任意', '其他'])
+        return Signal(f"{rd.choice(keys)}_{v1}_{v2}_{v3}_{rd.choice([0, 1])}")
+
+    def signals(n):
+        return [signal() for _ in range(rd.randint(0, n))]
+
+    events = []
+    for i in range(30):
+        factors = [Factor(name=f"F{i}{j}", signals_all=[signal() for _ in range(rd.randint(1, 2))],
+                          signals_any=signals(2), signals_not=signals(1)) for j in range(rd.randint(1, 3))]
+        events.append(Event(name=f"E{i}", operate=rd.choice([Operate.LO, Operate.SO, Operate.LE, Operate.SE]),
+                            factors=factors, signals_all=signals(1), signals_any=signals(2), signals_not=signals(1)))
+
+    matcher = EventMatcher()
+    eids = matcher.add_events(events)
+    categories = {keys[0]: values, keys[1]: values}
+    n_hits = 0
+    for i in range(300):
+        s = {'dt': datetime(2023, 1, 1, i // 60, i % 60), **{k: rd.choice(values) for k in keys}}
+        expected = [event.is_match(s) for event in events]
+        n_hits += sum(x[0] for x in expected)
+
+        matcher.set_categories(None)
+        matcher.bind(s)
+        assert [matcher.match(eid) for eid in eids] == expected
+
+        # keys[0] 传入整数编码，keys[1] 虽然有取值字典但仍然传入字符串，keys[2] 没有取值字典
+        sc = dict(s, **{keys[0]: values.index(s[keys[0]])})
+        matcher.set_categories(categories)
+        matcher.bind(sc)
+        assert [matcher.match(eid) for eid in eids] == expected
+    assert n_hits > 0
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+describe: 信号执行计划的测试
+"""
+import dill
+import pandas as pd
+from czsc.objects import Event, Position
+from czsc.traders.base import CzscTrader, generate_czsc_signals
+from czsc.utils.bar_generator import BarGenerator
+from czsc.signals import SignalPlan
+from czsc.benchmarks.mock import random_walk_bars
+
+signals_config = [
+    {'name': 'tas_ma_base_V221101', 'freq': '15分钟', 'di': 1, 'ma_type': 'SMA', 'timeperiod': 5},
+    {'name': 'tas_macd_base_V221028', 'freq': '30分钟', 'di': 1, 'key': 'macd'},
+    {'name': 'cxt_bi_end_V230222', 'freq': '30分钟', 'max_freq': '15分钟'},
+    {'name': 'bar_zdt_V221110', 'freq': '15分钟', 'di': 1},
+]
+
+
+def _trader(bars):
+    bg = BarGenerator('5分钟', ['15分钟', '30分钟'])
+    for bar in bars:
+        bg.update(bar)
+    opens = [Event.load({'name': 'SMA5多头', 'operate': '开多', 'signals_all': [], 'signals_any': [], 'signals_not': [],
+                         'factors': [{'name': 'SMA5多头', 'signals_all': ['15分钟_D1K_SMA5_多头_任意_任意_0'],
+                                      'signals_any': [], 'signals_not': []}]})]
+    exits = [Event.load({'name': 'SMA5空头', 'operate': '平多', 'signals_all': [], 'signals_any': [], 'signals_not': [],
+                         'factors': [{'name': 'SMA5空头', 'signals_all': ['15分钟_D1K_SMA5_空头_任意_任意_0'],
+                                      'signals_any': [], 'signals_not': []}]})]
+    pos = Position(symbol=bg.symbol, opens=opens, exits=exits, name='SMA5')
+    return CzscTrader(bg, get_signals=SignalPlan(signals_config), positions=[pos])
+
+
+def test_signal_plan_dill():
+    """使用 SignalPlan 的 CzscTrader 可以被 dill 序列化，恢复后继续更新的结果一致"""
+    bars = random_walk_bars(3000, freq='5分钟', seed=1)
+    trader = _trader(bars[:2000])
+    trader2 = dill.loads(dill.dumps(trader))
+    for bar in bars[2000:]:
+        trader.on_bar(bar)
+        trader2.on_bar(bar)
+        assert trader.s == trader2.s
+    assert trader.positions[0].operates == trader2.positions[0].operates
+
+
+def _vector_config():
+    config = []
+    for freq in ['15分钟', '60分钟']:
+        for di in [1, 2]:
+            config += [
+                {'name': 'tas_ma_base_V221101', 'freq': freq, 'di': di, 'ma_type': 'SMA', 'timeperiod': 5},
+                {'name': 'tas_ma_base_V221203', 'freq': freq, 'di': di, 'ma_type': 'EMA', 'timeperiod': 10, 'th': 50},
+                {'name': 'tas_double_ma_V221203', 'freq': freq, 'di': di, 'ma_type': 'WMA', 'ma_seq': (5, 20)},
+                {'name': 'tas_macd_base_V221028', 'freq': freq, 'di': di, 'key': 'dif'},
+                {'name': 'tas_macd_direct_V221106', 'freq': freq, 'di': di},
+                {'name': 'tas_kdj_base_V221101', 'freq': freq, 'di': di},
+                {'name': 'tas_double_rsi_V221203', 'freq': freq, 'di': di, 'rsi_seq': (5, 10)},
+                {'name': 'vol_single_ma_V230214', 'freq': freq, 'di': di, 'ma_type': 'SMA', 'timeperiod': 5},
+                {'name': 'vol_double_ma_V230214', 'freq': freq, 'di': di, 't1': 5, 't2': 20},
+                {'name': 'bar_zdt_V221110', 'freq': freq, 'di': di},
+                {'name': 'bar_single_V230214', 'freq': freq, 'di': di, 't': 1.5},
+                {'name': 'jcc_yun_xian_V221118', 'freq': freq, 'di': di},
+            ]
+    return config
+
+
+def test_vectorize():
+    """向量化计算与逐K线计算的信号完全一致，包括需要逐K线计算的信号、全部信号都有向量化实现两种情况"""
+    bars = random_walk_bars(6000, freq='5分钟', seed=5)
+    stream = [{'name': 'cxt_bi_end_V230222', 'freq': '60分钟', 'max_freq': '15分钟'},
+              {'name': 'tas_ma_base_V221101', 'freq': '15分钟', 'di': 1, 'ma_type': 'DEMA', 'timeperiod': 5}]
+    for config in [_vector_config(), _vector_config() + stream]:
+        kw = dict(freqs=['15分钟', '60分钟'], sdt=bars[2000].dt, init_n=1000, df=True)
+        df1 = generate_czsc_signals(bars, SignalPlan(config), vectorize=False, **kw)
+        df2 = generate_czsc_signals(bars, SignalPlan(config), vectorize=True, **kw)
+        cols = [x for x in df1.columns if x != 'cache']
+        assert len(cols) > 40 and list(df2.columns) == list(df1.columns)
+        pd.testing.assert_frame_equal(df1[cols], df2[cols])
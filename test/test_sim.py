@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+describe: 向量化仓位回测与逐K线 Position.update 的一致性测试
+"""
+import pandas as pd
+from czsc.objects import Event, Position
+from czsc.signals import SignalPlan
+from czsc.traders.base import generate_czsc_signals
+from czsc.traders.sim import PositionSimulator, position_grid
+from czsc.benchmarks.mock import random_walk_bars
+
+signals_config = [
+    {'name': 'tas_ma_base_V221101', 'freq': '15分钟', 'di': 1, 'ma_type': 'SMA', 'timeperiod': 5},
+    {'name': 'tas_macd_base_V221028', 'freq': '30分钟', 'di': 1, 'key': 'macd'},
+]
+
+
+def _event(name, operate, signals_all):
+    return Event.load({'name': name, 'operate': operate, 'signals_all': [], 'signals_any': [], 'signals_not': [],
+                       'factors': [{'name': name, 'signals_all': signals_all, 'signals_any': [], 'signals_not': []}]})
+
+
+def _signals():
+    bars = random_walk_bars(4000, freq='5分钟', seed=3)
+    return generate_czsc_signals(bars, SignalPlan(signals_config), freqs=['15分钟', '30分钟'],
+                                 sdt=bars[1000].dt, init_n=500, df=True)
+
+
+def _positions(symbol):
+    """仓位变体，每次调用都创建新的仓位对象"""
+    opens = [_event('SMA5多头', '开多', ['15分钟_D1K_SMA5_多头_向上_任意_0', '30分钟_D1K_MACD_多头_任意_任意_0']),
+             _event('SMA5空头', '开空', ['15分钟_D1K_SMA5_空头_向下_任意_0', '30分钟_D1K_MACD_空头_任意_任意_0'])]
+    exits = [_event('MACD空头', '平多', ['30分钟_D1K_MACD_空头_向下_任意_0']),
+             _event('MACD多头', '平空', ['30分钟_D1K_MACD_多头_向上_任意_0'])]
+    base = Position(symbol=symbol, opens=opens, exits=exits, name='SMA5', interval=3600)
+    return position_grid(base, timeout=[20, 1000], stop_loss=[30, 1000], T0=[True, False])
+
+
+def _replay(position, sigs):
+    for s in sigs.to_dict('records'):
+        position.update(s)
+    return position
+
+
+def test_simulate():
+    sigs = _signals()
+    sim = PositionSimulator(sigs)
+    for position, fresh in zip(_positions('RW000001'), _positions('RW000001')):
+        p1 = sim.simulate(position)
+        p2 = _replay(fresh, sigs)
+        assert p2.operates, "参数设置应该产生交易"
+        assert p1.operates == p2.operates
+        assert list(p1.holds) == list(p2.holds)
+        assert (p1.pos, p1.last_event, p1.last_lo_dt, p1.last_so_dt, p1.end_dt) == \
+               (p2.pos, p2.last_event, p2.last_lo_dt, p2.last_so_dt, p2.end_dt)
+        for trade_dir in ["多空", "多头", "空头"]:
+            assert p1.evaluate(trade_dir) == p2.evaluate(trade_dir)
+
+
+def test_sweep():
+    sigs = _signals()
+    df = PositionSimulator(sigs).sweep(_positions('RW000001'), trade_dir=["多空", "多头", "空头"])
+    rows = []
+    for position in _positions('RW000001'):
+        p = _replay(position, sigs)
+        for trade_dir in ["多空", "多头", "空头"]:
+            res = p.evaluate(trade_dir)
+            res.update({"interval": p.interval, "timeout": p.timeout, "stop_loss": p.stop_loss, "T0": p.T0})
+            rows.append(res)
+    pd.testing.assert_frame_equal(df, pd.DataFrame(rows)[df.columns])
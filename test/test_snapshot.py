@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+describe: 列式快照的测试
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from czsc.strategies import CzscStrategyExample1
+from czsc.traders.snapshot import dump_snapshot, load_snapshot
+
+
+def test_position_holds_tz(tmp_path):
+    """带时区的持仓状态保存、加载之后时间不变"""
+    pos = CzscStrategyExample1(symbol='000001.SH').positions[0]
+    dt0 = datetime(2023, 4, 10, 10, 0, tzinfo=timezone(timedelta(hours=8)))
+    for i in range(5):
+        pos.holds.push(dt0 + timedelta(minutes=30 * i), i % 2, 10.0 + i, i)
+
+    file = os.path.join(tmp_path, 'pos.npz')
+    dump_snapshot(pos, file)
+    pos2 = load_snapshot(file)
+    assert list(pos2.holds) == list(pos.holds)
+    assert pos2.holds[0]['dt'] == dt0 and pos2.holds[0]['dt'].hour == 10
+
+
+def test_position_holds_meter(tmp_path):
+    """快照直接恢复持仓表现的在线统计，加载后继续更新与不中断的结果一致"""
+    pos = CzscStrategyExample1(symbol='000001.SH').positions[0]
+    dt0 = datetime(2023, 4, 10, 10, 0)
+    for i in range(200):
+        dt, p, price = dt0 + timedelta(hours=5 * i), [1, 0, -1, 1][i % 4], 10.0 + (i * 7 % 13) / 10
+        pos.holds.push(dt, p, price, i)
+        pos.holds_meter.update(dt, p, price)
+
+    file = os.path.join(tmp_path, 'pos.npz')
+    dump_snapshot(pos, file)
+    pos2 = load_snapshot(file)
+    assert pos2.holds_meter is not None
+    for trade_dir in ["多空", "多头", "空头"]:
+        assert pos2.evaluate_holds(trade_dir) == pos.evaluate_holds(trade_dir)
+
+    dt = dt0 + timedelta(hours=5 * 200)
+    for x in (pos, pos2):
+        x.holds.push(dt, 1, 11.5, 200)
+        x.holds_meter.update(dt, 1, 11.5)
+    for trade_dir in ["多空", "多头", "空头"]:
+        assert pos2.evaluate_holds(trade_dir) == pos.evaluate_holds(trade_dir)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+describe: 流式技术指标与 ta-lib 的一致性测试
+"""
+import numpy as np
+import talib as ta
+from czsc.utils.stream_ta import StreamSMA, StreamEMA, StreamWMA, StreamIdentity, StreamMACD, StreamBOLL, \
+    StreamSTOCH, StreamRSI
+
+
+def _random_walk(n=5000, seed=7):
+    rs = np.random.RandomState(seed)
+    close = 100 * np.exp(np.cumsum(rs.normal(0, 0.01, n)))
+    high = close * (1 + rs.uniform(0, 0.01, n))
+    low = close * (1 - rs.uniform(0, 0.01, n))
+    return rs, high, low, close
+
+
+def _stream(ind, *columns, rs=None):
+    """逐根K线计算：每根K线先输入两次未完成的值，最后用完成的值 replace"""
+    res = []
+    for i in range(len(columns[0])):
+        xs = [float(c[i]) for c in columns]
+        ind.push(*[x * (1 + rs.normal(0, 0.005)) for x in xs])
+        ind.replace(*[x * (1 + rs.normal(0, 0.005)) for x in xs])
+        res.append(ind.replace(*xs))
+    return np.array(res, dtype=float).reshape(len(res), -1)
+
+
+def _assert_close(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    assert np.array_equal(np.isnan(a), np.isnan(b))
+    np.testing.assert_allclose(a, b, rtol=1e-9, atol=1e-9)
+
+
+def test_stream_ma():
+    rs, high, low, close = _random_walk()
+    for n in (5, 13, 60):
+        _assert_close(_stream(StreamSMA(n), close, rs=rs)[:, 0], ta.SMA(close, n))
+        _assert_close(_stream(StreamEMA(n), close, rs=rs)[:, 0], ta.EMA(close, n))
+        _assert_close(_stream(StreamWMA(n), close, rs=rs)[:, 0], ta.WMA(close, n))
+    _assert_close(_stream(StreamIdentity(1), close, rs=rs)[:, 0], ta.MA(close, 1))
+
+
+def test_stream_macd():
+    rs, high, low, close = _random_walk()
+    res = _stream(StreamMACD(12, 26, 9), close, rs=rs)
+    for a, b in zip(res.T, ta.MACD(close, 12, 26, 9)):
+        _assert_close(a, b)
+
+
+def test_stream_boll():
+    rs, high, low, close = _random_walk()
+    res = _stream(StreamBOLL(20), close, rs=rs)
+    upper, middle, lower = ta.BBANDS(close, 20, 1, 1, 0)
+    _assert_close(res[:, 0], middle)
+    _assert_close(res[:, 1], upper - middle)
+
+
+def test_stream_stoch():
+    rs, high, low, close = _random_walk()
+    res = _stream(StreamSTOCH(9, 3, 3), high, low, close, rs=rs)
+    k, d = ta.STOCH(high, low, close, fastk_period=9, slowk_period=3, slowk_matype=0, slowd_period=3, slowd_matype=0)
+    _assert_close(res[:, 0], k)
+    _assert_close(res[:, 1], d)
+
+
+def test_stream_rsi():
+    rs, high, low, close = _random_walk()
+    for n in (6, 14):
+        _assert_close(_stream(StreamRSI(n), close, rs=rs)[:, 0], ta.RSI(close, n))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+describe: TickAggregator 交易时段边界的测试
+"""
+import pandas as pd
+from czsc.objects import Tick, Freq
+from czsc.utils.bar_generator import TradingCalendar
+from czsc.utils.tick_aggregator import TickAggregator
+
+# A股快照：开盘集合竞价、上午收盘、午后开盘、收盘集合竞价
+A_SHARE_TICKS = ["09:25:00", "09:30:00", "09:30:03", "09:34:59", "11:29:57", "11:30:00", "11:30:03",
+                 "12:59:58", "13:00:00", "13:00:03", "14:59:57", "15:00:00", "15:00:03"]
+
+
+def _replay(freq, times, calendar=None, day="2023-04-10"):
+    agg = TickAggregator(freq=freq, calendar=calendar)
+    bars = []
+    for i, t in enumerate(times):
+        dt = pd.Timestamp(f"{day} {t}").to_pydatetime()
+        bars.extend(agg.update(Tick(symbol="000001.SH", price=10 + i * 0.01, vol=100, dt=dt, amount=1000)))
+    bars.extend(agg.flush())
+    return [x.dt.strftime("%H:%M") for x in bars], bars
+
+
+def test_a_share_session_boundaries():
+    for calendar in [None, TradingCalendar("A股")]:
+        dts, bars = _replay(Freq.F1, A_SHARE_TICKS, calendar)
+        assert dts == ["09:31", "09:35", "11:30", "13:01", "15:00"]
+        assert bars[0].vol == 300 and bars[2].vol == 300 and bars[3].vol == 300 and bars[-1].vol == 300
+
+        dts, _ = _replay(Freq.F5, A_SHARE_TICKS, calendar)
+        assert dts == ["09:35", "11:30", "13:05", "15:00"]
+
+        dts, _ = _replay(Freq.F60, A_SHARE_TICKS, calendar)
+        assert dts == ["10:30", "11:30", "14:00", "15:00"]
+
+
+def test_futures_session_boundaries():
+    calendar = TradingCalendar("期货")
+    times = ["08:59:00", "09:00:00", "10:15:00", "10:15:02", "10:29:30", "14:59:59", "15:00:02"]
+    dts, _ = _replay(Freq.F1, times, calendar)
+    assert dts == ["09:01", "10:15", "10:31", "15:00"]
+
+    # 夜盘跨越零点
+    dts, bars = _replay(Freq.F1, ["20:59:00", "23:59:30", "23:59:59"], calendar)
+    assert dts == ["21:01", "00:00"]
+    assert bars[-1].dt == pd.Timestamp("2023-04-11 00:00").to_pydatetime()
+
+
+def test_session_table():
+    table = TradingCalendar("A股").session_table(grace=1, pre_open=15)
+    assert table[9 * 60 + 15] == 9 * 60 + 15
+    assert table[9 * 60 + 16] == table[9 * 60 + 30] == 9 * 60 + 31
+    assert table[15 * 60 + 1] == 15 * 60
+    assert table[15 * 60 + 2] == 15 * 60 + 2